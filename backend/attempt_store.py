@@ -0,0 +1,231 @@
+import hashlib
+import json
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from bson import Binary
+from pymongo.errors import DuplicateKeyError
+
+from cache import TTLCache
+from scoring import INVALID, ScoringKey, mask_to_chosen
+
+# An attempt is a slim summary document in `attempts` (score, accuracy,
+# percentile, sections, total time), which is what analytics and percentile
+# code scan, plus one `attempt_details` document that only results, rescoring
+# and exports read. Details hold the chosen options as packed per-question
+# bitmasks and per-question seconds as a uint16 array, both indexed by
+# position in a layout: the test's question order at submit time, stored
+# once per test version in `attempt_layouts` instead of once per attempt.
+
+MAX_SECONDS = int(np.iinfo(np.uint16).max)
+
+
+def _mask_width(questions: Sequence[Dict[str, Any]]) -> int:
+    # Bytes per question; the top bit of each slot marks an invalid answer
+    options = max((len(q.get("options") or []) for q in questions), default=0)
+    for width in (1, 2, 4):
+        if options < 8 * width:
+            return width
+    return 8
+
+
+@dataclass(frozen=True)
+class Layout:
+    id: str
+    test_id: str
+    question_ids: Tuple[str, ...]
+    is_msq: Tuple[bool, ...]
+    width: int
+    positions: Dict[str, int] = field(repr=False)
+
+    @classmethod
+    def from_questions(cls, test_id: str, questions: Sequence[Dict[str, Any]]) -> "Layout":
+        question_ids = tuple(q["id"] for q in questions)
+        is_msq = tuple(q.get("questionType", "MCQ") == "MSQ" for q in questions)
+        return cls.build(test_id, question_ids, is_msq, _mask_width(questions))
+
+    @classmethod
+    def build(cls, test_id: str, question_ids: Sequence[str], is_msq: Sequence[bool], width: int) -> "Layout":
+        question_ids, is_msq = tuple(question_ids), tuple(bool(m) for m in is_msq)
+        digest = hashlib.blake2b(json.dumps([question_ids, is_msq, width]).encode(), digest_size=12)
+        return cls(
+            id=digest.hexdigest(),
+            test_id=test_id,
+            question_ids=question_ids,
+            is_msq=is_msq,
+            width=width,
+            positions={qid: i for i, qid in enumerate(question_ids)}
+        )
+
+    @classmethod
+    def from_document(cls, doc: Dict[str, Any]) -> "Layout":
+        return cls.build(doc["testId"], doc["questionIds"], doc["msq"], doc["width"])
+
+    def document(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "testId": self.test_id,
+            "questionIds": list(self.question_ids),
+            "msq": list(self.is_msq),
+            "width": self.width
+        }
+
+    def pack_masks(self, masks: np.ndarray) -> bytes:
+        masks = np.asarray(masks, dtype=np.int64)
+        if self.width == 8:
+            return masks.astype("<i8").tobytes()
+        flag = 1 << (8 * self.width - 1)
+        # Out-of-range selections can never match the key, so they score
+        # exactly like INVALID and are stored as such
+        invalid = (masks & ~(flag - 1)) != 0
+        return np.where(invalid, flag, masks).astype(f"<u{self.width}").tobytes()
+
+    def unpack_masks(self, data: bytes) -> np.ndarray:
+        if self.width == 8:
+            return np.frombuffer(data, dtype="<i8").astype(np.int64)
+        flag = 1 << (8 * self.width - 1)
+        masks = np.frombuffer(data, dtype=f"<u{self.width}").astype(np.int64)
+        return np.where(masks & flag, INVALID, masks)
+
+    def pack_times(self, per_question: Dict[str, Any]) -> bytes:
+        times = np.zeros(len(self.question_ids), dtype=np.int64)
+        for q_id, seconds in per_question.items():
+            i = self.positions.get(q_id)
+            if i is not None and isinstance(seconds, (int, float)):
+                times[i] = seconds
+        return np.clip(times, 0, MAX_SECONDS).astype("<u2").tobytes()
+
+    def unpack_times(self, data: bytes) -> Dict[str, int]:
+        times = np.frombuffer(data, dtype="<u2")
+        return {self.question_ids[i]: int(times[i]) for i in np.flatnonzero(times)}
+
+    def decode_answers(self, masks: np.ndarray) -> List[Dict[str, Any]]:
+        return [
+            {"qId": self.question_ids[i], "chosen": mask_to_chosen(int(masks[i]), multiple=self.is_msq[i])}
+            for i in np.flatnonzero(masks)
+        ]
+
+    def remap_index(self, key: ScoringKey) -> Tuple[np.ndarray, np.ndarray]:
+        # (source, target) positions taking masks in this layout's order to
+        # the key's order; questions removed from the test since are dropped
+        pairs = [(i, key.positions[q]) for i, q in enumerate(self.question_ids) if q in key.positions]
+        source, target = zip(*pairs) if pairs else ((), ())
+        return np.array(source, dtype=np.int64), np.array(target, dtype=np.int64)
+
+
+def details_document(attempt_id: str, layout: Layout, masks: np.ndarray,
+                     per_question: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    doc = {
+        "attemptId": attempt_id,
+        "testId": layout.test_id,
+        "layout": layout.id,
+        "answers": Binary(layout.pack_masks(masks))
+    }
+    if per_question:
+        doc["times"] = Binary(layout.pack_times(per_question))
+    return doc
+
+
+class AttemptStore:
+    # Layouts never change once written (their id is a hash of the content),
+    # so they are cached without expiry
+
+    def __init__(self, db, maxsize: int = 4096, read_db=None):
+        self.db = db
+        self.read_db = read_db if read_db is not None else db
+        self.layouts = TTLCache(maxsize=maxsize, ttl=None)
+
+    async def save_layout(self, layout: Layout):
+        if self.layouts.get(layout.id) is not None:
+            return
+        try:
+            await self.db.attempt_layouts.update_one(
+                {"id": layout.id}, {"$setOnInsert": layout.document()}, upsert=True
+            )
+        except DuplicateKeyError:
+            pass  # a concurrent submit wrote it first
+        self.layouts.set(layout.id, layout)
+
+    async def get_layouts(self, layout_ids: Iterable[str]) -> Dict[str, Layout]:
+        found: Dict[str, Layout] = {}
+        missing = []
+        for layout_id in set(layout_ids):
+            layout = self.layouts.get(layout_id)
+            if layout is None:
+                missing.append(layout_id)
+            else:
+                found[layout_id] = layout
+        if missing:
+            async for doc in self.db.attempt_layouts.find({"id": {"$in": missing}}, {"_id": 0}):
+                layout = Layout.from_document(doc)
+                self.layouts.set(layout.id, layout)
+                found[layout.id] = layout
+        return found
+
+    async def save(self, attempt: Dict[str, Any], layout: Layout, masks: np.ndarray,
+                   per_question: Optional[Dict[str, Any]] = None):
+        # Details go first and are upserted, so a retried submission whose
+        # previous try died between the two writes just overwrites them
+        await self.save_layout(layout)
+        await self.db.attempt_details.replace_one(
+            {"attemptId": attempt["id"]},
+            details_document(attempt["id"], layout, masks, per_question),
+            upsert=True
+        )
+        await self.db.attempts.insert_one(attempt)
+
+    async def _details(self, attempt_ids: List[str], db) -> Dict[str, Dict[str, Any]]:
+        return {
+            d["attemptId"]: d
+            async for d in db.attempt_details.find({"attemptId": {"$in": attempt_ids}}, {"_id": 0})
+        }
+
+    async def expand(self, attempts: List[Dict[str, Any]], layout: Optional[Layout] = None) -> List[Dict[str, Any]]:
+        # Adds `answers` and `timeData.perQuestion` back onto slim attempts;
+        # attempts stored before the split already carry them
+        slim = [a for a in attempts if "answers" not in a]
+        if not slim:
+            return attempts
+        details = await self._details([a["id"] for a in slim], self.read_db)
+        missing = [a["id"] for a in slim if a["id"] not in details]
+        if missing and self.read_db.read_preference != self.db.read_preference:
+            # Read from a secondary that has not caught up yet
+            details.update(await self._details(missing, self.db))
+        layouts = {layout.id: layout} if layout else {}
+        wanted = {d["layout"] for d in details.values()} - set(layouts)
+        if wanted:
+            layouts.update(await self.get_layouts(wanted))
+
+        for attempt in slim:
+            doc = details.get(attempt["id"])
+            doc_layout = layouts.get(doc["layout"]) if doc else None
+            if doc_layout is None:
+                attempt["answers"] = []
+                continue
+            attempt["answers"] = doc_layout.decode_answers(doc_layout.unpack_masks(doc["answers"]))
+            if "times" in doc:
+                attempt["timeData"] = {**attempt.get("timeData", {}), "perQuestion": doc_layout.unpack_times(doc["times"])}
+        return attempts
+
+    async def masks_for(self, attempts: List[Dict[str, Any]], key: ScoringKey) -> np.ndarray:
+        # One row per attempt in the key's question order, for rescoring
+        rows = np.zeros((len(attempts), len(key)), dtype=np.int64)
+        slim = {a["id"]: i for i, a in enumerate(attempts) if "answers" not in a}
+        for i, attempt in enumerate(attempts):
+            if "answers" in attempt:
+                rows[i] = key.encode((a.get("qId"), a.get("chosen")) for a in attempt["answers"])
+        if not slim:
+            return rows
+
+        details = await self.db.attempt_details.find(
+            {"attemptId": {"$in": list(slim)}}, {"_id": 0, "attemptId": 1, "layout": 1, "answers": 1}
+        ).to_list(None)
+        layouts = await self.get_layouts(d["layout"] for d in details)
+        index = {layout_id: layout.remap_index(key) for layout_id, layout in layouts.items()}
+        for doc in details:
+            layout = layouts.get(doc["layout"])
+            if layout is not None:
+                source, target = index[layout.id]
+                rows[slim[doc["attemptId"]], target] = layout.unpack_masks(doc["answers"])[source]
+        return rows
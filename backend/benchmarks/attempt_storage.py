@@ -0,0 +1,121 @@
+"""Storage and scan cost of attempts: inline answers vs. slim documents + details.
+
+Generates a sample of synthetic attempts (the same generator as
+generate_data.py), encodes each one both ways and extrapolates BSON sizes to
+--attempts. Scan time is measured as BSON decoding of the sample, which is
+what every full pass over `attempts` pays; with --mongo-url the sample is
+also written to two scratch collections and scanned by the server.
+
+    python benchmarks/attempt_storage.py --attempts 1000000 --sample 50000
+    python benchmarks/attempt_storage.py --mongo-url mongodb://localhost:27017 --output -
+"""
+import argparse
+import asyncio
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List
+
+import bson
+
+from common import git_revision, write_report
+
+import generate_data  # noqa: E402  (path set up by common)
+
+SCAN_PIPELINE = [{"$group": {"_id": "$testId", "attempts": {"$sum": 1}, "avgScore": {"$avg": "$score"}}}]
+
+
+def build_sample(args) -> Dict[str, List[Dict[str, Any]]]:
+    tests, questions = generate_data.build_catalog(args.seed, args.tests, args.questions_per_test, 365)
+    generate_data._init_worker(args.seed, tests, questions, "", 365)
+    slim, details = generate_data.attempt_batch(0, args.sample, args.users)
+
+    layouts = {layout.id: layout for layout in generate_data._ctx["layouts"]}
+    legacy = []
+    for attempt, detail in zip(slim, details):
+        layout = layouts[detail["layout"]]
+        legacy.append({**attempt, "answers": layout.decode_answers(layout.unpack_masks(detail["answers"]))})
+    return {"legacy": legacy, "slim": slim, "details": details}
+
+
+def size_report(docs: List[Dict[str, Any]], attempts: int) -> Dict[str, Any]:
+    encoded = [bson.encode(doc) for doc in docs]
+    average = sum(len(e) for e in encoded) / len(encoded)
+    blob = b"".join(encoded)
+    started = time.perf_counter()
+    bson.decode_all(blob)
+    decode = time.perf_counter() - started
+    return {
+        "avgBytes": round(average, 1),
+        "projectedMB": round(average * attempts / 2 ** 20, 1),
+        "decodeSecondsPer1M": round(decode / len(docs) * 1_000_000, 2)
+    }
+
+
+async def server_scan(args, sample: Dict[str, List[Dict[str, Any]]]) -> Dict[str, Any]:
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    client = AsyncIOMotorClient(args.mongo_url)
+    db = client[args.db_name]
+    report = {}
+    try:
+        for name in ("legacy", "slim"):
+            collection = db[f"attempts_{name}"]
+            await collection.drop()
+            for start in range(0, len(sample[name]), 5000):
+                # Copies: insert_many adds _id to the documents it is given
+                await collection.insert_many([dict(d) for d in sample[name][start:start + 5000]], ordered=False)
+            started = time.perf_counter()
+            await collection.aggregate(SCAN_PIPELINE).to_list(None)
+            scan = time.perf_counter() - started
+            stats = await db.command("collStats", collection.name)
+            report[name] = {
+                "scanSeconds": round(scan, 3),
+                "sizeBytes": stats["size"],
+                "storageSizeBytes": stats["storageSize"]
+            }
+    finally:
+        if not args.keep:
+            await client.drop_database(args.db_name)
+        client.close()
+    return report
+
+
+def reduction(before: float, after: float) -> str:
+    return f"{(1 - after / before) * 100:.1f}%" if before else "n/a"
+
+
+async def main(args):
+    sample = build_sample(args)
+    sizes = {name: size_report(docs, args.attempts) for name, docs in sample.items()}
+    report = {
+        "revision": git_revision(),
+        "startedAt": datetime.now(timezone.utc).isoformat(),
+        "config": {k: v for k, v in vars(args).items() if k != "output"},
+        "bson": sizes,
+        "reduction": {
+            # Analytics scans only touch the slim documents
+            "scanBytes": reduction(sizes["legacy"]["avgBytes"], sizes["slim"]["avgBytes"]),
+            "scanDecode": reduction(sizes["legacy"]["decodeSecondsPer1M"], sizes["slim"]["decodeSecondsPer1M"]),
+            "totalBytes": reduction(
+                sizes["legacy"]["avgBytes"], sizes["slim"]["avgBytes"] + sizes["details"]["avgBytes"]
+            )
+        }
+    }
+    if args.mongo_url:
+        report["server"] = await server_scan(args, sample)
+    write_report(report, args.output)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--attempts", type=int, default=1_000_000, help="dataset size to project sizes to")
+    parser.add_argument("--sample", type=int, default=20_000, help="attempts actually generated")
+    parser.add_argument("--users", type=int, default=10_000)
+    parser.add_argument("--tests", type=int, default=50)
+    parser.add_argument("--questions-per-test", type=int, default=0, help="default: per exam type (65-75)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--mongo-url", help="also scan the sample on this server")
+    parser.add_argument("--db-name", default="mockme_attempt_storage")
+    parser.add_argument("--keep", action="store_true", help="keep the scratch database afterwards")
+    parser.add_argument("--output", default="attempt-storage.json", help="report path, or - for stdout")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,203 @@
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.insert(0, str(BACKEND_DIR))
+
+import seed_data  # noqa: E402
+
+BENCH_PASSWORD = "bench-password"
+SEED_BATCH_SIZE = 5000
+
+
+def load_app(mock: bool = False, db_name: str = "mockme_bench"):
+    # The server reads its configuration at import time, so everything is
+    # set up before the first import. --mock swaps Motor for mongomock-motor.
+    os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+    os.environ["DB_NAME"] = db_name
+    if mock:
+        try:
+            import mongomock_motor
+        except ImportError:
+            sys.exit("--mock needs mongomock-motor: pip install mongomock-motor")
+        import motor.motor_asyncio
+        motor.motor_asyncio.AsyncIOMotorClient = mongomock_motor.AsyncMongoMockClient
+
+    import server
+    return server
+
+
+def latency_summary(samples: List[float]) -> Dict[str, Any]:
+    if not samples:
+        return {"count": 0}
+    ordered = sorted(samples)
+
+    def pct(p: float) -> float:
+        return round(ordered[min(len(ordered) - 1, int(p * len(ordered)))] * 1000, 2)
+
+    return {
+        "count": len(ordered),
+        "p50Ms": pct(0.50),
+        "p95Ms": pct(0.95),
+        "p99Ms": pct(0.99),
+        "maxMs": round(ordered[-1] * 1000, 2)
+    }
+
+
+def make_question(test_id: str, index: int) -> Dict[str, Any]:
+    return seed_data.make_question(test_id, f"Question {index + 1}", ["A", "B", "C", "D"], index % 4)
+
+
+@dataclass
+class Fixture:
+    admin_id: str
+    user_ids: List[str]
+    emails: List[str]
+    test_ids: List[str]
+    question_ids: Dict[str, List[str]]
+
+
+async def insert_batches(collection, docs: List[Dict[str, Any]]):
+    for start in range(0, len(docs), SEED_BATCH_SIZE):
+        await collection.insert_many(docs[start:start + SEED_BATCH_SIZE], ordered=False)
+
+
+async def seed_fixture(db, users: int, tests: int, questions: int, attempts: int,
+                       password_hash: str, seed: int = 7) -> Fixture:
+    # Every student owns every test, so any (user, test) pair is a valid request.
+    # Attempts get roughly normal scores so percentiles and the dashboard have
+    # something realistic to chew on.
+    rng = random.Random(seed)
+    now = datetime.now(timezone.utc)
+
+    test_docs, question_docs = [], []
+    for t in range(tests):
+        test = seed_data.make_test(f"Benchmark mock {t + 1}", "CS", "GATE", 180, {})
+        qs = [make_question(test["id"], i) for i in range(questions)]
+        test["questions"] = [q["id"] for q in qs]
+        test_docs.append(test)
+        question_docs.extend(qs)
+    test_ids = [t["id"] for t in test_docs]
+
+    admin = seed_data.make_user("Bench Admin", "admin@bench.mockme.com", password_hash, role="admin")
+    user_docs = [
+        seed_data.make_user(f"Candidate {i}", f"candidate{i}@bench.mockme.com", password_hash, purchased_tests=test_ids)
+        for i in range(users)
+    ]
+
+    attempt_docs = []
+    for _ in range(attempts if users and tests else 0):
+        test_id = rng.choice(test_ids)
+        correct = max(0, min(questions, int(rng.gauss(questions * 0.55, questions * 0.15))))
+        wrong = rng.randint(0, questions - correct)
+        created_at = (now - timedelta(minutes=rng.randint(0, 60 * 24 * 60))).isoformat()
+        attempt_docs.append(seed_data.make_attempt(
+            rng.choice(user_docs)["id"], test_id,
+            score=round(correct - wrong * 0.33, 2),
+            # Stored like the server does: a 0..1 fraction of all questions
+            accuracy=correct / questions if questions else 0.0,
+            total_time=rng.randint(600, 180 * 60),
+            created_at=created_at
+        ))
+
+    await insert_batches(db.tests, test_docs)
+    await insert_batches(db.questions, question_docs)
+    await insert_batches(db.users, [admin] + user_docs)
+    await insert_batches(db.attempts, attempt_docs)
+
+    return Fixture(
+        admin_id=admin["id"],
+        user_ids=[u["id"] for u in user_docs],
+        emails=[u["email"] for u in user_docs],
+        test_ids=test_ids,
+        question_ids={t["id"]: t["questions"] for t in test_docs}
+    )
+
+
+async def drive(requests: List[Callable[[], Awaitable[Any]]], concurrency: int) -> Dict[str, Any]:
+    # Runs the request factories with at most `concurrency` in flight
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+    statuses: Dict[int, int] = {}
+
+    async def one(request):
+        async with semaphore:
+            started = time.perf_counter()
+            response = await request()
+            latencies.append(time.perf_counter() - started)
+        statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+    with Timer() as timer:
+        await asyncio.gather(*[one(r) for r in requests])
+    return drive_result(latencies, statuses, timer.elapsed)
+
+
+async def drive_during(busy: asyncio.Future, next_request: Callable[[], Callable[[], Awaitable[Any]]],
+                       concurrency: int) -> Dict[str, Any]:
+    # Keeps `concurrency` requests from next_request() in flight until `busy`
+    # is done, to measure one route while another scenario loads the server
+    latencies: List[float] = []
+    statuses: Dict[int, int] = {}
+
+    async def loop():
+        while not busy.done():
+            request = next_request()
+            started = time.perf_counter()
+            response = await request()
+            latencies.append(time.perf_counter() - started)
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+            # A request served from caches never suspends; let the load run
+            await asyncio.sleep(0)
+
+    with Timer() as timer:
+        await asyncio.gather(*[loop() for _ in range(concurrency)])
+    return drive_result(latencies, statuses, timer.elapsed)
+
+
+def drive_result(latencies: List[float], statuses: Dict[int, int], elapsed: float) -> Dict[str, Any]:
+    # The shape every scenario shares
+    return {
+        "requests": len(latencies),
+        "seconds": round(elapsed, 3),
+        "throughput": round(len(latencies) / elapsed, 1) if elapsed else None,
+        "statuses": statuses,
+        "latency": latency_summary(latencies)
+    }
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def write_report(report: Dict[str, Any], path: str):
+    text = json.dumps(report, indent=2)
+    if path == "-":
+        print(text)
+        return
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    Path(path).write_text(text + "\n")
+    print(f"Wrote {path}")
+
+
+class Timer:
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.elapsed = time.perf_counter() - self.started
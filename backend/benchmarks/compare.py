@@ -0,0 +1,47 @@
+"""Compare two benchmark reports written by run.py.
+
+    python benchmarks/compare.py before.json after.json
+"""
+import argparse
+import json
+from typing import Optional
+
+METRICS = [("throughput", "req/s"), ("p50Ms", "p50 ms"), ("p95Ms", "p95 ms"), ("p99Ms", "p99 ms")]
+
+
+def metric(result, key) -> Optional[float]:
+    if key == "throughput":
+        return result.get("throughput")
+    return result.get("latency", {}).get(key)
+
+
+def change(before: Optional[float], after: Optional[float]) -> str:
+    if not before or after is None:
+        return ""
+    return f"{(after - before) / before * 100:+.1f}%"
+
+
+def main(args):
+    with open(args.before) as f:
+        before = json.load(f)
+    with open(args.after) as f:
+        after = json.load(f)
+
+    print(f"{before.get('revision', '?')} -> {after.get('revision', '?')}")
+    header = f"{'scenario':<16}{'metric':<10}{'before':>12}{'after':>12}{'change':>10}"
+    print(header)
+    print("-" * len(header))
+    for name in sorted(set(before["scenarios"]) | set(after["scenarios"])):
+        b = before["scenarios"].get(name, {})
+        a = after["scenarios"].get(name, {})
+        for key, label in METRICS:
+            bv, av = metric(b, key), metric(a, key)
+            print(f"{name:<16}{label:<10}{bv if bv is not None else '-':>12}"
+                  f"{av if av is not None else '-':>12}{change(bv, av):>10}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("before")
+    parser.add_argument("after")
+    main(parser.parse_args())
@@ -0,0 +1,161 @@
+"""Scenario benchmarks for the API, written to a JSON report.
+
+Seeds a synthetic dataset, then drives each scenario through the ASGI app
+in-process and records throughput and p50/p95/p99 latency per scenario:
+
+    login       login storm with valid credentials
+    mixed       the login storm with exam_fetch and dashboard requests issued
+                alongside it; their latency shows whether bcrypt starves
+                other routes
+    exam_fetch  students opening purchased tests
+    dashboard   admin analytics dashboard
+    search      catalog search and admin question search (needs text indexes,
+                so not with --mock)
+    submit      deadline submit burst (direct scoring and, with --queue, the queue)
+
+    python benchmarks/run.py --users 5000 --tests 20 --questions 65 --attempts 200000
+    python benchmarks/run.py --mock --output -            # mongomock-motor, print JSON
+    python benchmarks/compare.py before.json after.json
+"""
+import argparse
+import asyncio
+import os
+import random
+from datetime import datetime, timezone
+
+import httpx
+
+from common import BENCH_PASSWORD, drive, drive_during, git_revision, load_app, seed_fixture, write_report
+from submit_burst import run_mode
+
+SCENARIOS = ["login", "mixed", "exam_fetch", "dashboard", "search", "submit"]
+
+
+def auth(server, user_id):
+    return {"Authorization": f"Bearer {server.create_token({'user_id': user_id})}"}
+
+
+async def login(server, client, fixture, args):
+    def request(email):
+        return lambda: client.post("/api/auth/login", json={"email": email, "password": BENCH_PASSWORD})
+
+    emails = [random.choice(fixture.emails) for _ in range(args.requests)]
+    return await drive([request(e) for e in emails], args.concurrency)
+
+
+def fetch_request(server, client, fixture):
+    headers = auth(server, random.choice(fixture.user_ids))
+    test_id = random.choice(fixture.test_ids)
+    return lambda: client.get(f"/api/tests/{test_id}", headers=headers)
+
+
+async def exam_fetch(server, client, fixture, args):
+    return await drive([fetch_request(server, client, fixture) for _ in range(args.requests)], args.concurrency)
+
+
+async def dashboard(server, client, fixture, args):
+    headers = auth(server, fixture.admin_id)
+    requests = [lambda: client.get("/api/admin/analytics", headers=headers) for _ in range(args.requests)]
+    return await drive(requests, args.concurrency)
+
+
+async def mixed(server, client, fixture, args):
+    # Students and the admin keep a tenth of the concurrency busy each for
+    # as long as the storm lasts
+    storm = asyncio.ensure_future(login(server, client, fixture, args))
+    others = max(1, args.concurrency // 10)
+    headers = auth(server, fixture.admin_id)
+    fetches, dashboards = await asyncio.gather(
+        drive_during(storm, lambda: fetch_request(server, client, fixture), others),
+        drive_during(storm, lambda: lambda: client.get("/api/admin/analytics", headers=headers), others)
+    )
+    return {"login": await storm, "exam_fetch": fetches, "dashboard": dashboards}
+
+
+async def search(server, client, fixture, args):
+    headers = auth(server, fixture.admin_id)
+
+    def request(i):
+        # Alternate public test searches with admin question searches
+        if i % 2:
+            return lambda: client.get("/api/admin/questions/search", params={"q": f"Question {i % 97}"}, headers=headers)
+        return lambda: client.get("/api/tests/search", params={"q": "Benchmark mock", "examType": "GATE", "page": i % 5 + 1})
+
+    return await drive([request(i) for i in range(args.requests)], args.concurrency)
+
+
+async def submit(server, client, fixture, args):
+    test_id = fixture.test_ids[0]
+    user_ids = fixture.user_ids[:args.requests]
+    modes = ["direct", "queue"] if args.queue else ["direct"]
+    return {
+        mode: await run_mode(server, mode, test_id, fixture.question_ids[test_id], user_ids,
+                             args.concurrency, args.workers)
+        for mode in modes
+    }
+
+
+async def main(args):
+    if args.bcrypt_rounds:
+        os.environ["BCRYPT_ROUNDS"] = str(args.bcrypt_rounds)
+    server = load_app(mock=args.mock, db_name=args.db_name)
+    db = server.db
+    await db.client.drop_database(args.db_name)
+    await server.ensure_indexes(db)
+
+    fixture = await seed_fixture(
+        db, args.users, args.tests, args.questions, args.attempts,
+        password_hash=server.pwd_context.hash(BENCH_PASSWORD), seed=args.seed
+    )
+    random.seed(args.seed)
+
+    report = {
+        "revision": git_revision(),
+        "startedAt": datetime.now(timezone.utc).isoformat(),
+        "config": {k: v for k, v in vars(args).items() if k != "output"},
+        "scenarios": {}
+    }
+
+    runners = {
+        "login": login, "mixed": mixed, "exam_fetch": exam_fetch, "dashboard": dashboard,
+        "search": search, "submit": submit
+    }
+    transport = httpx.ASGITransport(app=server.app)
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            # mongomock has no $text, so --mock skips search unless asked for
+            default = [s for s in SCENARIOS if not (args.mock and s == "search")]
+            for name in args.scenario or default:
+                print(f"Running {name}...")
+                result = await runners[name](server, client, fixture, args)
+                if name in ("mixed", "submit"):
+                    for part, part_result in result.items():
+                        report["scenarios"][f"{name}_{part}"] = part_result
+                else:
+                    report["scenarios"][name] = result
+    finally:
+        await server.autosave_buffer.stop()
+        if not args.keep:
+            await db.client.drop_database(args.db_name)
+
+    write_report(report, args.output)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scenario", action="append", choices=SCENARIOS, help="repeatable; default: all")
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--tests", type=int, default=10)
+    parser.add_argument("--questions", type=int, default=65)
+    parser.add_argument("--attempts", type=int, default=20000)
+    parser.add_argument("--requests", type=int, default=1000, help="requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=100, help="simultaneous in-flight requests")
+    parser.add_argument("--workers", type=int, default=8, help="queue workers for the submit scenario")
+    parser.add_argument("--queue", action="store_true", help="also run the submit burst through the queue")
+    parser.add_argument("--bcrypt-rounds", type=int, help="override BCRYPT_ROUNDS for the run")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--db-name", default="mockme_bench")
+    parser.add_argument("--keep", action="store_true", help="keep the benchmark database afterwards")
+    parser.add_argument("--mock", action="store_true", help="use mongomock-motor instead of MONGO_URL")
+    parser.add_argument("--output", default="benchmark-results.json", help="report path, or - for stdout")
+    asyncio.run(main(parser.parse_args()))
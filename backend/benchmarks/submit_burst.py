@@ -0,0 +1,101 @@
+"""Deadline submit burst: every candidate submits at once.
+
+Compares scoring inside the request ("direct") with the submission queue
+("queue") and reports acknowledgement latency/throughput and the time until
+every attempt is scored.
+
+    python benchmarks/submit_burst.py --candidates 2000 --questions 65
+    python benchmarks/submit_burst.py --mock   # mongomock-motor, no MongoDB
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+
+import httpx
+
+from common import drive, load_app, seed_fixture
+
+
+async def seed(db, candidates: int, questions: int):
+    fixture = await seed_fixture(db, users=candidates, tests=1, questions=questions, attempts=0, password_hash="")
+    test_id = fixture.test_ids[0]
+    return test_id, fixture.question_ids[test_id], fixture.user_ids
+
+
+def submit_requests(server, client, test_id, question_ids, user_ids):
+    def submit(user_id):
+        answers = [{"qId": q, "chosen": random.choice([None, 0, 1, 2, 3])} for q in question_ids]
+        headers = {"Authorization": f"Bearer {server.create_token({'user_id': user_id})}"}
+        return lambda: client.post(
+            f"/api/tests/submit/{test_id}",
+            json={"answers": answers, "timeSpent": 3600},
+            headers=headers
+        )
+
+    return [submit(u) for u in user_ids]
+
+
+async def run_mode(server, mode, test_id, question_ids, user_ids, concurrency=200, workers=8):
+    db = server.db
+    await db.attempts.delete_many({"testId": test_id})
+    await db.submission_queue.delete_many({})
+    await db.score_index.delete_many({"testId": test_id})
+    server.score_index.evict(test_id)
+
+    server.SUBMISSION_QUEUE_ENABLED = mode == "queue"
+    if mode == "queue":
+        server.submission_queue.concurrency = workers
+        server.submission_queue.start()
+
+    transport = httpx.ASGITransport(app=server.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        started = time.perf_counter()
+        result = await drive(submit_requests(server, client, test_id, question_ids, user_ids), concurrency)
+        while await db.attempts.count_documents({"testId": test_id}) < len(user_ids):
+            await asyncio.sleep(0.05)
+        scored_seconds = time.perf_counter() - started
+
+    if mode == "queue":
+        await server.submission_queue.stop()
+    server.SUBMISSION_QUEUE_ENABLED = False
+
+    result["allScoredSeconds"] = round(scored_seconds, 3)
+    result["scoredPerSecond"] = round(len(user_ids) / scored_seconds, 1)
+    return result
+
+
+async def main(args):
+    server = load_app(mock=args.mock)
+    await server.ensure_indexes(server.db)
+    test_id, question_ids, user_ids = await seed(server.db, args.candidates, args.questions)
+
+    modes = ["direct", "queue"] if args.mode == "both" else [args.mode]
+    report = {
+        "scenario": "submit_burst",
+        "candidates": args.candidates,
+        "questions": args.questions,
+        "concurrency": args.concurrency,
+        "workers": args.workers,
+        "mock": args.mock,
+        "results": {}
+    }
+    for mode in modes:
+        report["results"][mode] = await run_mode(
+            server, mode, test_id, question_ids, user_ids, args.concurrency, args.workers
+        )
+
+    await server.db.client.drop_database(server.db.name)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--candidates", type=int, default=1000)
+    parser.add_argument("--questions", type=int, default=65)
+    parser.add_argument("--concurrency", type=int, default=200, help="simultaneous in-flight submits")
+    parser.add_argument("--workers", type=int, default=8, help="queue workers in queue mode")
+    parser.add_argument("--mode", choices=["direct", "queue", "both"], default="both")
+    parser.add_argument("--mock", action="store_true", help="use mongomock-motor instead of MONGO_URL")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,136 @@
+import asyncio
+import logging
+import os
+import socket
+import uuid
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional
+
+from pymongo import CursorType
+from pymongo.errors import CollectionInvalid
+
+logger = logging.getLogger(__name__)
+
+CACHE_EVENTS_BYTES = 4 * 1024 * 1024
+CACHE_EVENTS_MAX = 20000
+MARKER = "_marker"
+
+# Called with the keys to evict, or None to drop everything of that kind
+Handler = Callable[[Optional[List[str]]], None]
+
+
+class CacheEvents:
+    # Cross-process cache invalidation over the capped `cache_events`
+    # collection. publish() records an eviction; every other process tails
+    # the collection with a tailable await cursor and runs the handlers
+    # registered for that kind, usually within one await period (~1s).
+    #
+    # Capped collections keep insertion order but ObjectIds from different
+    # hosts are not ordered, so a tail is never resumed by _id: each cursor
+    # starts at a marker this process writes, and whenever a cursor is lost
+    # (error, or the collection wrapped past it) every handler is called with
+    # None first, since events may have been missed.
+
+    def __init__(self, db, enabled: bool = False, retry_interval: float = 1.0,
+                 size: int = CACHE_EVENTS_BYTES, max_events: int = CACHE_EVENTS_MAX):
+        self.db = db
+        self.enabled = enabled
+        self.retry_interval = retry_interval
+        self.size = size
+        self.max_events = max_events
+        self.source = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.published = 0
+        self.received = 0
+        self.resets = 0
+        self._handlers: Dict[str, List[Handler]] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def on(self, kind: str, handler: Handler):
+        self._handlers.setdefault(kind, []).append(handler)
+
+    async def publish(self, kind: str, *keys: str):
+        # Callers evict locally first; if this fails the other processes fall
+        # back on their caches' TTLs
+        if not self.enabled:
+            return
+        try:
+            await self._insert(kind, list(keys))
+            self.published += 1
+        except Exception:
+            logger.exception(f"Could not publish {kind} cache event")
+
+    async def _insert(self, kind: str, keys: List[str]):
+        await self.db.cache_events.insert_one({
+            "kind": kind,
+            "keys": keys,
+            "source": self.source,
+            "at": datetime.now(timezone.utc)
+        })
+
+    def _apply(self, kind: str, keys: Optional[List[str]]):
+        for handler in self._handlers.get(kind, []):
+            try:
+                handler(keys)
+            except Exception:
+                logger.exception(f"Cache event handler for {kind} failed")
+
+    def _reset(self):
+        self.resets += 1
+        for kind in self._handlers:
+            self._apply(kind, None)
+
+    async def _ensure_collection(self):
+        try:
+            await self.db.create_collection("cache_events", capped=True, size=self.size, max=self.max_events)
+        except CollectionInvalid:
+            pass  # already there
+
+    async def _tail_once(self):
+        # Also makes sure the collection is not empty; a tailable cursor on an
+        # empty capped collection dies straight away
+        nonce = uuid.uuid4().hex
+        await self._insert(MARKER, [nonce])
+        started = False
+        cursor = self.db.cache_events.find({}, cursor_type=CursorType.TAILABLE_AWAIT)
+        while cursor.alive:
+            async for event in cursor:
+                if not started:
+                    started = event["kind"] == MARKER and event["keys"] == [nonce]
+                    continue
+                if event["source"] != self.source and event["kind"] != MARKER:
+                    self.received += 1
+                    self._apply(event["kind"], event.get("keys"))
+
+    async def _tail(self):
+        await self._ensure_collection()
+        first = True
+        while True:
+            if not first:
+                self._reset()
+            first = False
+            try:
+                await self._tail_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Lost the cache event tail; dropping local caches")
+            await asyncio.sleep(self.retry_interval)
+
+    def start(self):
+        if self.enabled and self._task is None:
+            self._task = asyncio.create_task(self._tail())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def stats(self):
+        return {
+            "enabled": self.enabled,
+            "source": self.source,
+            "published": self.published,
+            "received": self.received,
+            "resets": self.resets
+        }
@@ -0,0 +1,118 @@
+import asyncio
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+from attempt_store import Layout
+from cache import TTLCache
+from payloads import CachedBody
+from score_index import score_bounds
+from scoring import ScoringKey
+
+STUDENT_HIDDEN_FIELDS = ("correctAnswer", "explanation")
+
+
+@dataclass(frozen=True)
+class CompiledTest:
+    # Everything the exam routes need from one test, built once per edit.
+    # Shared between requests: callers must copy before mutating.
+    test: Dict[str, Any]
+    questions: Tuple[Dict[str, Any], ...]
+    student_questions: Tuple[Dict[str, Any], ...]
+    question_map: Dict[str, Dict[str, Any]] = field(repr=False)
+    lower: float
+    upper: float
+    scoring_key: ScoringKey = field(repr=False)
+    # Question order that stored attempt details are packed against
+    layout: Layout = field(repr=False)
+    # get_test bodies, serialized once per edit
+    student_body: CachedBody = field(repr=False)
+    locked_body: CachedBody = field(repr=False)
+
+    @property
+    def id(self) -> str:
+        return self.test["id"]
+
+
+def compile_test(test: Dict[str, Any], questions: List[Dict[str, Any]]) -> CompiledTest:
+    by_id = {q["id"]: q for q in questions}
+    ordered = tuple(by_id[qid] for qid in test.get("questions", []) if qid in by_id)
+    lower, upper = score_bounds(ordered)
+    student_questions = tuple(
+        {k: v for k, v in q.items() if k not in STUDENT_HIDDEN_FIELDS} for q in ordered
+    )
+    return CompiledTest(
+        test=test,
+        questions=ordered,
+        student_questions=student_questions,
+        question_map={q["id"]: q for q in ordered},
+        lower=lower,
+        upper=upper,
+        scoring_key=ScoringKey.from_questions(ordered),
+        layout=Layout.from_questions(test["id"], ordered),
+        student_body=CachedBody.of({**test, "questions": student_questions, "locked": False}),
+        locked_body=CachedBody.of({**test, "questions": [], "locked": True})
+    )
+
+
+class CompiledTestCache:
+    # Tests only change through the admin routes, which call invalidate()
+
+    def __init__(self, db, maxsize: int = 512):
+        self.db = db
+        self.cache = TTLCache(maxsize=maxsize, ttl=None)
+        self._loading: Dict[str, asyncio.Future] = {}
+        self._epoch = 0
+
+    async def get(self, test_id: str) -> Optional[CompiledTest]:
+        compiled = self.cache.get(test_id)
+        if compiled is not None:
+            return compiled
+
+        # Collapse concurrent misses for the same test into one load
+        pending = self._loading.get(test_id)
+        if pending is not None:
+            return await asyncio.shield(pending)
+
+        pending = asyncio.get_running_loop().create_future()
+        pending.add_done_callback(lambda f: f.cancelled() or f.exception())
+        self._loading[test_id] = pending
+        try:
+            compiled = await self._load(test_id)
+        except asyncio.CancelledError:
+            pending.cancel()
+            raise
+        except Exception as e:
+            pending.set_exception(e)
+            raise
+        else:
+            pending.set_result(compiled)
+        finally:
+            if self._loading.get(test_id) is pending:
+                del self._loading[test_id]
+        return compiled
+
+    async def _load(self, test_id: str) -> Optional[CompiledTest]:
+        epoch = self._epoch
+        test = await self.db.tests.find_one({"id": test_id}, {"_id": 0})
+        if not test:
+            return None
+
+        questions = await self.db.questions.find(
+            {"id": {"$in": test["questions"]}},
+            {"_id": 0}
+        ).to_list(None)
+        compiled = compile_test(test, questions)
+        # An admin edit that landed mid-load must not be masked by stale data
+        if epoch == self._epoch:
+            self.cache.set(test_id, compiled)
+        return compiled
+
+    def invalidate(self, test_id: str):
+        self._epoch += 1
+        self.cache.invalidate(test_id)
+        self._loading.pop(test_id, None)
+
+    def clear(self):
+        self._epoch += 1
+        self.cache.clear()
+        self._loading.clear()
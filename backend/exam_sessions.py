@@ -0,0 +1,160 @@
+import asyncio
+import logging
+from typing import Any, Dict, Iterable
+
+from pymongo import UpdateOne
+
+logger = logging.getLogger(__name__)
+
+
+class AutosaveBuffer:
+    # Coalesces autosave patches per exam session and writes them in one
+    # unordered bulk_write every `interval` seconds (or sooner when
+    # `max_pending` sessions are waiting). Repeated clicks on the same
+    # question collapse to the last choice and one summed time increment.
+    #
+    # With `write_through` save() writes immediately instead, for
+    # deployments where a submit may reach a process other than the one
+    # buffering the session's autosaves. That costs one write per autosave.
+
+    def __init__(self, db, interval: float = 1.0, max_pending: int = 1000, write_through: bool = False):
+        self.db = db
+        self.interval = interval
+        self.max_pending = max_pending
+        self.write_through = write_through
+        self.patches_received = 0
+        self.writes_issued = 0
+        self._pending: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        # Sessions whose patches are being written, and the write's future
+        self._writing: Dict[str, asyncio.Future] = {}
+        self._wakeup = asyncio.Event()
+        self._task = None
+
+    def _merge(self, session_id: str, entry: Dict[str, Dict[str, Any]]):
+        target = self._pending.setdefault(session_id, {"$set": {}, "$inc": {}})
+        target["$set"].update(entry["$set"])
+        for key, value in entry["$inc"].items():
+            target["$inc"][key] = target["$inc"].get(key, 0) + value
+
+    def _collect(self, entry: Dict[str, Dict[str, Any]], patches: Iterable[Dict[str, Any]]):
+        for patch in patches:
+            q_id = patch["qId"]
+            entry["$set"][f"answers.{q_id}"] = patch.get("chosen")
+            if patch.get("timeSpent"):
+                key = f"questionTime.{q_id}"
+                entry["$inc"][key] = entry["$inc"].get(key, 0) + patch["timeSpent"]
+            self.patches_received += 1
+
+    def add(self, session_id: str, patches: Iterable[Dict[str, Any]]):
+        patches = list(patches)
+        if not patches:
+            return  # an empty update would fail the whole bulk_write
+        self._collect(self._pending.setdefault(session_id, {"$set": {}, "$inc": {}}), patches)
+        if len(self._pending) >= self.max_pending:
+            self._wakeup.set()
+
+    async def save(self, session_id: str, patches: Iterable[Dict[str, Any]]) -> bool:
+        # False when a write-through finds the session no longer active
+        if not self.write_through:
+            self.add(session_id, patches)
+            return True
+        entry = {"$set": {}, "$inc": {}}
+        self._collect(entry, patches)
+        if not entry["$set"]:
+            return True
+        result = await self.db.exam_sessions.update_one(
+            {"id": session_id, "status": "active"}, self._changes(entry)
+        )
+        self.writes_issued += 1
+        return result.matched_count > 0
+
+    @staticmethod
+    def _changes(entry: Dict[str, Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+        return {op: fields for op, fields in entry.items() if fields}
+
+    def _update(self, session_id: str, entry: Dict[str, Dict[str, Any]]) -> UpdateOne:
+        return UpdateOne({"id": session_id, "status": "active"}, self._changes(entry))
+
+    def _begin(self, session_ids: Iterable[str]) -> asyncio.Future:
+        done = asyncio.get_running_loop().create_future()
+        for sid in session_ids:
+            self._writing[sid] = done
+        return done
+
+    def _end(self, session_ids: Iterable[str], done: asyncio.Future):
+        for sid in session_ids:
+            if self._writing.get(sid) is done:
+                del self._writing[sid]
+        done.set_result(None)
+
+    async def flush(self):
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, {}
+        updates = [self._update(sid, entry) for sid, entry in pending.items()]
+        done = self._begin(pending)
+        try:
+            await self.db.exam_sessions.bulk_write(updates, ordered=False)
+        except Exception:
+            # Put the patches back (under any newer ones) for the next flush
+            newer, self._pending = self._pending, pending
+            for sid, entry in newer.items():
+                self._merge(sid, entry)
+            raise
+        finally:
+            self._end(pending, done)
+        self.writes_issued += 1
+
+    async def flush_session(self, session_id: str) -> bool:
+        # Returns once everything autosaved for the session so far is stored,
+        # including patches a background flush() is still writing; True if
+        # anything was written meanwhile
+        wrote = False
+        while session_id in self._writing:
+            await self._writing[session_id]
+            wrote = True
+        entry = self._pending.pop(session_id, None)
+        if not entry:
+            return wrote
+        done = self._begin([session_id])
+        try:
+            await self.db.exam_sessions.bulk_write([self._update(session_id, entry)])
+        except Exception:
+            newer = self._pending.pop(session_id, None)
+            self._pending[session_id] = entry
+            if newer:
+                self._merge(session_id, newer)
+            raise
+        finally:
+            self._end([session_id], done)
+        self.writes_issued += 1
+        return True
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception("Autosave flush failed")
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        await self.flush()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "pendingSessions": len(self._pending),
+            "patchesReceived": self.patches_received,
+            "writesIssued": self.writes_issued
+        }
@@ -0,0 +1,91 @@
+import csv
+import io
+import json
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional
+
+EXPORT_BATCH_SIZE = 1000
+
+ATTEMPT_COLUMNS = ["id", "userId", "testId", "score", "accuracy", "percentile", "timeData", "sections", "createdAt"]
+PAYMENT_COLUMNS = ["id", "userId", "testId", "amount", "couponApplied", "status", "createdAt", "updatedAt"]
+
+MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+
+def export_query(test_id: Optional[str] = None, user_id: Optional[str] = None,
+                 start: Optional[str] = None, end: Optional[str] = None, **extra) -> Dict[str, Any]:
+    # createdAt is an ISO-8601 string, so date bounds compare lexically
+    query: Dict[str, Any] = {k: v for k, v in extra.items() if v is not None}
+    if test_id:
+        query["testId"] = test_id
+    if user_id:
+        query["userId"] = user_id
+    if start or end:
+        query["createdAt"] = {}
+        if start:
+            query["createdAt"]["$gte"] = start
+        if end:
+            query["createdAt"]["$lt"] = end
+    return query
+
+
+Expand = Callable[[List[Dict[str, Any]]], Awaitable[List[Dict[str, Any]]]]
+
+
+async def expand_batches(cursor, expand: Expand) -> AsyncIterator[Dict[str, Any]]:
+    # Lets a caller join in data from another collection one batch at a time
+    batch: List[Dict[str, Any]] = []
+    async for doc in cursor:
+        batch.append(doc)
+        if len(batch) >= EXPORT_BATCH_SIZE:
+            for expanded in await expand(batch):
+                yield expanded
+            batch = []
+    if batch:
+        for expanded in await expand(batch):
+            yield expanded
+
+
+async def stream_ndjson(cursor) -> AsyncIterator[bytes]:
+    lines: List[str] = []
+    async for doc in cursor:
+        lines.append(json.dumps(doc, default=str, separators=(",", ":")))
+        if len(lines) >= EXPORT_BATCH_SIZE:
+            yield ("\n".join(lines) + "\n").encode()
+            lines = []
+    if lines:
+        yield ("\n".join(lines) + "\n").encode()
+
+
+def _cell(value: Any) -> Any:
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, default=str, separators=(",", ":"))
+    return value
+
+
+async def stream_csv(cursor, columns: List[str]) -> AsyncIterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    rows = 0
+    async for doc in cursor:
+        writer.writerow([_cell(doc.get(column)) for column in columns])
+        rows += 1
+        if rows >= EXPORT_BATCH_SIZE:
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+            rows = 0
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+def stream_export(collection, query: Dict[str, Any], columns: List[str], fmt: str,
+                  extra_fields: List[str] = (), expand: Optional[Expand] = None) -> AsyncIterator[bytes]:
+    projection = {"_id": 0, **{c: 1 for c in columns}, **{f: 1 for f in extra_fields}}
+    # No sort: a sort without a matching index would buffer the whole result
+    cursor = collection.find(query, projection, batch_size=EXPORT_BATCH_SIZE)
+    if expand is not None:
+        cursor = expand_batches(cursor, expand)
+    if fmt == "csv":
+        return stream_csv(cursor, columns + list(extra_fields))
+    return stream_ndjson(cursor)
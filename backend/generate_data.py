@@ -0,0 +1,300 @@
+import argparse
+import asyncio
+import os
+import random
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Sequence, Tuple
+
+import numpy as np
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient
+from passlib.context import CryptContext
+
+from attempt_store import Layout, details_document
+from indexes import ensure_indexes
+from rollups import rebuild_rollups
+from rescore import update_percentiles
+from score_index import ScoreIndex, score_bounds
+from scoring import ScoringKey
+from seed_data import make_attempt, make_question, make_test, make_user
+from user_stats import backfill_all
+
+# Synthetic data at production scale for local performance work:
+#
+#   python generate_data.py --users 1000000 --tests 2000 --attempts 5000000
+#
+# Documents are built in worker processes and written with unordered
+# insert_many batches. Ids and choices are derived from --seed, so a worker
+# can rebuild any user's purchases from its index alone and reruns with the
+# same arguments produce the same dataset.
+
+EXAM_TYPES = [
+    ("GATE", "Computer Science", 180, 65, {"mcq": True, "msq": True, "negativeMarking": True}),
+    ("CAT", "Quantitative Aptitude", 120, 66, {"mcq": True, "negativeMarking": True}),
+    ("JEE", "Physics", 180, 75, {"mcq": True, "negativeMarking": True}),
+]
+OPTIONS = ["A", "B", "C", "D"]
+ID_NAMESPACE = uuid.UUID("5b2d6c1e-8f0a-4c53-9a51-3f4d0f6e2b7a")
+
+# Set in each worker by _init_worker
+_ctx: Dict[str, Any] = {}
+
+
+def stable_id(seed: int, kind: str, index: int) -> str:
+    return str(uuid.uuid5(ID_NAMESPACE, f"{seed}:{kind}:{index}"))
+
+
+def iso(base: datetime, days: int, rng) -> str:
+    return (base - timedelta(seconds=rng.randrange(days * 86400))).isoformat()
+
+
+def build_catalog(seed: int, tests: int, questions_per_test: int, days: int) -> Tuple[List[dict], List[dict]]:
+    # Tests and their questions are small enough to build in the parent; the
+    # workers receive them once to score attempts.
+    rng = random.Random(seed)
+    now = datetime.now(timezone.utc)
+    test_docs, question_docs = [], []
+    for t in range(tests):
+        exam_type, subject, duration, default_count, rules = EXAM_TYPES[t % len(EXAM_TYPES)]
+        count = questions_per_test or default_count
+        test = make_test(
+            f"{exam_type} Mock Test {t + 1}", subject, exam_type, duration, rules,
+            price=rng.choice([0.0, 30.0, 30.0, 49.0, 99.0]), created_at=iso(now, days, rng)
+        )
+        test["id"] = stable_id(seed, "test", t)
+        for i in range(count):
+            msq = exam_type == "GATE" and rng.random() < 0.2
+            correct = sorted(rng.sample(range(len(OPTIONS)), rng.randint(2, 3))) if msq else rng.randrange(len(OPTIONS))
+            question = make_question(
+                test["id"], f"{subject} question {i + 1}", OPTIONS, correct,
+                marks=2.0 if msq or rng.random() < 0.5 else 1.0,
+                negative_marks=0.0 if msq else 0.33,
+                section="General Aptitude" if exam_type == "GATE" and i < 10 else subject
+            )
+            question["id"] = stable_id(seed, f"question:{t}", i)
+            # Difficulty on the same logit scale as user ability; not a model field
+            question_docs.append({**question, "_difficulty": rng.gauss(0.0, 1.0)})
+            test["questions"].append(question["id"])
+        test_docs.append(test)
+    return test_docs, question_docs
+
+
+def purchases(seed: int, user_index: int, tests: int) -> Tuple[List[int], float]:
+    # Most users own a handful of tests; ability is their latent skill
+    rng = random.Random(seed * 1_000_003 + user_index)
+    owned = min(tests, 1 + int(rng.expovariate(1 / 3)))
+    return rng.sample(range(tests), owned), rng.gauss(0.0, 1.0)
+
+
+def _init_worker(seed: int, tests: List[dict], questions: List[dict], password_hash: str, days: int):
+    by_test: Dict[str, List[dict]] = {}
+    for q in questions:
+        by_test.setdefault(q["testId"], []).append(q)
+    keys, layouts, correct_index, difficulty = [], [], [], []
+    for test in tests:
+        qs = by_test[test["id"]]
+        key = ScoringKey.from_questions(qs)
+        keys.append(key)
+        layouts.append(Layout.from_questions(test["id"], qs))
+        correct_index.append(np.array([int(mask).bit_length() - 1 for mask in key.correct]))
+        difficulty.append(np.array([q["_difficulty"] for q in qs]))
+    _ctx.update(
+        seed=seed, test_ids=[t["id"] for t in tests], keys=keys, layouts=layouts,
+        correct_index=correct_index, difficulty=difficulty,
+        password_hash=password_hash, days=days, now=datetime.now(timezone.utc)
+    )
+
+
+def user_batch(start: int, count: int) -> Tuple[List[dict]]:
+    seed, test_ids = _ctx["seed"], _ctx["test_ids"]
+    rng = random.Random(f"{seed}:users:{start}")
+    docs = []
+    for i in range(start, start + count):
+        owned, _ = purchases(seed, i, len(test_ids))
+        user = make_user(
+            f"User {i}", f"user{i}@mockme-synthetic.com", _ctx["password_hash"],
+            purchased_tests=[test_ids[t] for t in owned], created_at=iso(_ctx["now"], _ctx["days"], rng)
+        )
+        user["id"] = stable_id(seed, "user", i)
+        docs.append(user)
+    return (docs,)
+
+
+def _answer_masks(key: ScoringKey, correct_index: np.ndarray, difficulty: np.ndarray,
+                  ability: np.ndarray, rng: np.random.Generator) -> np.ndarray:
+    # One row per attempt. Rasch-style: P(correct) = sigmoid(ability -
+    # difficulty). Skipped questions stay 0; a wrong MCQ answer picks another
+    # option and a wrong MSQ answer toggles one option of the key.
+    shape = (len(ability), len(key))
+    answered = rng.random(shape) < 0.85
+    correct = rng.random(shape) < 1 / (1 + np.exp(difficulty - ability[:, None]))
+    shift = rng.integers(1, len(OPTIONS), shape)
+    toggle = rng.integers(0, len(OPTIONS), shape)
+    msq_wrong = key.correct ^ np.left_shift(1, toggle)
+    # Toggling a one-option key's only option would leave the answer blank
+    msq_wrong = np.where(msq_wrong == 0, key.correct ^ np.left_shift(1, (toggle + 1) % len(OPTIONS)), msq_wrong)
+    wrong = np.where(key.is_msq, msq_wrong, np.left_shift(1, (correct_index + shift) % len(OPTIONS)))
+    return np.where(answered, np.where(correct, key.correct, wrong), 0).astype(np.int64)
+
+
+def attempt_batch(start: int, count: int, users: int) -> Tuple[List[dict], List[dict]]:
+    seed, keys = _ctx["seed"], _ctx["keys"]
+    rng = np.random.default_rng([seed, start])
+    py_rng = random.Random(f"{seed}:attempts:{start}")
+
+    user_index = rng.integers(users, size=count)
+    test_index = np.empty(count, dtype=np.int64)
+    ability = np.empty(count)
+    for i, u in enumerate(user_index):
+        owned, ability[i] = purchases(seed, int(u), len(keys))
+        test_index[i] = owned[py_rng.randrange(len(owned))]
+
+    # Attempts on the same test are generated and scored as one matrix
+    docs: List[dict] = [None] * count
+    details: List[dict] = [None] * count
+    for t in np.unique(test_index):
+        rows = np.flatnonzero(test_index == t)
+        key, layout = keys[t], _ctx["layouts"][t]
+        masks = _answer_masks(key, _ctx["correct_index"][t], _ctx["difficulty"][t], ability[rows], rng)
+        result = key.score(masks)
+        times = rng.integers(len(key) * 30, len(key) * 170, len(rows))
+        for j, row in enumerate(rows):
+            summary = result.summary(j)
+            doc = make_attempt(
+                stable_id(seed, "user", int(user_index[row])), _ctx["test_ids"][t],
+                score=summary["score"], accuracy=summary["accuracy"], total_time=int(times[j]),
+                sections=summary["sections"], created_at=iso(_ctx["now"], _ctx["days"], py_rng)
+            )
+            doc["id"] = stable_id(seed, "attempt", start + int(row))
+            docs[row] = doc
+            details[row] = details_document(doc["id"], layout, masks[j])
+    return docs, details
+
+
+async def produce(label: str, collections: Sequence, pool: ProcessPoolExecutor, build, total: int,
+                  batch_size: int, in_flight: int, *extra):
+    # Up to `in_flight` batches are being built or written at once; each is
+    # written with one unordered insert_many per collection as soon as its
+    # worker returns it. `build` returns one list of documents per collection.
+    loop = asyncio.get_running_loop()
+    semaphore = asyncio.Semaphore(in_flight)
+    written = 0
+    started = time.perf_counter()
+
+    async def batch(start: int):
+        nonlocal written
+        async with semaphore:
+            batches = await loop.run_in_executor(pool, build, start, min(batch_size, total - start), *extra)
+            await asyncio.gather(*[
+                collection.insert_many(docs, ordered=False) for collection, docs in zip(collections, batches)
+            ])
+        written += len(batches[0])
+        if written % (batch_size * 10) < len(batches[0]) or written == total:
+            elapsed = time.perf_counter() - started
+            print(f"  {label}: {written}/{total} ({written / elapsed:,.0f} docs/s)")
+
+    await asyncio.gather(*[batch(start) for start in range(0, total, batch_size)])
+
+
+async def derive(db, tests: List[dict], questions: List[dict]):
+    # Score indexes, dashboard rollups and user stats would otherwise be
+    # rebuilt lazily by the first requests that need them. Generated
+    # attempts are written with percentile 0; here they get their
+    # percentile within the whole test, as after a rescore.
+    print("Rebuilding score indexes and percentiles...")
+    by_test: Dict[str, List[dict]] = {}
+    for q in questions:
+        by_test.setdefault(q["testId"], []).append(q)
+    index = ScoreIndex(db)
+    for test in tests:
+        lower, upper = score_bounds(by_test[test["id"]])
+        dist = await index.rebuild(test["id"], lower, upper)
+        await update_percentiles(db, test["id"], dist)
+    print("Rebuilding dashboard rollups...")
+    await rebuild_rollups(db)
+    print("Backfilling user stats...")
+    await backfill_all(db)
+
+
+async def generated(db, seed: int, tests: int, users: int) -> bool:
+    # Ids follow --seed but emails do not, so a second run clashes with the
+    # first on unique keys whatever its seed
+    if tests and await db.tests.find_one({"id": stable_id(seed, "test", 0)}, {"_id": 1}):
+        return True
+    return bool(users and await db.users.find_one({"email": "user0@mockme-synthetic.com"}, {"_id": 1}))
+
+
+async def main(args):
+    load_dotenv(Path(__file__).parent / '.env')
+    client = AsyncIOMotorClient(args.mongo_url or os.environ['MONGO_URL'])
+    db = client[args.db_name or os.environ['DB_NAME']]
+
+    if args.drop:
+        for name in ["users", "tests", "questions", "attempts", "attempt_details", "attempt_layouts",
+                     "score_index", "stats_rollups"]:
+            await db[name].drop()
+    elif await generated(db, args.seed, args.tests, args.users):
+        raise SystemExit(f"{db.name} already holds generated data; rerun with --drop to replace it")
+    await ensure_indexes(db)
+
+    # One hash for every synthetic user: bcrypt per document would dominate
+    password_hash = CryptContext(schemes=["bcrypt"], bcrypt__rounds=args.bcrypt_rounds).hash(args.password)
+
+    started = time.perf_counter()
+    tests, questions = build_catalog(args.seed, args.tests, args.questions_per_test, args.days)
+    await db.tests.insert_many(tests, ordered=False)
+    for start in range(0, len(questions), args.batch_size):
+        await db.questions.insert_many(
+            [{k: v for k, v in q.items() if k != "_difficulty"} for q in questions[start:start + args.batch_size]],
+            ordered=False
+        )
+    by_test: Dict[str, List[dict]] = {}
+    for q in questions:
+        by_test.setdefault(q["testId"], []).append(q)
+    if tests:
+        await db.attempt_layouts.insert_many(
+            [Layout.from_questions(t["id"], by_test[t["id"]]).document() for t in tests], ordered=False
+        )
+    print(f"✓ {len(tests)} tests, {len(questions)} questions")
+
+    in_flight = args.producers * 2
+    with ProcessPoolExecutor(
+        max_workers=args.producers,
+        initializer=_init_worker,
+        initargs=(args.seed, tests, questions, password_hash, args.days)
+    ) as pool:
+        await produce("users", [db.users], pool, user_batch, args.users, args.batch_size, in_flight)
+        print(f"✓ {args.users} users (password: {args.password})")
+        if args.users and args.tests:
+            await produce("attempts", [db.attempts, db.attempt_details], pool, attempt_batch, args.attempts,
+                          args.batch_size, in_flight, args.users)
+            print(f"✓ {args.attempts} attempts")
+
+    if args.derive:
+        await derive(db, tests, questions)
+
+    print(f"\n✅ Generated in {time.perf_counter() - started:.1f}s")
+    client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a large synthetic MockME dataset")
+    parser.add_argument("--users", type=int, default=100_000)
+    parser.add_argument("--tests", type=int, default=500)
+    parser.add_argument("--questions-per-test", type=int, default=0, help="default: per exam type (65-75)")
+    parser.add_argument("--attempts", type=int, default=500_000)
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument("--producers", type=int, default=os.cpu_count() or 4, help="worker processes building documents")
+    parser.add_argument("--days", type=int, default=365, help="spread createdAt over this many past days")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--password", default="password123")
+    parser.add_argument("--bcrypt-rounds", type=int, default=12)
+    parser.add_argument("--derive", action="store_true", help="also rebuild score indexes, rollups and user stats")
+    parser.add_argument("--drop", action="store_true", help="drop the generated collections first")
+    parser.add_argument("--mongo-url", help="default: MONGO_URL")
+    parser.add_argument("--db-name", help="default: DB_NAME")
+    asyncio.run(main(parser.parse_args()))
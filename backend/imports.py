@@ -0,0 +1,255 @@
+import csv
+import json
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Set, Tuple
+
+from pydantic import ValidationError
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+IMPORT_CHUNK_SIZE = 1000
+MAX_REPORTED_ERRORS = 1000
+
+# One row per question. Rows with a `testId` are appended to that existing
+# test; other rows are grouped into new tests by `testKey` (or `title`), and
+# the first row of each group supplies the test fields.
+TEST_FIELDS = ("title", "subject", "type", "duration", "rules", "price", "examType")
+QUESTION_FIELDS = ("text", "options", "correctAnswer", "explanation", "questionType",
+                   "marks", "negativeMarks", "section")
+
+# Columns that may hold a list or object, written as JSON in CSV cells;
+# every other column is taken as text
+STRUCTURED_FIELDS = ("options", "correctAnswer", "rules")
+
+Row = Tuple[int, Any]
+
+
+async def _lines(stream: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    buffer = b""
+    async for chunk in stream:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            yield line.decode("utf-8-sig").rstrip("\r")
+    if buffer:
+        yield buffer.decode("utf-8-sig").rstrip("\r")
+
+
+async def ndjson_rows(stream: AsyncIterator[bytes]) -> AsyncIterator[Row]:
+    # Yields (line number, object); a line that is not a JSON object is
+    # yielded as the exception so it lands in the error report
+    number = 0
+    async for line in _lines(stream):
+        number += 1
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+            if not isinstance(row, dict):
+                raise ValueError("Expected a JSON object")
+        except ValueError as e:
+            row = e
+        yield number, row
+
+
+async def csv_rows(stream: AsyncIterator[bytes]) -> AsyncIterator[Row]:
+    # Physical lines are joined until their quotes balance, so quoted cells
+    # may contain newlines. Numbers are data rows after the header.
+    header: Optional[List[str]] = None
+    record = ""
+    number = 0
+    async for line in _lines(stream):
+        record = f"{record}\n{line}" if record else line
+        if record.count('"') % 2:
+            continue
+        cells, record = next(csv.reader([record])), ""
+        if header is None:
+            header = [c.strip() for c in cells]
+            continue
+        number += 1
+        if any(cells):
+            yield number, {k: v for k, v in zip(header, cells) if v != ""}
+    if record:
+        yield number + 1, ValueError("Unterminated quoted field")
+
+
+def _cell(key: str, value: Any) -> Any:
+    # Structured cells holding lists or objects are JSON; options and MSQ
+    # answers may also be written as a|b|c
+    if key in STRUCTURED_FIELDS and isinstance(value, str):
+        text = value.strip()
+        if text[:1] in ("[", "{"):
+            try:
+                return json.loads(text)
+            except ValueError:
+                raise ValueError(f"{key} is not valid JSON")
+    return value
+
+
+def parse_test(row: Dict[str, Any]) -> Dict[str, Any]:
+    fields = {k: _cell(k, row[k]) for k in TEST_FIELDS if k in row}
+    if not fields.get("title"):
+        raise ValueError("title is required for a new test")
+    return fields
+
+
+def parse_question(row: Dict[str, Any]) -> Dict[str, Any]:
+    fields = {k: _cell(k, row[k]) for k in QUESTION_FIELDS if k in row}
+    if not str(fields.get("text", "")).strip():
+        raise ValueError("text is required")
+
+    options = fields.get("options")
+    if isinstance(options, str):
+        options = options.split("|")
+    if not isinstance(options, list) or len(options) < 2:
+        raise ValueError("options must list at least two choices")
+    fields["options"] = [str(o) for o in options]
+
+    question_type = fields.setdefault("questionType", "MCQ")
+    if question_type not in ("MCQ", "MSQ"):
+        raise ValueError("questionType must be MCQ or MSQ")
+
+    answer = fields.get("correctAnswer")
+    if isinstance(answer, str):
+        answer = answer.split("|") if question_type == "MSQ" else answer.strip()
+    try:
+        answer = [int(a) for a in answer] if question_type == "MSQ" else int(answer)
+    except (TypeError, ValueError):
+        raise ValueError("correctAnswer must be an option index (a list of them for MSQ)")
+    indexes = answer if question_type == "MSQ" else [answer]
+    if not indexes or any(not 0 <= i < len(options) for i in indexes):
+        raise ValueError("correctAnswer is out of range for the options")
+    fields["correctAnswer"] = answer
+    return fields
+
+
+def error_message(error: Exception) -> str:
+    if isinstance(error, ValidationError):
+        return "; ".join(f"{'.'.join(str(p) for p in e['loc'])}: {e['msg']}" for e in error.errors())
+    return str(error)
+
+
+class TestImporter:
+    # Validates rows a chunk at a time and writes each chunk's questions with
+    # one unordered insert_many; new tests are inserted and existing ones
+    # extended once every row has been read. Rows that fail validation or
+    # the write are reported and skipped, the rest are kept.
+
+    def __init__(self, db, new_test: Callable[[Dict[str, Any]], Dict[str, Any]],
+                 new_question: Callable[[str, Dict[str, Any]], Dict[str, Any]],
+                 chunk_size: int = IMPORT_CHUNK_SIZE):
+        self.db = db
+        self.new_test = new_test
+        self.new_question = new_question
+        self.chunk_size = chunk_size
+        self.rows = 0
+        self.inserted = 0
+        self.failed = 0
+        self.errors: List[Dict[str, Any]] = []
+        self._chunk: List[Row] = []
+        self._new_tests: Dict[str, Dict[str, Any]] = {}  # by testKey
+        self._new_by_id: Dict[str, Dict[str, Any]] = {}
+        self._existing: Dict[str, List[str]] = {}
+        self._missing: Set[str] = set()
+
+    @property
+    def touched(self) -> List[str]:
+        return [t["id"] for t in self._new_tests.values()] + list(self._existing)
+
+    def _error(self, row: int, error: Any):
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            message = error_message(error) if isinstance(error, Exception) else str(error)
+            self.errors.append({"row": row, "error": message})
+
+    async def add(self, number: int, row: Any):
+        self.rows += 1
+        self._chunk.append((number, row))
+        if len(self._chunk) >= self.chunk_size:
+            await self._flush()
+
+    def _test_for(self, row: Dict[str, Any]) -> Tuple[str, Optional[Dict[str, Any]]]:
+        test_id = row.get("testId")
+        if test_id:
+            if not isinstance(test_id, str) or test_id not in self._existing:
+                raise ValueError(f"Unknown testId {test_id}")
+            return test_id, None
+        key = str(row.get("testKey") or row.get("title") or "")
+        if not key:
+            raise ValueError("testId, testKey or title is required")
+        test = self._new_tests.get(key)
+        if test is None:
+            test = self.new_test(parse_test(row))
+        return test["id"], (key, test)
+
+    async def _flush(self):
+        chunk, self._chunk = self._chunk, []
+        unknown = {
+            row["testId"] for _, row in chunk
+            if isinstance(row, dict) and isinstance(row.get("testId"), str) and row["testId"]
+            and row["testId"] not in self._existing and row["testId"] not in self._missing
+        }
+        if unknown:
+            found = await self.db.tests.find({"id": {"$in": list(unknown)}}, {"_id": 0, "id": 1}).to_list(None)
+            for test in found:
+                self._existing[test["id"]] = []
+            self._missing |= unknown - {t["id"] for t in found}
+
+        docs: List[Dict[str, Any]] = []
+        placed: List[Tuple[int, str]] = []
+        for number, row in chunk:
+            if isinstance(row, Exception):
+                self._error(number, row)
+                continue
+            try:
+                test_id, new = self._test_for(row)
+                question = self.new_question(test_id, parse_question(row))
+            except (ValueError, TypeError) as e:
+                self._error(number, e)
+                continue
+            if new and new[0] not in self._new_tests:
+                self._new_tests[new[0]] = self._new_by_id[test_id] = new[1]
+            docs.append(question)
+            placed.append((number, test_id))
+        if not docs:
+            return
+
+        write_errors: Dict[int, str] = {}
+        try:
+            await self.db.questions.insert_many(docs, ordered=False)
+        except BulkWriteError as e:
+            write_errors = {err["index"]: err.get("errmsg", "write failed") for err in e.details["writeErrors"]}
+
+        for index, (question, (number, test_id)) in enumerate(zip(docs, placed)):
+            if index in write_errors:
+                self._error(number, write_errors[index])
+                continue
+            self.inserted += 1
+            if test_id in self._existing:
+                self._existing[test_id].append(question["id"])
+            else:
+                self._new_by_id[test_id]["questions"].append(question["id"])
+
+    async def finish(self) -> Dict[str, Any]:
+        if self._chunk:
+            await self._flush()
+
+        # A new test whose questions all failed is not created
+        tests = [t for t in self._new_tests.values() if t["questions"]]
+        if tests:
+            await self.db.tests.insert_many(tests, ordered=False)
+        updates = [
+            UpdateOne({"id": test_id}, {"$push": {"questions": {"$each": ids}}})
+            for test_id, ids in self._existing.items() if ids
+        ]
+        if updates:
+            await self.db.tests.bulk_write(updates, ordered=False)
+
+        return {
+            "rows": self.rows,
+            "questionsImported": self.inserted,
+            "testsCreated": len(tests),
+            "testsUpdated": len(updates),
+            "failed": self.failed,
+            "errors": self.errors,
+            "errorsTruncated": self.failed > len(self.errors)
+        }
@@ -0,0 +1,127 @@
+import logging
+from typing import Dict, List
+
+from pymongo import ASCENDING, TEXT, IndexModel
+from pymongo.errors import OperationFailure
+
+logger = logging.getLogger(__name__)
+
+# Token documents carry an `expiresAt` date; TTL indexes with
+# expireAfterSeconds=0 drop them once that moment has passed.
+INDEXES: Dict[str, List[IndexModel]] = {
+    "users": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("email", ASCENDING)], name="email_unique", unique=True),
+    ],
+    "tests": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("examType", ASCENDING), ("type", ASCENDING)], name="examType_type"),
+        IndexModel([("createdAt", ASCENDING), ("id", ASCENDING)], name="createdAt_id"),
+        IndexModel(
+            [("title", TEXT), ("subject", TEXT), ("examType", TEXT)],
+            name="text", weights={"title": 10, "subject": 5, "examType": 5}
+        ),
+    ],
+    "questions": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("testId", ASCENDING)], name="testId"),
+        IndexModel(
+            [("text", TEXT), ("options", TEXT), ("explanation", TEXT)],
+            name="text", weights={"text": 10, "options": 3, "explanation": 1}
+        ),
+    ],
+    "attempts": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("testId", ASCENDING), ("score", ASCENDING)], name="testId_score"),
+        # Walks a test's attempts in a fixed order while rescoring rewrites score
+        IndexModel([("testId", ASCENDING), ("_id", ASCENDING)], name="testId__id"),
+        IndexModel([("userId", ASCENDING), ("createdAt", ASCENDING)], name="userId_createdAt"),
+    ],
+    "attempt_details": [
+        IndexModel([("attemptId", ASCENDING)], name="attemptId_unique", unique=True),
+    ],
+    "attempt_layouts": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+    ],
+    "exam_sessions": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("userId", ASCENDING), ("testId", ASCENDING), ("status", ASCENDING)], name="userId_testId_status"),
+        IndexModel([("deadline", ASCENDING)], name="deadline"),
+    ],
+    "submission_queue": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("attemptId", ASCENDING)], name="attemptId_unique", unique=True),
+        IndexModel([("status", ASCENDING), ("createdAt", ASCENDING)], name="status_createdAt"),
+    ],
+    "payments": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel(
+            [("userId", ASCENDING), ("status", ASCENDING), ("createdAt", ASCENDING), ("id", ASCENDING)],
+            name="userId_status_createdAt_id"
+        ),
+        IndexModel([("status", ASCENDING), ("createdAt", ASCENDING)], name="status_createdAt"),
+    ],
+    "payment_tokens": [
+        IndexModel([("token", ASCENDING)], name="token_unique", unique=True),
+        IndexModel([("expiresAt", ASCENDING)], name="expiresAt_ttl", expireAfterSeconds=0),
+    ],
+    "coupons": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("code", ASCENDING)], name="code_unique", unique=True),
+        IndexModel([("createdAt", ASCENDING), ("id", ASCENDING)], name="createdAt_id"),
+    ],
+    "verification_tokens": [
+        IndexModel([("token", ASCENDING)], name="token_unique", unique=True),
+        IndexModel([("expiresAt", ASCENDING)], name="expiresAt_ttl", expireAfterSeconds=0),
+    ],
+    "reset_tokens": [
+        IndexModel([("token", ASCENDING)], name="token_unique", unique=True),
+        IndexModel([("expiresAt", ASCENDING)], name="expiresAt_ttl", expireAfterSeconds=0),
+    ],
+    "twofa_codes": [
+        IndexModel([("email", ASCENDING), ("code", ASCENDING)], name="email_code"),
+        IndexModel([("expiresAt", ASCENDING)], name="expiresAt_ttl", expireAfterSeconds=0),
+    ],
+    "settings": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+    ],
+    "jobs": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("createdAt", ASCENDING)], name="createdAt"),
+    ],
+    "maintenance_runs": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("startedAt", ASCENDING)], name="startedAt"),
+    ],
+    "maintenance_locks": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+    ],
+    "stats_rollups": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+    ],
+    "score_index": [
+        IndexModel([("testId", ASCENDING)], name="testId_unique", unique=True),
+    ],
+}
+
+
+async def ensure_indexes(db) -> Dict[str, Dict[str, List[str]]]:
+    report = {}
+    for collection, models in INDEXES.items():
+        declared = [model.document["name"] for model in models]
+        for model in models:
+            try:
+                await db[collection].create_indexes([model])
+            except OperationFailure as e:
+                # Usually duplicate data blocking a unique index; keep serving
+                logger.error(f"Could not create index {model.document['name']} on {collection}: {e}")
+
+        existing = await db[collection].index_information()
+        missing = [name for name in declared if name not in existing]
+        extra = [name for name in existing if name != "_id_" and name not in declared]
+        if missing:
+            logger.warning(f"Missing indexes on {collection}: {', '.join(missing)}")
+        if extra:
+            logger.info(f"Undeclared indexes on {collection}: {', '.join(extra)}")
+        report[collection] = {"missing": missing, "extra": extra}
+    return report
@@ -0,0 +1,306 @@
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+from pymongo import monitoring
+from pymongo.common import MAX_POOL_SIZE
+
+# Minimal in-process metrics with Prometheus text exposition. Updates take a
+# per-metric lock because Mongo command events arrive on Motor's executor
+# threads.
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COMMAND_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+CHECKOUT_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+
+Labels = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{n}="{_escape(str(v))}"' for n, v in zip(names, values)) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def samples(self) -> Iterator[Tuple[str, str, float]]:
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(f"{name}{labels} {_format_value(value)}" for name, labels, value in self.samples())
+        return lines
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Labels, float] = {}
+
+    def inc(self, *labels: str, amount: float = 1.0):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def total(self) -> float:
+        with self._lock:
+            return sum(self._values.values())
+
+    def samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        for labels, value in items:
+            yield self.name, _format_labels(self.labelnames, labels), value
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, *labels: str, amount: float = 1.0):
+        self.inc(*labels, amount=-amount)
+
+    def set(self, *labels: str, value: float):
+        with self._lock:
+            self._values[labels] = value
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # labels -> [per-bucket counts (last one is +Inf), sum]
+        self._values: Dict[Labels, list] = {}
+
+    def observe(self, value: float, *labels: str):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(labels)
+            if entry is None:
+                entry = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            entry[0][index] += 1
+            entry[1] += value
+
+    def samples(self):
+        with self._lock:
+            items = [(labels, list(counts), total) for labels, (counts, total) in self._values.items()]
+        names = self.labelnames + ("le",)
+        for labels, counts, total in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                yield f"{self.name}_bucket", _format_labels(names, labels + (_format_value(bound),)), cumulative
+            yield f"{self.name}_sum", _format_labels(self.labelnames, labels), total
+            yield f"{self.name}_count", _format_labels(self.labelnames, labels), cumulative
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: List[Metric] = []
+
+    def register(self, metric: Metric) -> Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, *args, **kwargs) -> Counter:
+        return self.register(Counter(*args, **kwargs))
+
+    def gauge(self, *args, **kwargs) -> Gauge:
+        return self.register(Gauge(*args, **kwargs))
+
+    def histogram(self, *args, **kwargs) -> Histogram:
+        return self.register(Histogram(*args, **kwargs))
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+http_requests = REGISTRY.counter(
+    "http_requests_total", "HTTP requests by route template and status", ("method", "route", "status"))
+http_duration = REGISTRY.histogram(
+    "http_request_duration_seconds", "HTTP request latency", ("method", "route"))
+http_in_progress = REGISTRY.gauge(
+    "http_requests_in_progress", "HTTP requests currently being served", ("method",))
+request_commands = REGISTRY.histogram(
+    "http_request_mongo_commands", "Mongo commands issued per HTTP request", ("method", "route"),
+    buckets=COUNT_BUCKETS)
+request_db_seconds = REGISTRY.counter(
+    "http_request_mongo_seconds_total", "Time spent in Mongo commands by route", ("method", "route"))
+mongo_duration = REGISTRY.histogram(
+    "mongo_command_duration_seconds", "Mongo command round-trip time", ("command",),
+    buckets=COMMAND_BUCKETS)
+mongo_failures = REGISTRY.counter(
+    "mongo_command_failures_total", "Mongo commands that returned an error", ("command",))
+pool_checkout_wait = REGISTRY.histogram(
+    "mongo_pool_checkout_wait_seconds", "Time spent waiting for a pooled connection", ("address",),
+    buckets=CHECKOUT_BUCKETS)
+pool_checkout_failures = REGISTRY.counter(
+    "mongo_pool_checkout_failures_total", "Connection checkouts that failed", ("address", "reason"))
+pool_connections = REGISTRY.gauge(
+    "mongo_pool_connections", "Open connections per server", ("address",))
+pool_checked_out = REGISTRY.gauge(
+    "mongo_pool_checked_out", "Connections currently in use per server", ("address",))
+pool_max_size = REGISTRY.gauge(
+    "mongo_pool_max_size", "Configured maxPoolSize per server", ("address",))
+
+
+class RequestStats:
+    __slots__ = ("commands", "db_seconds")
+
+    def __init__(self):
+        self.commands = 0
+        self.db_seconds = 0.0
+
+
+# Motor runs pymongo calls on executor threads with a copy of the caller's
+# context, so command events can be attributed to the request that issued them
+current_request: ContextVar[Optional[RequestStats]] = ContextVar("current_request", default=None)
+
+
+class CommandMetrics(monitoring.CommandListener):
+    # Pass to the client as event_listeners=[...]
+
+    def started(self, event):
+        pass
+
+    def _finished(self, event):
+        seconds = event.duration_micros / 1e6
+        mongo_duration.observe(seconds, event.command_name)
+        stats = current_request.get()
+        if stats is not None:
+            stats.commands += 1
+            stats.db_seconds += seconds
+
+    def succeeded(self, event):
+        self._finished(event)
+
+    def failed(self, event):
+        mongo_failures.inc(event.command_name)
+        self._finished(event)
+
+
+def _address(address) -> str:
+    host, port = address
+    return f"{host}:{port}"
+
+
+class PoolMetrics(monitoring.ConnectionPoolListener):
+    # Pass to the client as event_listeners=[...]. A checkout runs start to
+    # finish on the thread that needs the connection, so the wait is timed
+    # with a thread-local start.
+    # The wait histogram's _count is the number of successful checkouts.
+
+    def __init__(self):
+        self._local = threading.local()
+
+    def pool_created(self, event):
+        # Only options that differ from pymongo's defaults are reported
+        pool_max_size.set(_address(event.address), value=event.options.get("maxPoolSize", MAX_POOL_SIZE))
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        pool_connections.inc(_address(event.address))
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        pool_connections.dec(_address(event.address))
+
+    def connection_check_out_started(self, event):
+        self._local.started = time.perf_counter()
+
+    def _waited(self) -> float:
+        started = getattr(self._local, "started", None)
+        self._local.started = None
+        return time.perf_counter() - started if started is not None else 0.0
+
+    def connection_checked_out(self, event):
+        address = _address(event.address)
+        pool_checkout_wait.observe(self._waited(), address)
+        pool_checked_out.inc(address)
+
+    def connection_check_out_failed(self, event):
+        self._local.started = None
+        pool_checkout_failures.inc(_address(event.address), event.reason)
+
+    def connection_checked_in(self, event):
+        pool_checked_out.dec(_address(event.address))
+
+
+class MetricsMiddleware:
+    # Plain ASGI middleware (no BaseHTTPMiddleware task/stream overhead).
+    # Routes are labelled by their template, e.g. /api/tests/{test_id}, which
+    # FastAPI leaves in the scope once the router has matched.
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status = "500"
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = str(message["status"])
+            await send(message)
+
+        stats = RequestStats()
+        token = current_request.set(stats)
+        http_in_progress.inc(method)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            http_in_progress.dec(method)
+            current_request.reset(token)
+            route = scope.get("route")
+            route = getattr(route, "path", None) or "unmatched"
+            http_requests.inc(method, route, status)
+            http_duration.observe(elapsed, method, route)
+            request_commands.observe(stats.commands, method, route)
+            request_db_seconds.inc(method, route, amount=stats.db_seconds)
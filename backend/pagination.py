@@ -0,0 +1,79 @@
+import base64
+import json
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence
+
+from fastapi import HTTPException
+from fastapi.responses import ORJSONResponse
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+SORT_KEY = [("createdAt", 1), ("id", 1)]
+
+
+@dataclass
+class Page:
+    items: List[Dict[str, Any]]
+    next_cursor: Optional[str]
+    total: Optional[int] = None
+
+    @property
+    def headers(self) -> Dict[str, str]:
+        # List endpoints keep returning a bare array; paging metadata rides
+        # in headers so existing clients are unaffected
+        headers = {}
+        if self.next_cursor:
+            headers["X-Next-Cursor"] = self.next_cursor
+        if self.total is not None:
+            headers["X-Total-Count"] = str(self.total)
+        return headers
+
+    def to_response(self) -> ORJSONResponse:
+        # Returned directly, skipping response_model validation of every item
+        return ORJSONResponse(self.items, headers=self.headers)
+
+
+def encode_cursor(doc: Dict[str, Any]) -> str:
+    raw = json.dumps([doc.get("createdAt"), doc.get("id")], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Dict[str, Any]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, doc_id = json.loads(base64.urlsafe_b64decode(padded))
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return {"$or": [
+        {"createdAt": {"$gt": created_at}},
+        {"createdAt": created_at, "id": {"$gt": doc_id}}
+    ]}
+
+
+def parse_fields(fields: Optional[str], hidden: Sequence[str] = ()) -> Optional[List[str]]:
+    if not fields:
+        return None
+    return [f for f in (part.strip() for part in fields.split(",")) if f and f != "_id" and f not in hidden]
+
+
+async def paginate(collection, query: Dict[str, Any], *, limit: int = DEFAULT_PAGE_SIZE,
+                   after: Optional[str] = None, fields: Optional[List[str]] = None,
+                   exclude: Sequence[str] = (), with_total: bool = False) -> Page:
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+
+    if fields:
+        # The sort key is always returned so the next cursor can be built
+        projection = {"_id": 0, "id": 1, "createdAt": 1, **{f: 1 for f in fields}}
+    else:
+        projection = {"_id": 0, **{f: 0 for f in exclude}}
+
+    page_query = {"$and": [query, decode_cursor(after)]} if after else query
+    items = await collection.find(page_query, projection).sort(SORT_KEY).limit(limit + 1).to_list(limit + 1)
+
+    next_cursor = None
+    if len(items) > limit:
+        items = items[:limit]
+        next_cursor = encode_cursor(items[-1])
+
+    total = await collection.count_documents(query) if with_total else None
+    return Page(items=items, next_cursor=next_cursor, total=total)
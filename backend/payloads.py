@@ -0,0 +1,41 @@
+import hashlib
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional
+
+import orjson
+from fastapi import Request, Response
+
+JSON_MEDIA_TYPE = "application/json"
+
+
+@dataclass(frozen=True)
+class CachedBody:
+    # A response body serialized once and served many times, with a strong
+    # ETag derived from its bytes and headers
+    body: bytes
+    etag: str
+    headers: Dict[str, str] = field(default_factory=dict)
+
+    @classmethod
+    def of(cls, content: Any, headers: Optional[Dict[str, str]] = None) -> "CachedBody":
+        body = orjson.dumps(content)
+        headers = headers or {}
+        # Headers such as X-Total-Count are part of the representation too
+        digest = hashlib.blake2b(body, digest_size=16)
+        digest.update(orjson.dumps(headers, option=orjson.OPT_SORT_KEYS))
+        return cls(body=body, etag=f'"{digest.hexdigest()}"', headers=headers)
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    # If-None-Match uses weak comparison
+    return "*" in candidates or etag in (tag[2:] if tag.startswith("W/") else tag for tag in candidates)
+
+
+def cached_response(request: Request, cached: CachedBody, cache_control: str = "no-cache") -> Response:
+    headers = {**cached.headers, "ETag": cached.etag, "Cache-Control": cache_control}
+    if etag_matches(request.headers.get("if-none-match"), cached.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(cached.body, media_type=JSON_MEDIA_TYPE, headers=headers)
@@ -0,0 +1,254 @@
+import asyncio
+import json
+import logging
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from pymongo import monitoring
+
+logger = logging.getLogger(__name__)
+
+# Commands whose explain output is worth checking for collection scans
+EXPLAINABLE = {"find", "aggregate", "count", "distinct"}
+IGNORED = {"explain", "endSessions", "hello", "isMaster", "ping", "getMore", "killCursors"}
+MAX_EXPLAINED_SHAPES = 10000
+
+
+def query_shape(value: Any) -> Any:
+    # Field names and operators of a filter with every literal replaced, so
+    # {"id": "a"} and {"id": "b"} count as the same query
+    if isinstance(value, dict):
+        return {k: query_shape(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [query_shape(v) for v in value[:1]]
+    return 1
+
+
+def _filter_of(name: str, command: Dict[str, Any]) -> Any:
+    if name in ("find", "count", "distinct", "findAndModify"):
+        return command.get("filter", command.get("query"))
+    if name == "aggregate":
+        return command.get("pipeline")
+    if name in ("update", "delete"):
+        ops = command.get("updates") or command.get("deletes") or [{}]
+        return ops[0].get("q")
+    return None
+
+
+@dataclass
+class CommandRecord:
+    name: str
+    collection: str
+    shape: str
+    command: Optional[Dict[str, Any]] = None
+    seconds: float = 0.0
+    failed: bool = False
+
+    @property
+    def key(self) -> Tuple[str, str, str]:
+        return self.name, self.collection, self.shape
+
+
+@dataclass
+class QueryTrace:
+    commands: List[CommandRecord] = field(default_factory=list)
+    pending: Dict[int, CommandRecord] = field(default_factory=dict)
+
+    @property
+    def db_ms(self) -> float:
+        return sum(c.seconds for c in self.commands) * 1000
+
+    def repeats(self) -> List[Tuple[Tuple[str, str, str], int]]:
+        return Counter(c.key for c in self.commands).most_common()
+
+    def summary(self, limit: int = 5) -> str:
+        top = ", ".join(f"{name} {coll} x{n}" for (name, coll, _), n in self.repeats()[:limit])
+        return f"{len(self.commands)} commands, {self.db_ms:.1f}ms in Mongo ({top})"
+
+
+# The trace for the current request (or query_budget block). Motor runs
+# pymongo calls on executor threads with a copy of this context.
+current_trace: ContextVar[Optional[QueryTrace]] = ContextVar("current_trace", default=None)
+
+# Budgets currently open; traces of requests that finish while a budget is
+# open are charged to it, which covers TestClient running the app on a
+# different thread
+_budgets: List[List[QueryTrace]] = []
+_budgets_lock = threading.Lock()
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+@contextmanager
+def query_budget(max_commands: Optional[int] = None, max_db_ms: Optional[float] = None,
+                 max_repeats: Optional[int] = None) -> Iterator[List[QueryTrace]]:
+    # Fails the block when the requests (and direct DB calls) made inside it
+    # go over budget:
+    #
+    #     with query_budget(max_commands=4, max_repeats=1):
+    #         client.post("/api/admin/tests", json=payload, headers=admin)
+    traces: List[QueryTrace] = [QueryTrace()]
+    token = current_trace.set(traces[0])
+    with _budgets_lock:
+        _budgets.append(traces)
+    try:
+        yield traces
+    finally:
+        current_trace.reset(token)
+        with _budgets_lock:
+            _budgets.remove(traces)
+
+    combined = QueryTrace(commands=[c for t in traces for c in t.commands])
+    problems = []
+    if max_commands is not None and len(combined.commands) > max_commands:
+        problems.append(f"{len(combined.commands)} commands > {max_commands}")
+    if max_db_ms is not None and combined.db_ms > max_db_ms:
+        problems.append(f"{combined.db_ms:.1f}ms in Mongo > {max_db_ms}ms")
+    if max_repeats is not None:
+        problems.extend(
+            f"{name} on {coll} repeated {n}x > {max_repeats}"
+            for (name, coll, _), n in combined.repeats() if n > max_repeats
+        )
+    if problems:
+        raise QueryBudgetExceeded(f"Query budget exceeded: {'; '.join(problems)} [{combined.summary()}]")
+
+
+class QueryAuditor(monitoring.CommandListener):
+    # Records every command issued within a request. When `enabled`, requests
+    # over `max_commands` round trips or `max_db_ms` of Mongo time, or that
+    # repeat one query shape `repeat_threshold` times (an N+1 loop), are
+    # logged, and read shapes not seen before are explained once to log
+    # COLLSCANs. Recording also runs inside query_budget blocks when disabled.
+
+    def __init__(self, enabled: bool = False, max_commands: int = 25, max_db_ms: float = 200.0,
+                 repeat_threshold: int = 10, explain: bool = True):
+        self.enabled = enabled
+        self.max_commands = max_commands
+        self.max_db_ms = max_db_ms
+        self.repeat_threshold = repeat_threshold
+        self.explain = explain
+        self.db = None  # set once the client exists; used for explain
+        self.flagged = 0
+        self.collscans = 0
+        self._explained = set()
+        self._tasks = set()
+
+    def started(self, event):
+        trace = current_trace.get()
+        if trace is None or event.command_name in IGNORED:
+            return
+        name = event.command_name
+        command = event.command
+        record = CommandRecord(
+            name=name,
+            collection=str(command.get(name, "")),
+            shape=json.dumps(query_shape(_filter_of(name, command)), sort_keys=True, default=str),
+            command=command if name in EXPLAINABLE else None
+        )
+        trace.pending[event.request_id] = record
+
+    def _finished(self, event, failed: bool):
+        trace = current_trace.get()
+        if trace is None:
+            return
+        record = trace.pending.pop(event.request_id, None)
+        if record is not None:
+            record.seconds = event.duration_micros / 1e6
+            record.failed = failed
+            trace.commands.append(record)
+
+    def succeeded(self, event):
+        self._finished(event, False)
+
+    def failed(self, event):
+        self._finished(event, True)
+
+    def review(self, label: str, trace: QueryTrace):
+        problems = []
+        if len(trace.commands) > self.max_commands:
+            problems.append(f"{len(trace.commands)} round trips")
+        if trace.db_ms > self.max_db_ms:
+            problems.append(f"{trace.db_ms:.0f}ms in Mongo")
+        problems.extend(
+            f"possible N+1: {name} on {coll} x{n}"
+            for (name, coll, _), n in trace.repeats() if n >= self.repeat_threshold
+        )
+        if problems:
+            self.flagged += 1
+            logger.warning(f"Slow request {label}: {'; '.join(problems)} [{trace.summary()}]")
+
+        if self.explain and self.db is not None:
+            fresh = []
+            for record in trace.commands:
+                if (record.command is not None and record.key not in self._explained
+                        and len(self._explained) < MAX_EXPLAINED_SHAPES):
+                    self._explained.add(record.key)
+                    fresh.append(record)
+            if fresh:
+                task = asyncio.create_task(self._explain(label, fresh))
+                self._tasks.add(task)
+                task.add_done_callback(self._tasks.discard)
+
+    async def _explain(self, label: str, records: List[CommandRecord]):
+        for record in records:
+            command = {k: v for k, v in record.command.items()
+                       if not k.startswith("$") and k not in ("lsid", "txnNumber", "readConcern")}
+            try:
+                plan = await self.db.command({"explain": command, "verbosity": "queryPlanner"})
+            except Exception as e:
+                logger.debug(f"Could not explain {record.name} on {record.collection}: {e}")
+                continue
+            if _has_stage(plan, "COLLSCAN"):
+                self.collscans += 1
+                logger.warning(
+                    f"COLLSCAN in {label}: {record.name} on {record.collection} with shape {record.shape}"
+                )
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "flaggedRequests": self.flagged,
+            "collscans": self.collscans,
+            "explainedShapes": len(self._explained)
+        }
+
+
+def _has_stage(plan: Any, stage: str) -> bool:
+    if isinstance(plan, dict):
+        return plan.get("stage") == stage or any(_has_stage(v, stage) for v in plan.values())
+    if isinstance(plan, list):
+        return any(_has_stage(v, stage) for v in plan)
+    return False
+
+
+class QueryAuditMiddleware:
+    # Gives each request its own trace while auditing is on or a budget is
+    # open; otherwise it only costs one attribute check
+
+    def __init__(self, app, auditor: QueryAuditor):
+        self.app = app
+        self.auditor = auditor
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not (self.auditor.enabled or _budgets):
+            await self.app(scope, receive, send)
+            return
+
+        trace = QueryTrace()
+        token = current_trace.set(trace)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            current_trace.reset(token)
+            with _budgets_lock:
+                for traces in _budgets:
+                    traces.append(trace)
+            if self.auditor.enabled:
+                route = getattr(scope.get("route"), "path", None) or scope["path"]
+                self.auditor.review(f"{scope['method']} {route}", trace)
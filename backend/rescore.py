@@ -0,0 +1,123 @@
+import logging
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List
+
+from pymongo import UpdateOne
+
+from attempt_store import AttemptStore
+from compiled_tests import CompiledTest
+from score_index import ScoreDistribution, ScoreIndex
+from user_stats import invalidate_user_stats
+
+logger = logging.getLogger(__name__)
+
+RESCORE_BATCH_SIZE = 1000
+
+
+async def _flush(db, updates: List[UpdateOne]):
+    if updates:
+        await db.attempts.bulk_write(updates, ordered=False)
+
+
+async def _report(db, job_id: str, fields: Dict[str, Any]):
+    await db.jobs.update_one({"id": job_id}, {"$set": fields})
+
+
+async def update_percentiles(db, test_id: str, dist: ScoreDistribution, batch_size: int = RESCORE_BATCH_SIZE):
+    # Every attempt of the test against the final distribution
+    updates = []
+    cursor = db.attempts.find({"testId": test_id}, {"_id": 1, "score": 1}, batch_size=batch_size)
+    async for doc in cursor:
+        updates.append(UpdateOne(
+            {"_id": doc["_id"]},
+            {"$set": {"percentile": dist.percentile(doc["score"])}}
+        ))
+        if len(updates) >= batch_size:
+            await _flush(db, updates)
+            updates = []
+    await _flush(db, updates)
+
+
+async def rescore_test(db, score_index: ScoreIndex, attempt_store: AttemptStore, compiled: CompiledTest, job_id: str,
+                       batch_size: int = RESCORE_BATCH_SIZE):
+    # Two streaming passes over the test's attempts: rescore against the
+    # current answer key, then recompute every percentile against the
+    # rebuilt distribution. Only one batch is held in memory at a time.
+    key = compiled.scoring_key
+    test_id = compiled.id
+    started = time.monotonic()
+    processed = 0
+
+    try:
+        total = await db.attempts.count_documents({"testId": test_id})
+        await _report(db, job_id, {
+            "status": "running",
+            "phase": "scoring",
+            "total": total,
+            "startedAt": datetime.now(timezone.utc).isoformat()
+        })
+
+        # Not via testId_score: updated scores would move documents ahead of
+        # the cursor and they would be rescored (and counted) again
+        batch = []
+        cursor = db.attempts.find(
+            {"testId": test_id}, {"_id": 1, "id": 1, "userId": 1, "answers": 1}, batch_size=batch_size
+        ).sort("_id", 1).hint("testId__id")
+        async for doc in cursor:
+            batch.append(doc)
+            if len(batch) >= batch_size:
+                processed += await _rescore_batch(db, attempt_store, key, batch)
+                batch = []
+                await _report(db, job_id, _progress(processed, started))
+        processed += await _rescore_batch(db, attempt_store, key, batch)
+        await _report(db, job_id, {**_progress(processed, started), "phase": "percentiles"})
+
+        dist = await score_index.rebuild(test_id, compiled.lower, compiled.upper)
+        await update_percentiles(db, test_id, dist, batch_size)
+
+        await _report(db, job_id, {
+            **_progress(processed, started),
+            "status": "completed",
+            "phase": "done",
+            "finishedAt": datetime.now(timezone.utc).isoformat()
+        })
+        logger.info(f"Rescored {processed} attempts for test {test_id} in {time.monotonic() - started:.1f}s")
+    except Exception as e:
+        logger.exception(f"Rescore job {job_id} for test {test_id} failed")
+        await _report(db, job_id, {
+            "status": "failed",
+            "error": str(e),
+            "finishedAt": datetime.now(timezone.utc).isoformat()
+        })
+
+
+async def _rescore_batch(db, attempt_store: AttemptStore, key, batch: List[Dict[str, Any]]) -> int:
+    if not batch:
+        return 0
+
+    result = key.score(await attempt_store.masks_for(batch, key))
+    updates = []
+    for i, doc in enumerate(batch):
+        summary = result.summary(i)
+        updates.append(UpdateOne(
+            {"_id": doc["_id"]},
+            {"$set": {
+                "score": summary["score"],
+                "accuracy": summary["accuracy"],
+                "sections": summary["sections"]
+            }}
+        ))
+    await _flush(db, updates)
+    # Running sums in users.stats are stale now; they rebuild on next use
+    await invalidate_user_stats(db, {doc["userId"] for doc in batch})
+    return len(batch)
+
+
+def _progress(processed: int, started: float) -> Dict[str, Any]:
+    elapsed = time.monotonic() - started
+    return {
+        "processed": processed,
+        "elapsedSeconds": round(elapsed, 2),
+        "attemptsPerSecond": round(processed / elapsed, 1) if elapsed > 0 else 0.0
+    }
@@ -0,0 +1,220 @@
+import asyncio
+import gzip
+import json
+import logging
+import time
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from pymongo.errors import DuplicateKeyError
+
+logger = logging.getLogger(__name__)
+
+RETENTION_BATCH_SIZE = 500
+BUSY_BACKOFF = 1.0
+DAYS_PER_MONTH = 30
+LOCK_ID = "retention"
+
+# query(now, cutoff) -> filter, or None to skip the rule this run. `cutoff`
+# is now minus AdminSettings.dataRetentionMonths, or None when retention is
+# switched off (0 months).
+Query = Callable[[datetime, Optional[datetime]], Optional[Dict[str, Any]]]
+
+
+@dataclass(frozen=True)
+class RetentionRule:
+    name: str
+    collection: str
+    query: Query
+    archive: bool = False  # written to the archive directory, if set, before deletion
+
+
+def expired_tokens(ttl: timedelta) -> Query:
+    # The TTL index only removes documents whose expiresAt is a date; older
+    # documents carry just a createdAt string and are aged out by that
+    def query(now: datetime, cutoff: Optional[datetime]):
+        return {"$or": [
+            {"expiresAt": {"$lt": now}},
+            {"expiresAt": {"$exists": False}, "createdAt": {"$lt": (now - ttl).isoformat()}}
+        ]}
+    return query
+
+
+def older_than(field: str, age: Optional[timedelta] = None, **match) -> Query:
+    # ISO timestamp `field` before now - age, or before the retention cutoff
+    # when no age is given
+    def query(now: datetime, cutoff: Optional[datetime]):
+        before = now - age if age is not None else cutoff
+        if before is None:
+            return None
+        return {**match, field: {"$lt": before.isoformat()}}
+    return query
+
+
+def _append_archive(path: Path, docs: List[Dict[str, Any]]):
+    # Each call adds a gzip member; concatenated members read back as one stream
+    lines = "".join(json.dumps(doc, default=str, separators=(",", ":")) + "\n" for doc in docs)
+    with gzip.open(path, "ab") as f:
+        f.write(lines.encode())
+
+
+class RetentionSweeper:
+    # Background task that removes expired and out-of-retention documents in
+    # batches of `batch_size`, at no more than `max_rate` documents a second,
+    # and backs off while `busy()` reports heavy traffic. Each run is
+    # recorded in `maintenance_runs`. A lease in `maintenance_locks` keeps
+    # several processes from sweeping in the same interval.
+
+    def __init__(self, db, rules: List[RetentionRule], interval: float = 3600.0,
+                 batch_size: int = RETENTION_BATCH_SIZE, max_rate: float = 1000.0,
+                 archive_dir: Optional[str] = None, busy: Optional[Callable[[], bool]] = None,
+                 initial_delay: float = 60.0, default_months: int = 12):
+        self.db = db
+        self.rules = rules
+        self.interval = interval
+        self.batch_size = batch_size
+        self.max_rate = max_rate
+        self.archive_dir = Path(archive_dir) if archive_dir else None
+        self.busy = busy
+        self.initial_delay = initial_delay
+        self.default_months = default_months
+        self.owner = str(uuid.uuid4())
+        self.runs = 0
+        self.removed = 0
+        self._wakeup = asyncio.Event()
+        self._forced = False
+        self._task: Optional[asyncio.Task] = None
+
+    async def retention_months(self) -> int:
+        # default_months mirrors AdminSettings for when none have been saved
+        settings = await self.db.settings.find_one({"id": "settings"}, {"_id": 0, "dataRetentionMonths": 1})
+        return int((settings or {}).get("dataRetentionMonths", self.default_months))
+
+    async def _acquire(self, now: datetime, force: bool) -> bool:
+        # The lease runs for one interval, so the cluster sweeps once per
+        # interval whichever process gets there first
+        lease = {"$set": {"owner": self.owner, "until": now + timedelta(seconds=self.interval)}}
+        query = {"id": LOCK_ID} if force else {"id": LOCK_ID, "until": {"$lt": now}}
+        try:
+            await self.db.maintenance_locks.update_one(query, lease, upsert=True)
+        except DuplicateKeyError:
+            return False
+        return True
+
+    async def run_once(self, force: bool = False) -> Optional[Dict[str, Any]]:
+        now = datetime.now(timezone.utc)
+        if not await self._acquire(now, force):
+            return None
+
+        months = await self.retention_months()
+        cutoff = now - timedelta(days=DAYS_PER_MONTH * months) if months > 0 else None
+        run = {
+            "id": str(uuid.uuid4()),
+            "type": "retention",
+            "status": "running",
+            "retentionMonths": months,
+            "cutoff": cutoff.isoformat() if cutoff else None,
+            "removed": {},
+            "archives": {},
+            "errors": {},
+            "startedAt": now.isoformat()
+        }
+        await self.db.maintenance_runs.insert_one(dict(run))
+
+        started = time.monotonic()
+        for rule in self.rules:
+            query = rule.query(now, cutoff)
+            if query is None:
+                continue
+            try:
+                run["removed"][rule.name] = await self._sweep(rule, query, run, now)
+            except Exception as e:
+                logger.exception(f"Retention rule {rule.name} failed")
+                run["errors"][rule.name] = str(e)
+
+        total = sum(run["removed"].values())
+        run.update(
+            status="failed" if run["errors"] else "completed",
+            finishedAt=datetime.now(timezone.utc).isoformat(),
+            elapsedSeconds=round(time.monotonic() - started, 2)
+        )
+        await self.db.maintenance_runs.update_one({"id": run["id"]}, {"$set": run})
+        self.runs += 1
+        self.removed += total
+        if total:
+            logger.info(f"Retention sweep removed {total} documents: {run['removed']}")
+        return run
+
+    async def _sweep(self, rule: RetentionRule, query: Dict[str, Any], run: Dict[str, Any], now: datetime) -> int:
+        collection = self.db[rule.collection]
+        archive = rule.archive and self.archive_dir is not None
+        path = None
+        if archive:
+            self.archive_dir.mkdir(parents=True, exist_ok=True)
+            path = self.archive_dir / f"{rule.name}-{now:%Y%m%dT%H%M%SZ}-{run['id'][:8]}.ndjson.gz"
+
+        removed = 0
+        while True:
+            while self.busy is not None and self.busy():
+                await asyncio.sleep(BUSY_BACKOFF)
+
+            started = time.monotonic()
+            cursor = collection.find(query, None if archive else {"_id": 1}).limit(self.batch_size)
+            docs = await cursor.to_list(self.batch_size)
+            if not docs:
+                break
+            if archive:
+                await asyncio.to_thread(_append_archive, path, docs)
+                run["archives"][rule.name] = str(path)
+            result = await collection.delete_many({"_id": {"$in": [doc["_id"] for doc in docs]}})
+            removed += result.deleted_count
+
+            delay = len(docs) / self.max_rate - (time.monotonic() - started)
+            if delay > 0:
+                await asyncio.sleep(delay)
+            if len(docs) < self.batch_size:
+                break
+        return removed
+
+    async def _loop(self):
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), timeout=self.initial_delay)
+        except asyncio.TimeoutError:
+            pass
+        while True:
+            force, self._forced = self._forced, False
+            self._wakeup.clear()
+            try:
+                await self.run_once(force=force)
+            except Exception:
+                logger.exception("Retention sweep failed")
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass
+
+    def trigger(self):
+        # Runs a sweep now, even if another process holds this interval's lease
+        self._forced = True
+        self._wakeup.set()
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "running": self._task is not None,
+            "runs": self.runs,
+            "removed": self.removed,
+            "archiveDir": str(self.archive_dir) if self.archive_dir else None
+        }
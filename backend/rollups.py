@@ -0,0 +1,114 @@
+from datetime import datetime, timezone, timedelta
+from typing import Any, Dict, List
+
+from pymongo import UpdateOne
+
+# Dashboard counters kept in `stats_rollups`: one running-totals document and
+# one document per UTC day, both bumped with $inc as events happen.
+TOTALS_ID = "totals"
+DASHBOARD_DAYS = 30
+TOP_TESTS = 5
+
+
+def _day_id(day: str) -> str:
+    return f"day:{day}"
+
+
+def _today() -> str:
+    return datetime.now(timezone.utc).date().isoformat()
+
+
+async def _bump(db, inc: Dict[str, Any]):
+    # Totals are only ever created by rebuild_rollups, so a deployment with
+    # existing history is backfilled rather than counted from zero
+    day = _today()
+    await db.stats_rollups.bulk_write([
+        UpdateOne({"id": TOTALS_ID}, {"$inc": inc}),
+        UpdateOne({"id": _day_id(day)}, {"$inc": inc, "$setOnInsert": {"date": day}}, upsert=True),
+    ], ordered=False)
+
+
+async def record_signup(db):
+    await _bump(db, {"students": 1})
+
+
+async def record_purchase(db, amount: float):
+    await _bump(db, {"purchases": 1, "revenue": amount})
+
+
+async def record_attempt(db, test_id: str):
+    await _bump(db, {"attempts": 1, f"attemptsByTest.{test_id}": 1})
+
+
+async def rebuild_rollups(db) -> Dict[str, Any]:
+    # Recompute everything from the source collections with server-side
+    # aggregation; used on first run and when an admin asks for a refresh.
+    totals = {"students": 0, "purchases": 0, "revenue": 0.0, "attempts": 0, "attemptsByTest": {}}
+    days: Dict[str, Dict[str, Any]] = {}
+
+    def day(date: str) -> Dict[str, Any]:
+        return days.setdefault(date, {"students": 0, "purchases": 0, "revenue": 0.0, "attempts": 0, "attemptsByTest": {}})
+
+    by_day = {"$substr": ["$createdAt", 0, 10]}
+
+    async for group in db.users.aggregate([
+        {"$match": {"role": "student"}},
+        {"$group": {"_id": by_day, "count": {"$sum": 1}}}
+    ]):
+        totals["students"] += group["count"]
+        day(group["_id"])["students"] = group["count"]
+
+    async for group in db.payments.aggregate([
+        {"$match": {"status": "success"}},
+        {"$group": {"_id": by_day, "count": {"$sum": 1}, "revenue": {"$sum": "$amount"}}}
+    ]):
+        totals["purchases"] += group["count"]
+        totals["revenue"] += group["revenue"]
+        day(group["_id"]).update(purchases=group["count"], revenue=group["revenue"])
+
+    async for group in db.attempts.aggregate([
+        {"$group": {"_id": {"day": by_day, "testId": "$testId"}, "count": {"$sum": 1}}}
+    ]):
+        test_id = group["_id"]["testId"]
+        totals["attempts"] += group["count"]
+        totals["attemptsByTest"][test_id] = totals["attemptsByTest"].get(test_id, 0) + group["count"]
+        bucket = day(group["_id"]["day"])
+        bucket["attempts"] += group["count"]
+        bucket["attemptsByTest"][test_id] = group["count"]
+
+    updates = [UpdateOne({"id": TOTALS_ID}, {"$set": totals}, upsert=True)]
+    updates += [
+        UpdateOne({"id": _day_id(date)}, {"$set": {"date": date, **counts}}, upsert=True)
+        for date, counts in days.items()
+    ]
+    await db.stats_rollups.bulk_write(updates, ordered=False)
+    return {"id": TOTALS_ID, **totals}
+
+
+async def load_dashboard(db, refresh: bool = False, read_db=None) -> Dict[str, Any]:
+    # Rollup reads may use `read_db` (a secondary); rebuilds read and write
+    # the primary
+    read_db = read_db if read_db is not None else db
+    totals = None if refresh else await read_db.stats_rollups.find_one({"id": TOTALS_ID}, {"_id": 0})
+    if not totals:
+        totals = await rebuild_rollups(db)
+
+    since = (datetime.now(timezone.utc).date() - timedelta(days=DASHBOARD_DAYS - 1)).isoformat()
+    # "day;" sorts right after every "day:<date>" id
+    daily: List[Dict[str, Any]] = await read_db.stats_rollups.find(
+        {"id": {"$gte": _day_id(since), "$lt": "day;"}},
+        {"_id": 0, "id": 0, "attemptsByTest": 0}
+    ).sort("id", 1).to_list(DASHBOARD_DAYS)
+
+    by_test = totals.get("attemptsByTest", {})
+    top_tests = sorted(by_test.items(), key=lambda x: x[1], reverse=True)[:TOP_TESTS]
+
+    return {
+        "activeUsers": totals.get("students", 0),
+        "totalRevenue": totals.get("revenue", 0),
+        "totalPurchases": totals.get("purchases", 0),
+        "totalAttempts": totals.get("attempts", 0),
+        "topTests": [list(item) for item in top_tests],
+        "totalTests": await read_db.tests.estimated_document_count(),
+        "daily": daily
+    }
@@ -0,0 +1,43 @@
+import argparse
+import os
+from pathlib import Path
+
+import uvicorn
+
+ROOT_DIR = Path(__file__).parent
+
+# Runs the API as several uvicorn worker processes. Each worker has its own
+# Mongo pool and bcrypt threads, so the totals given here are divided
+# between them; caches stay per process and are kept coherent through
+# cache_events (see cache_events.py), which server.py turns on whenever
+# WEB_CONCURRENCY is above 1. Autosaves stay buffered per worker; set
+# AUTOSAVE_WRITE_THROUGH=true to store each one before it is acknowledged.
+#
+#     python run.py --workers 4 --mongo-connections 200
+
+
+def main(args):
+    workers = max(1, args.workers)
+    os.environ["WEB_CONCURRENCY"] = str(workers)
+    os.environ["MONGO_MAX_POOL_SIZE"] = str(max(1, args.mongo_connections // workers))
+    os.environ.setdefault("PASSWORD_WORKERS", str(max(1, (os.cpu_count() or 1) // workers)))
+    uvicorn.run(
+        "server:app",
+        host=args.host,
+        port=args.port,
+        workers=workers,
+        app_dir=str(ROOT_DIR),
+        proxy_headers=True,
+        log_level=args.log_level
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the MockME API with multiple worker processes")
+    parser.add_argument("--host", default=os.environ.get("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.environ.get("PORT", "8001")))
+    parser.add_argument("--workers", type=int, default=int(os.environ.get("WEB_CONCURRENCY", os.cpu_count() or 1)))
+    parser.add_argument("--mongo-connections", type=int, default=int(os.environ.get("MONGO_CONNECTIONS", "200")),
+                        help="Mongo connections across all workers")
+    parser.add_argument("--log-level", default="info")
+    main(parser.parse_args())
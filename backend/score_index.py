@@ -0,0 +1,179 @@
+import asyncio
+import logging
+from array import array
+from typing import Dict, Optional, Tuple
+
+from scoring import DEFAULT_MARKS, DEFAULT_NEGATIVE_MARKS
+
+logger = logging.getLogger(__name__)
+
+SCORE_RESOLUTION = 0.01
+
+
+class ScoreDistribution:
+    # Fixed-resolution histogram over [lower, upper] backed by a Fenwick tree,
+    # so both inserts and "how many scored below" are O(log buckets).
+
+    def __init__(self, lower: float, upper: float, resolution: float = SCORE_RESOLUTION):
+        self.lower = lower
+        self.upper = upper
+        self.resolution = resolution
+        self.size = int(round((upper - lower) / resolution)) + 1
+        self.total = 0
+        self._tree = array("q", bytes(8 * (self.size + 1)))
+
+    def bucket(self, score: float) -> int:
+        index = int(round((score - self.lower) / self.resolution))
+        return min(max(index, 0), self.size - 1)
+
+    def add_bucket(self, index: int, count: int = 1):
+        self.total += count
+        i = index + 1
+        while i <= self.size:
+            self._tree[i] += count
+            i += i & -i
+
+    def add(self, score: float, count: int = 1) -> int:
+        index = self.bucket(score)
+        self.add_bucket(index, count)
+        return index
+
+    def count_below(self, score: float) -> int:
+        # Prefix sum over buckets strictly lower than the score's bucket
+        i = self.bucket(score)
+        below = 0
+        while i > 0:
+            below += self._tree[i]
+            i -= i & -i
+        return below
+
+    def percentile(self, score: float) -> float:
+        if not self.total:
+            return 0
+        return (self.count_below(score) / self.total) * 100
+
+
+def score_bounds(questions) -> Tuple[float, float]:
+    # Same defaults as ScoringKey, so unset marks cannot push scores out of range
+    lower = -sum(q.get("negativeMarks", DEFAULT_NEGATIVE_MARKS) for q in questions
+                 if q.get("questionType", "MCQ") != "MSQ")
+    upper = sum(q.get("marks", DEFAULT_MARKS) for q in questions)
+    return lower, upper
+
+
+class ScoreIndex:
+    # In-memory distributions per test, mirrored into the `score_index`
+    # collection as bucket counts so a restart does not rescan attempts.
+
+    def __init__(self, db):
+        self.db = db
+        self._distributions: Dict[str, ScoreDistribution] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._refresher: Optional[asyncio.Task] = None
+
+    def _matches(self, dist: ScoreDistribution, lower: float, upper: float) -> bool:
+        return dist.lower == lower and dist.upper == upper and dist.resolution == SCORE_RESOLUTION
+
+    async def get(self, test_id: str, lower: float, upper: float) -> ScoreDistribution:
+        dist = self._distributions.get(test_id)
+        if dist and self._matches(dist, lower, upper):
+            return dist
+
+        lock = self._locks.setdefault(test_id, asyncio.Lock())
+        async with lock:
+            dist = self._distributions.get(test_id)
+            if dist and self._matches(dist, lower, upper):
+                return dist
+
+            doc = await self.db.score_index.find_one({"testId": test_id}, {"_id": 0})
+            if doc and doc.get("lower") == lower and doc.get("upper") == upper and doc.get("resolution") == SCORE_RESOLUTION:
+                dist = ScoreDistribution(lower, upper)
+                for index, count in doc.get("counts", {}).items():
+                    dist.add_bucket(int(index), count)
+            else:
+                dist = await self.rebuild(test_id, lower, upper)
+
+            self._distributions[test_id] = dist
+            return dist
+
+    async def rebuild(self, test_id: str, lower: float, upper: float) -> ScoreDistribution:
+        dist = ScoreDistribution(lower, upper)
+        counts: Dict[str, int] = {}
+        pipeline = [
+            {"$match": {"testId": test_id}},
+            {"$group": {"_id": "$score", "count": {"$sum": 1}}}
+        ]
+        async for group in self.db.attempts.aggregate(pipeline):
+            index = dist.add(group["_id"], group["count"])
+            counts[str(index)] = counts.get(str(index), 0) + group["count"]
+
+        await self.db.score_index.update_one(
+            {"testId": test_id},
+            {"$set": {
+                "testId": test_id,
+                "lower": lower,
+                "upper": upper,
+                "resolution": SCORE_RESOLUTION,
+                "counts": counts,
+                "total": dist.total
+            }},
+            upsert=True
+        )
+        self._distributions[test_id] = dist
+        return dist
+
+    async def percentile(self, test_id: str, score: float, lower: float, upper: float) -> float:
+        # The percentile the score will have once recorded (it counts in the
+        # total but, as a tie, not below itself)
+        dist = await self.get(test_id, lower, upper)
+        return (dist.count_below(score) / (dist.total + 1)) * 100
+
+    async def record(self, test_id: str, score: float, lower: float, upper: float):
+        dist = await self.get(test_id, lower, upper)
+        index = dist.add(score)
+        await self.db.score_index.update_one(
+            {"testId": test_id},
+            {"$inc": {f"counts.{index}": 1, "total": 1}}
+        )
+
+    def evict(self, test_id: str):
+        self._distributions.pop(test_id, None)
+
+    def clear(self):
+        self._distributions.clear()
+
+    async def refresh(self):
+        # With several processes, scores recorded elsewhere only reach this
+        # one through the collection; reload the tests whose totals moved
+        test_ids = list(self._distributions)
+        if not test_ids:
+            return
+        async for doc in self.db.score_index.find({"testId": {"$in": test_ids}}, {"_id": 0}):
+            dist = self._distributions.get(doc["testId"])
+            if dist is None or doc.get("total") == dist.total:
+                continue
+            if not (doc.get("lower") == dist.lower and doc.get("upper") == dist.upper
+                    and doc.get("resolution") == SCORE_RESOLUTION):
+                continue  # the test changed; get() reloads it on next use
+            fresh = ScoreDistribution(dist.lower, dist.upper)
+            for index, count in doc.get("counts", {}).items():
+                fresh.add_bucket(int(index), count)
+            self._distributions[doc["testId"]] = fresh
+
+    async def _refresh_loop(self, interval: float):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.refresh()
+            except Exception:
+                logger.exception("Could not refresh score distributions")
+
+    def start_refresh(self, interval: float):
+        if self._refresher is None:
+            self._refresher = asyncio.create_task(self._refresh_loop(interval))
+
+    async def stop(self):
+        if self._refresher is not None:
+            self._refresher.cancel()
+            await asyncio.gather(self._refresher, return_exceptions=True)
+            self._refresher = None
@@ -0,0 +1,183 @@
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Sequence, Tuple
+
+import numpy as np
+
+DEFAULT_SECTION = "General"
+# Marking scheme for questions stored without marks/negativeMarks
+DEFAULT_MARKS = 1.0
+DEFAULT_NEGATIVE_MARKS = 0.33
+
+# Chosen options are packed into an int64 bitmask per question; 0 means
+# unanswered. INVALID marks an answer that was given but cannot be a valid
+# selection (out-of-range index, a list for an MCQ, ...): it never matches
+# the key, and still draws negative marks on MCQs like any wrong answer.
+MAX_OPTIONS = 62
+INVALID = 1 << 62
+
+
+def _option_index(value: Any):
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    if isinstance(value, int) and 0 <= value < MAX_OPTIONS:
+        return value
+    return None
+
+
+def option_mask(chosen: Any, multiple: bool = False) -> int:
+    if chosen is None:
+        return 0
+
+    if isinstance(chosen, (list, tuple, set)):
+        if not multiple:
+            return INVALID
+        mask = 0
+        for value in chosen:
+            index = _option_index(value)
+            if index is None:
+                return INVALID
+            mask |= 1 << index
+        return mask
+
+    index = _option_index(chosen)
+    return INVALID if index is None else 1 << index
+
+
+def mask_to_chosen(mask: int, multiple: bool = False) -> Any:
+    if mask == 0 or mask & INVALID:
+        return None
+    chosen = []
+    while mask:
+        low = mask & -mask
+        chosen.append(low.bit_length() - 1)
+        mask ^= low
+    if multiple:
+        return chosen
+    return chosen[0] if len(chosen) == 1 else None
+
+
+@dataclass(frozen=True)
+class ScoreResult:
+    # Row i holds submission i; columns follow the key's question order
+    correct: np.ndarray         # (m, n) bool
+    answered: np.ndarray        # (m, n) bool
+    points: np.ndarray          # (m, n) float64, marks earned per question
+    scores: np.ndarray          # (m,)
+    correct_counts: np.ndarray  # (m,)
+    accuracy: np.ndarray        # (m,)
+    section_scores: np.ndarray  # (m, s)
+    section_correct: np.ndarray  # (m, s)
+    sections: Tuple[str, ...]
+    section_totals: np.ndarray  # (s,)
+
+    def __len__(self) -> int:
+        return len(self.scores)
+
+    def summary(self, row: int = 0) -> Dict[str, Any]:
+        return {
+            "score": round(float(self.scores[row]), 4),
+            "correct": int(self.correct_counts[row]),
+            "accuracy": float(self.accuracy[row]),
+            "sections": {
+                name: {
+                    "score": round(float(self.section_scores[row, i]), 4),
+                    "correct": int(self.section_correct[row, i]),
+                    "total": int(self.section_totals[i])
+                }
+                for i, name in enumerate(self.sections)
+            }
+        }
+
+
+@dataclass(frozen=True)
+class ScoringKey:
+    question_ids: Tuple[str, ...]
+    positions: Dict[str, int] = field(repr=False)
+    correct: np.ndarray = field(repr=False)
+    is_msq: np.ndarray = field(repr=False)
+    marks: np.ndarray = field(repr=False)
+    negative_marks: np.ndarray = field(repr=False)
+    sections: Tuple[str, ...] = ()
+    section_matrix: np.ndarray = field(default=None, repr=False)
+
+    @classmethod
+    def from_questions(cls, questions: Sequence[Dict[str, Any]]) -> "ScoringKey":
+        is_msq = np.array([q.get("questionType", "MCQ") == "MSQ" for q in questions], dtype=bool)
+        correct = np.array(
+            [option_mask(q["correctAnswer"], multiple=bool(msq)) for q, msq in zip(questions, is_msq)],
+            dtype=np.int64
+        )
+        # MSQs are all-or-nothing without a penalty
+        negative = np.array([q.get("negativeMarks", DEFAULT_NEGATIVE_MARKS) for q in questions], dtype=np.float64)
+        negative[is_msq] = 0.0
+
+        section_names = [q.get("section") or DEFAULT_SECTION for q in questions]
+        sections = tuple(dict.fromkeys(section_names))
+        section_matrix = np.zeros((len(questions), len(sections)), dtype=np.float64)
+        for i, name in enumerate(section_names):
+            section_matrix[i, sections.index(name)] = 1.0
+
+        question_ids = tuple(q["id"] for q in questions)
+        return cls(
+            question_ids=question_ids,
+            positions={qid: i for i, qid in enumerate(question_ids)},
+            correct=correct,
+            is_msq=is_msq,
+            marks=np.array([q.get("marks", DEFAULT_MARKS) for q in questions], dtype=np.float64),
+            negative_marks=negative,
+            sections=sections,
+            section_matrix=section_matrix
+        )
+
+    def __len__(self) -> int:
+        return len(self.question_ids)
+
+    def encode(self, answers: Iterable[Tuple[str, Any]]) -> np.ndarray:
+        # Answers for unknown questions are ignored; the last answer wins
+        masks = np.zeros(len(self), dtype=np.int64)
+        for q_id, chosen in answers:
+            i = self.positions.get(q_id)
+            if i is not None:
+                masks[i] = option_mask(chosen, multiple=bool(self.is_msq[i]))
+        return masks
+
+    def encode_many(self, submissions: Iterable[Iterable[Tuple[str, Any]]]) -> np.ndarray:
+        rows = [self.encode(answers) for answers in submissions]
+        if not rows:
+            return np.zeros((0, len(self)), dtype=np.int64)
+        return np.vstack(rows)
+
+    def decode(self, masks: np.ndarray) -> List[Dict[str, Any]]:
+        return [
+            {"qId": q_id, "chosen": mask_to_chosen(int(mask), multiple=bool(msq))}
+            for q_id, mask, msq in zip(self.question_ids, masks, self.is_msq)
+            if mask
+        ]
+
+    def score(self, masks: np.ndarray) -> ScoreResult:
+        masks = np.atleast_2d(np.asarray(masks, dtype=np.int64))
+        answered = masks != 0
+        # A blank or malformed key credits nobody, not even blank answers
+        correct = answered & (masks == self.correct) & (self.correct != INVALID)
+        penalised = answered & ~correct & ~self.is_msq
+
+        points = np.where(correct, self.marks, 0.0) - np.where(penalised, self.negative_marks, 0.0)
+        scores = points.sum(axis=1)
+        correct_counts = correct.sum(axis=1)
+        total = len(self)
+        accuracy = correct_counts / total if total else np.zeros(len(masks))
+
+        return ScoreResult(
+            correct=correct,
+            answered=answered,
+            points=points,
+            scores=scores,
+            correct_counts=correct_counts,
+            accuracy=accuracy,
+            section_scores=points @ self.section_matrix,
+            section_correct=(correct @ self.section_matrix).astype(np.int64),
+            sections=self.sections,
+            section_totals=self.section_matrix.sum(axis=0).astype(np.int64)
+        )
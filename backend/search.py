@@ -0,0 +1,89 @@
+from typing import Any, Dict, List, Optional, Sequence
+
+SEARCH_PAGE_SIZE = 20
+MAX_SEARCH_PAGE_SIZE = 100
+MAX_FACET_VALUES = 50
+
+# Results, totals and facet counts are computed over the best (or newest)
+# this many matches, so a broad term costs the same as a narrow one. Beyond
+# it the total is reported as capped.
+MAX_MATCHES = 5000
+
+
+def text_match(q: Optional[str], **filters) -> Dict[str, Any]:
+    # Backed by the text indexes in indexes.py; a collection has at most one,
+    # so every text field of the collection is searched
+    match = {k: v for k, v in filters.items() if v is not None}
+    if q and q.strip():
+        match["$text"] = {"$search": q.strip()}
+    return match
+
+
+def price_range(min_price: Optional[float], max_price: Optional[float]) -> Optional[Dict[str, float]]:
+    bounds = {}
+    if min_price is not None:
+        bounds["$gte"] = min_price
+    if max_price is not None:
+        bounds["$lte"] = max_price
+    return bounds or None
+
+
+def search_pipeline(match: Dict[str, Any], facets: Sequence[str], page: int, limit: int,
+                    exclude: Sequence[str] = (), newest: str = "createdAt") -> List[Dict[str, Any]]:
+    ranked = "$text" in match
+    # Relevance first when there is a search term, newest first (by the
+    # `newest` field) otherwise; _id breaks ties so pages are stable. Sorting
+    # before the cap keeps the top matches rather than an arbitrary subset,
+    # and $sort + $limit run as a top-k sort.
+    if ranked:
+        sort = {"relevance": -1, "_id": 1}
+    elif newest == "_id":
+        sort = {"_id": -1}
+    else:
+        sort = {newest: -1, "_id": 1}
+    pipeline: List[Dict[str, Any]] = [{"$match": match}]
+    if ranked:
+        pipeline.append({"$addFields": {"relevance": {"$meta": "textScore"}}})
+    pipeline.append({"$sort": sort})
+    pipeline.append({"$limit": MAX_MATCHES})
+    pipeline.append({"$facet": {
+        "results": [
+            {"$sort": sort},  # $facet does not promise to keep input order
+            {"$skip": (page - 1) * limit},
+            {"$limit": limit},
+            {"$project": {"_id": 0, **{f: 0 for f in exclude}}}
+        ],
+        "total": [{"$count": "count"}],
+        **{
+            name: [
+                {"$group": {"_id": f"${name}", "count": {"$sum": 1}}},
+                {"$sort": {"count": -1, "_id": 1}},
+                {"$limit": MAX_FACET_VALUES}
+            ]
+            for name in facets
+        }
+    }})
+    return pipeline
+
+
+async def faceted_search(collection, match: Dict[str, Any], facets: Sequence[str], page: int = 1,
+                         limit: int = SEARCH_PAGE_SIZE, exclude: Sequence[str] = (),
+                         newest: str = "createdAt") -> Dict[str, Any]:
+    # One round trip: the page of results, the match count and a count per
+    # value of each facet field, all over the same matches
+    limit = max(1, min(limit, MAX_SEARCH_PAGE_SIZE))
+    page = max(1, page)
+    groups = await collection.aggregate(search_pipeline(match, facets, page, limit, exclude, newest)).to_list(1)
+    found = groups[0] if groups else {}
+    total = found["total"][0]["count"] if found.get("total") else 0
+    return {
+        "results": found.get("results", []),
+        "total": total,
+        "totalCapped": total >= MAX_MATCHES,
+        "page": page,
+        "limit": limit,
+        "facets": {
+            name: [{"value": g["_id"], "count": g["count"]} for g in found.get(name, [])]
+            for name in facets
+        }
+    }
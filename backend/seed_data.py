@@ -3,10 +3,98 @@ from motor.motor_asyncio import AsyncIOMotorClient
 import os
 from datetime import datetime, timezone, timedelta
 from passlib.context import CryptContext
+from typing import Any, Dict, List, Optional, Sequence, Union
 import uuid
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
+# Document factories shared by the seed script, the data generator and the
+# benchmarks. They return plain dicts shaped like the server's models.
+
+def now_iso() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+def make_user(name: str, email: str, password_hash: str, role: str = "student",
+              purchased_tests: Optional[List[str]] = None, created_at: Optional[str] = None) -> Dict[str, Any]:
+    created_at = created_at or now_iso()
+    return {
+        "id": str(uuid.uuid4()),
+        "name": name,
+        "email": email,
+        "passwordHash": password_hash,
+        "verified": True,
+        "purchasedTests": purchased_tests or [],
+        "stats": {},
+        "createdAt": created_at,
+        "lastActiveAt": created_at,
+        "role": role
+    }
+
+def make_test(title: str, subject: str, exam_type: str, duration: int, rules: Dict[str, Any],
+              price: float = 30.0, question_ids: Sequence[str] = (), created_at: Optional[str] = None,
+              test_type: str = "mock") -> Dict[str, Any]:
+    created_at = created_at or now_iso()
+    return {
+        "id": str(uuid.uuid4()),
+        "title": title,
+        "subject": subject,
+        "type": test_type,
+        "duration": duration,
+        "questions": list(question_ids),
+        "rules": rules,
+        "price": price,
+        "createdAt": created_at,
+        "updatedAt": created_at,
+        "examType": exam_type
+    }
+
+def make_question(test_id: str, text: str, options: List[str], correct_answer: Union[int, List[int]],
+                  explanation: str = "", marks: float = 1.0, negative_marks: float = 0.33,
+                  section: Optional[str] = None) -> Dict[str, Any]:
+    question = {
+        "id": str(uuid.uuid4()),
+        "testId": test_id,
+        "text": text,
+        "options": options,
+        "correctAnswer": correct_answer,
+        "explanation": explanation,
+        "questionType": "MSQ" if isinstance(correct_answer, list) else "MCQ",
+        "marks": marks,
+        "negativeMarks": negative_marks
+    }
+    if section:
+        question["section"] = section
+    return question
+
+def make_coupon(code: str, discount_type: str, value: float, expiry: str, max_uses: int) -> Dict[str, Any]:
+    created_at = now_iso()
+    return {
+        "id": str(uuid.uuid4()),
+        "code": code,
+        "discountType": discount_type,
+        "value": value,
+        "expiry": expiry,
+        "maxUses": max_uses,
+        "usedCount": 0,
+        "createdAt": created_at,
+        "updatedAt": created_at
+    }
+
+def make_attempt(user_id: str, test_id: str, score: float, accuracy: float,
+                 total_time: int, percentile: float = 0.0, sections: Optional[Dict[str, Any]] = None,
+                 created_at: Optional[str] = None) -> Dict[str, Any]:
+    return {
+        "id": str(uuid.uuid4()),
+        "userId": user_id,
+        "testId": test_id,
+        "score": score,
+        "accuracy": accuracy,
+        "timeData": {"totalTime": total_time},
+        "percentile": percentile,
+        "sections": sections or {},
+        "createdAt": created_at or now_iso()
+    }
+
 async def seed_database():
     client = AsyncIOMotorClient("mongodb://localhost:27017")
     db = client["mockme_db"]
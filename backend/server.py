@@ -1,13 +1,16 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Depends, status, BackgroundTasks
+from fastapi import FastAPI, APIRouter, HTTPException, Depends, status, BackgroundTasks, Query, Request, Response
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from dotenv import load_dotenv
+from fastapi.responses import ORJSONResponse, PlainTextResponse, StreamingResponse
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo.read_preferences import make_read_preference, read_pref_mode_from_name
 import os
+import asyncio
 import logging
 from pathlib import Path
 from pydantic import BaseModel, Field, ConfigDict, EmailStr
-from typing import List, Optional, Dict, Any
+from typing import Callable, List, Optional, Dict, Any
 import uuid
 from datetime import datetime, timezone, timedelta
 import jwt
@@ -15,23 +18,181 @@ from passlib.context import CryptContext
 import secrets
 import random
 import string
+from concurrent.futures import ThreadPoolExecutor
+
+from attempt_store import AttemptStore
+from cache import TTLCache
+from cache_events import CacheEvents
+from compiled_tests import CompiledTest, CompiledTestCache
+from exam_sessions import AutosaveBuffer
+from exports import ATTEMPT_COLUMNS, MEDIA_TYPES, PAYMENT_COLUMNS, export_query, stream_export
+from imports import TestImporter, csv_rows, ndjson_rows
+from indexes import ensure_indexes
+import metrics
+from query_audit import QueryAuditMiddleware, QueryAuditor
+from payloads import CachedBody, cached_response
+from pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, paginate, parse_fields
+from rescore import rescore_test
+from retention import RetentionRule, RetentionSweeper, expired_tokens, older_than
+from search import MAX_SEARCH_PAGE_SIZE, SEARCH_PAGE_SIZE, faceted_search, price_range, text_match
+from rollups import load_dashboard, record_attempt, record_purchase, record_signup
+from user_stats import invalidate_user_stats, load_user_summary, record_attempt_stats
+from score_index import ScoreIndex
+from submission_queue import SubmissionQueue
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
 # MongoDB connection
 mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
+
+# With QUERY_AUDIT on, requests over the round-trip or DB-time limits (or
+# repeating one query QUERY_AUDIT_REPEAT times) are logged, and new read
+# shapes are explained once to catch collection scans
+query_auditor = QueryAuditor(
+    enabled=os.environ.get('QUERY_AUDIT', 'false').lower() in ('1', 'true', 'yes'),
+    max_commands=int(os.environ.get('QUERY_AUDIT_MAX_COMMANDS', '25')),
+    max_db_ms=float(os.environ.get('QUERY_AUDIT_MAX_DB_MS', '200')),
+    repeat_threshold=int(os.environ.get('QUERY_AUDIT_REPEAT', '10')),
+    explain=os.environ.get('QUERY_AUDIT_EXPLAIN', 'true').lower() in ('1', 'true', 'yes')
+)
+
+# Each worker process has its own pool; run.py divides MONGO_CONNECTIONS
+# between WEB_CONCURRENCY workers. Pool sizing can be checked against the
+# mongo_pool_* series on /metrics.
+WEB_CONCURRENCY = int(os.environ.get('WEB_CONCURRENCY', '1'))
+mongo_options = {
+    'maxPoolSize': int(os.environ.get('MONGO_MAX_POOL_SIZE', '100')),
+    'minPoolSize': int(os.environ.get('MONGO_MIN_POOL_SIZE', '0')),
+    'maxConnecting': int(os.environ.get('MONGO_MAX_CONNECTING', '2'))
+}
+if os.environ.get('MONGO_WAIT_QUEUE_TIMEOUT_MS'):
+    # Fail a checkout after this long instead of waiting for a free connection
+    mongo_options['waitQueueTimeoutMS'] = int(os.environ['MONGO_WAIT_QUEUE_TIMEOUT_MS'])
+if os.environ.get('MONGO_MAX_IDLE_TIME_MS'):
+    mongo_options['maxIdleTimeMS'] = int(os.environ['MONGO_MAX_IDLE_TIME_MS'])
+if os.environ.get('MONGO_COMPRESSORS'):
+    # e.g. "zstd,snappy,zlib"; the first one the server also supports is used
+    mongo_options['compressors'] = os.environ['MONGO_COMPRESSORS']
+client = AsyncIOMotorClient(
+    mongo_url,
+    event_listeners=[metrics.CommandMetrics(), metrics.PoolMetrics(), query_auditor],
+    **mongo_options
+)
 db = client[os.environ['DB_NAME']]
+# Catalog, result and analytics reads may go to secondaries
+# (MONGO_READ_PREFERENCE=secondaryPreferred), within MONGO_MAX_STALENESS
+# seconds (90 at least) when set; writes and auth always use `db`
+read_db = client.get_database(os.environ['DB_NAME'], read_preference=make_read_preference(
+    read_pref_mode_from_name(os.environ.get('MONGO_READ_PREFERENCE', 'primary')),
+    None,
+    int(os.environ.get('MONGO_MAX_STALENESS', '-1'))
+))
+query_auditor.db = db
+score_index = ScoreIndex(db)
+compiled_tests = CompiledTestCache(db, maxsize=int(os.environ.get('COMPILED_TEST_CACHE_SIZE', '512')))
+attempt_store = AttemptStore(db, read_db=read_db)
+
+# With more than one process (several workers, or several hosts with
+# CACHE_EVENTS=true), cache evictions are broadcast through the capped
+# cache_events collection and score distributions are reloaded every
+# SCORE_INDEX_REFRESH seconds to pick up other processes' submissions
+CACHE_EVENTS_ENABLED = os.environ.get('CACHE_EVENTS', str(WEB_CONCURRENCY > 1)).lower() in ('1', 'true', 'yes')
+SCORE_INDEX_REFRESH = float(os.environ.get('SCORE_INDEX_REFRESH', '5'))
+cache_events = CacheEvents(db, enabled=CACHE_EVENTS_ENABLED)
+autosave_buffer = AutosaveBuffer(
+    db,
+    interval=float(os.environ.get('AUTOSAVE_FLUSH_INTERVAL', '1.0')),
+    max_pending=int(os.environ.get('AUTOSAVE_MAX_PENDING', '1000')),
+    # Buffered autosaves reach Mongo within AUTOSAVE_FLUSH_INTERVAL; a submit
+    # handled by another process can miss that last interval's clicks.
+    # AUTOSAVE_WRITE_THROUGH=true closes that gap with one write per autosave.
+    write_through=os.environ.get('AUTOSAVE_WRITE_THROUGH', 'false').lower() in ('1', 'true', 'yes')
+)
 
 # Security
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+BCRYPT_ROUNDS = int(os.environ.get('BCRYPT_ROUNDS', '12'))
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
 security = HTTPBearer()
 JWT_SECRET = os.environ.get('JWT_SECRET', 'your-secret-key-change-in-production')
 JWT_ALGORITHM = "HS256"
 
+# Lifetimes enforced by TTL indexes on the token collections
+VERIFICATION_TOKEN_TTL = timedelta(days=2)
+RESET_TOKEN_TTL = timedelta(hours=1)
+TWOFA_CODE_TTL = timedelta(minutes=10)
+PAYMENT_TOKEN_TTL = timedelta(hours=1)
+
+# bcrypt runs off the event loop on a dedicated pool; once every worker is
+# busy and PASSWORD_QUEUE_LIMIT jobs are waiting, new requests get a 429
+PASSWORD_WORKERS = int(os.environ.get('PASSWORD_WORKERS', '4'))
+PASSWORD_QUEUE_LIMIT = int(os.environ.get('PASSWORD_QUEUE_LIMIT', '64'))
+password_executor = ThreadPoolExecutor(max_workers=PASSWORD_WORKERS, thread_name_prefix="bcrypt")
+password_jobs = {"pending": 0, "rejected": 0}
+
+# Exam sessions accept autosaves until this long after their deadline
+EXAM_DEADLINE_GRACE = timedelta(seconds=int(os.environ.get('EXAM_DEADLINE_GRACE', '30')))
+session_cache = TTLCache(maxsize=50000, ttl=6 * 3600)
+
+# With SUBMISSION_QUEUE enabled, submissions are enqueued and scored by
+# SUBMISSION_WORKERS background workers instead of inside the request
+SUBMISSION_QUEUE_ENABLED = os.environ.get('SUBMISSION_QUEUE', 'false').lower() in ('1', 'true', 'yes')
+SUBMISSION_WORKERS = int(os.environ.get('SUBMISSION_WORKERS', '4'))
+
+# Expired tokens, abandoned payments and sessions, and anything older than
+# AdminSettings.dataRetentionMonths are removed by a background sweep every
+# RETENTION_SWEEP_INTERVAL seconds, at most RETENTION_MAX_RATE documents a
+# second and paused while more than RETENTION_BUSY_REQUESTS requests are in
+# flight. With RETENTION_ARCHIVE_DIR set, user data is written there as
+# gzipped NDJSON before it is deleted.
+RETENTION_SWEEP_ENABLED = os.environ.get('RETENTION_SWEEP', 'true').lower() in ('1', 'true', 'yes')
+RETENTION_BUSY_REQUESTS = int(os.environ.get('RETENTION_BUSY_REQUESTS', '100'))
+ABANDONED_AFTER = timedelta(days=1)
+retention_sweeper = RetentionSweeper(
+    db,
+    [
+        RetentionRule("verification_tokens", "verification_tokens", expired_tokens(VERIFICATION_TOKEN_TTL)),
+        RetentionRule("reset_tokens", "reset_tokens", expired_tokens(RESET_TOKEN_TTL)),
+        RetentionRule("twofa_codes", "twofa_codes", expired_tokens(TWOFA_CODE_TTL)),
+        RetentionRule("payment_tokens", "payment_tokens", expired_tokens(PAYMENT_TOKEN_TTL)),
+        # A pending payment can no longer be confirmed once its token expires
+        RetentionRule("abandoned_payments", "payments",
+                      older_than("createdAt", PAYMENT_TOKEN_TTL + ABANDONED_AFTER, status="pending"), archive=True),
+        RetentionRule("failed_payments", "payments", older_than("createdAt", status="failed"), archive=True),
+        RetentionRule("exam_sessions", "exam_sessions", older_than("deadline", ABANDONED_AFTER), archive=True),
+        RetentionRule("done_submissions", "submission_queue", older_than("createdAt", ABANDONED_AFTER, status="done")),
+        RetentionRule("failed_submissions", "submission_queue", older_than("createdAt", status="failed"), archive=True),
+        RetentionRule("jobs", "jobs", older_than("createdAt")),
+        RetentionRule("maintenance_runs", "maintenance_runs", older_than("startedAt")),
+    ],
+    interval=float(os.environ.get('RETENTION_SWEEP_INTERVAL', '3600')),
+    batch_size=int(os.environ.get('RETENTION_BATCH_SIZE', '500')),
+    max_rate=float(os.environ.get('RETENTION_MAX_RATE', '1000')),
+    archive_dir=os.environ.get('RETENTION_ARCHIVE_DIR') or None,
+    busy=lambda: metrics.http_in_progress.total() > RETENTION_BUSY_REQUESTS
+)
+
+# Long-running admin jobs; references kept so tasks are not collected mid-run
+background_jobs = set()
+
+# Authenticated user documents, keyed by user id
+user_cache = TTLCache(
+    maxsize=int(os.environ.get('USER_CACHE_SIZE', '10000')),
+    ttl=float(os.environ.get('USER_CACHE_TTL', '60'))
+)
+
+# Coupon documents by code, used for pricing only; the usage limit is
+# enforced by the conditional reservation in confirm_purchase
+coupon_cache = TTLCache(
+    maxsize=int(os.environ.get('COUPON_CACHE_SIZE', '1000')),
+    ttl=float(os.environ.get('COUPON_CACHE_TTL', '30'))
+)
+
+# Serialized public catalog pages by query, cleared whenever a test changes
+catalog_cache = TTLCache(maxsize=256, ttl=float(os.environ.get('CATALOG_CACHE_TTL', '60')))
+
 # Create the main app
-app = FastAPI(title="MockME API")
+app = FastAPI(title="MockME API", default_response_class=ORJSONResponse)
 api_router = APIRouter(prefix="/api")
 
 # Configure logging
@@ -98,6 +259,7 @@ class Question(BaseModel):
     questionType: str = "MCQ"  # MCQ or MSQ
     marks: float = 1.0
     negativeMarks: float = 0.33
+    section: Optional[str] = None
 
 class Test(BaseModel):
     model_config = ConfigDict(extra="ignore")
@@ -131,16 +293,37 @@ class SubmitTest(BaseModel):
     answers: List[Answer]
     timeSpent: int
 
+class AnswerPatch(BaseModel):
+    qId: str
+    chosen: Any = None
+    timeSpent: int = Field(0, ge=0)  # seconds on this question since the last autosave
+
+class AutosaveAnswers(BaseModel):
+    answers: List[AnswerPatch]
+
+class ExamSession(BaseModel):
+    model_config = ConfigDict(extra="ignore")
+    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    userId: str
+    testId: str
+    status: str = "active"  # active or submitted
+    answers: Dict[str, Any] = {}
+    questionTime: Dict[str, int] = {}
+    startedAt: str = Field(default_factory=lambda: datetime.now(timezone.utc).isoformat())
+    deadline: str
+    attemptId: Optional[str] = None
+
 class Attempt(BaseModel):
+    # Answers and per-question times live in attempt_details (attempt_store.py)
     model_config = ConfigDict(extra="ignore")
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     userId: str
     testId: str
-    answers: List[Dict[str, Any]]
     score: float
     accuracy: float
     timeData: Dict[str, Any]
     percentile: float = 0.0
+    sections: Dict[str, Any] = {}
     createdAt: str = Field(default_factory=lambda: datetime.now(timezone.utc).isoformat())
 
 class Coupon(BaseModel):
@@ -195,6 +378,16 @@ class AdminSettings(BaseModel):
     createdAt: str = Field(default_factory=lambda: datetime.now(timezone.utc).isoformat())
     updatedAt: str = Field(default_factory=lambda: datetime.now(timezone.utc).isoformat())
 
+class Job(BaseModel):
+    model_config = ConfigDict(extra="ignore")
+    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    type: str
+    testId: Optional[str] = None
+    status: str = "queued"  # queued, running, completed, failed
+    processed: int = 0
+    total: int = 0
+    createdAt: str = Field(default_factory=lambda: datetime.now(timezone.utc).isoformat())
+
 class AIExplain(BaseModel):
     questionId: str
     userAnswer: Any
@@ -203,11 +396,25 @@ class AIExplain(BaseModel):
 # HELPER FUNCTIONS
 # ===================
 
-def hash_password(password: str) -> str:
-    return pwd_context.hash(password)
+async def run_password_job(func, *args):
+    if password_jobs["pending"] >= PASSWORD_WORKERS + PASSWORD_QUEUE_LIMIT:
+        password_jobs["rejected"] += 1
+        raise HTTPException(
+            status_code=429,
+            detail="Too many authentication requests, please retry shortly",
+            headers={"Retry-After": "1"}
+        )
+    password_jobs["pending"] += 1
+    try:
+        return await asyncio.get_running_loop().run_in_executor(password_executor, func, *args)
+    finally:
+        password_jobs["pending"] -= 1
 
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+async def hash_password(password: str) -> str:
+    return await run_password_job(pwd_context.hash, password)
+
+async def verify_password(plain_password: str, hashed_password: str) -> bool:
+    return await run_password_job(pwd_context.verify, plain_password, hashed_password)
 
 def create_token(data: dict) -> str:
     to_encode = data.copy()
@@ -229,9 +436,12 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
     user_id = payload.get("user_id")
     if not user_id:
         raise HTTPException(status_code=401, detail="Invalid token")
-    user = await db.users.find_one({"id": user_id}, {"_id": 0})
-    if not user:
-        raise HTTPException(status_code=401, detail="User not found")
+    user = user_cache.get(user_id)
+    if user is None:
+        user = await db.users.find_one({"id": user_id}, {"_id": 0})
+        if not user:
+            raise HTTPException(status_code=401, detail="User not found")
+        user_cache.set(user_id, user)
     return user
 
 async def get_admin_user(user: dict = Depends(get_current_user)):
@@ -239,6 +449,153 @@ async def get_admin_user(user: dict = Depends(get_current_user)):
         raise HTTPException(status_code=403, detail="Admin access required")
     return user
 
+async def get_exam_session(session_id: str, user: dict) -> dict:
+    session = session_cache.get(session_id)
+    if session is None:
+        session = await db.exam_sessions.find_one(
+            {"id": session_id},
+            {"_id": 0, "id": 1, "userId": 1, "testId": 1, "deadline": 1, "status": 1}
+        )
+        if not session:
+            raise HTTPException(status_code=404, detail="Exam session not found")
+        session_cache.set(session_id, session)
+    
+    if session["userId"] != user["id"]:
+        raise HTTPException(status_code=403, detail="Access denied")
+    return session
+
+async def get_coupon(code: str) -> Optional[dict]:
+    coupon = coupon_cache.get(code)
+    if coupon is None:
+        coupon = await db.coupons.find_one({"code": code}, {"_id": 0})
+        # Unknown codes are not cached, so guessing codes cannot evict real ones
+        if coupon:
+            coupon_cache.set(code, coupon)
+    return coupon
+
+def coupon_discount(coupon: Optional[dict], price: float) -> float:
+    if not coupon or coupon["usedCount"] >= coupon["maxUses"]:
+        return 0
+    if datetime.fromisoformat(coupon["expiry"]) <= datetime.now(timezone.utc):
+        return 0
+    if coupon["discountType"] == "percent":
+        return price * (coupon["value"] / 100)
+    return coupon["value"]
+
+async def record_submission(compiled: CompiledTest, user_id: str, answers: List[Dict[str, Any]], time_data: Dict[str, Any], attempt_id: Optional[str] = None) -> Dict[str, Any]:
+    key = compiled.scoring_key
+    masks = key.encode((ans["qId"], ans["chosen"]) for ans in answers)
+    result = key.score(masks).summary()
+    score = result["score"]
+    accuracy = result["accuracy"]
+    
+    percentile = await score_index.percentile(compiled.id, score, compiled.lower, compiled.upper)
+    
+    attempt = Attempt(
+        id=attempt_id or str(uuid.uuid4()),
+        userId=user_id,
+        testId=compiled.id,
+        score=score,
+        accuracy=accuracy,
+        timeData={k: v for k, v in time_data.items() if k != "perQuestion"},
+        percentile=percentile,
+        sections=result["sections"]
+    )
+    
+    await attempt_store.save(attempt.model_dump(), compiled.layout, masks, time_data.get("perQuestion"))
+    # Counted only once the attempt is stored: a retried job finds the
+    # attempt and stops, so it can never be counted twice
+    await score_index.record(compiled.id, score, compiled.lower, compiled.upper)
+    await record_attempt(db, compiled.id)
+    await record_attempt_stats(db, user_id, score, accuracy, time_data.get("totalTime", 0))
+    
+    return {
+        "score": score,
+        "percentile": round(percentile, 2),
+        "accuracy": round(accuracy, 2),
+        "sections": result["sections"],
+        "aiAvailable": True,
+        "attemptId": attempt.id
+    }
+
+async def process_queued_submission(job: Dict[str, Any]):
+    # A worker that died after inserting the attempt leaves the job to be
+    # retried; the user's stats may have missed it and are rebuilt on next use
+    if await db.attempts.find_one({"id": job["attemptId"]}, {"_id": 1}):
+        await invalidate_user_stats(db, [job["userId"]])
+        return
+    compiled = await compiled_tests.get(job["testId"])
+    if not compiled:
+        raise ValueError(f"Test {job['testId']} not found")
+    await record_submission(compiled, job["userId"], job["answers"], job["timeData"], attempt_id=job["attemptId"])
+
+submission_queue = SubmissionQueue(db, process_queued_submission, concurrency=SUBMISSION_WORKERS)
+
+async def submit_attempt(compiled: CompiledTest, user_id: str, answers: List[Dict[str, Any]], time_data: Dict[str, Any], response: Response) -> Dict[str, Any]:
+    if not SUBMISSION_QUEUE_ENABLED:
+        return await record_submission(compiled, user_id, answers, time_data)
+    
+    attempt_id = str(uuid.uuid4())
+    await submission_queue.enqueue({
+        "id": str(uuid.uuid4()),
+        "attemptId": attempt_id,
+        "userId": user_id,
+        "testId": compiled.id,
+        "answers": answers,
+        "timeData": time_data
+    })
+    response.status_code = 202
+    return {"status": "pending", "attemptId": attempt_id}
+
+def evict_tests(test_ids: Optional[List[str]]):
+    if test_ids is None:
+        compiled_tests.clear()
+    for test_id in test_ids or ():
+        compiled_tests.invalidate(test_id)
+    catalog_cache.clear()
+
+def evict_keys(cache: TTLCache) -> Callable[[Optional[List[str]]], None]:
+    def evict(keys: Optional[List[str]]):
+        if keys is None:
+            cache.clear()
+        for key in keys or ():
+            cache.invalidate(key)
+    return evict
+
+def evict_scores(test_ids: Optional[List[str]]):
+    if test_ids is None:
+        score_index.clear()
+    for test_id in test_ids or ():
+        score_index.evict(test_id)
+
+# Handlers for evictions published by other processes
+cache_events.on("tests", evict_tests)
+cache_events.on("users", evict_keys(user_cache))
+cache_events.on("coupons", evict_keys(coupon_cache))
+cache_events.on("scores", evict_scores)
+cache_events.on("sessions", evict_keys(session_cache))
+
+async def invalidate_tests(*test_ids: str):
+    evict_tests(list(test_ids))
+    await cache_events.publish("tests", *test_ids)
+
+async def invalidate_user(user_id: str):
+    user_cache.invalidate(user_id)
+    await cache_events.publish("users", user_id)
+
+async def invalidate_coupons(*codes: str):
+    for code in codes:
+        coupon_cache.invalidate(code)
+    await cache_events.publish("coupons", *codes)
+
+async def invalidate_session(session_id: str):
+    session_cache.invalidate(session_id)
+    await cache_events.publish("sessions", session_id)
+
+async def invalidate_scores(test_id: str):
+    score_index.evict(test_id)
+    await cache_events.publish("scores", test_id)
+
 def generate_verification_token() -> str:
     return secrets.token_urlsafe(32)
 
@@ -262,17 +619,19 @@ async def signup(user_data: UserSignup, background_tasks: BackgroundTasks):
     user = User(
         name=user_data.name,
         email=user_data.email,
-        passwordHash=hash_password(user_data.password)
+        passwordHash=await hash_password(user_data.password)
     )
     
     verification_token = generate_verification_token()
     await db.verification_tokens.insert_one({
         "token": verification_token,
         "email": user.email,
-        "createdAt": datetime.now(timezone.utc).isoformat()
+        "createdAt": datetime.now(timezone.utc).isoformat(),
+        "expiresAt": datetime.now(timezone.utc) + VERIFICATION_TOKEN_TTL
     })
     
     await db.users.insert_one(user.model_dump())
+    await record_signup(db)
     
     background_tasks.add_task(
         send_email_mock,
@@ -289,10 +648,13 @@ async def verify_email(data: VerifyEmail):
     if not token_doc:
         raise HTTPException(status_code=400, detail="Invalid or expired token")
     
-    await db.users.update_one(
+    updated = await db.users.find_one_and_update(
         {"email": token_doc["email"]},
-        {"$set": {"verified": True}}
+        {"$set": {"verified": True}},
+        projection={"_id": 0, "id": 1}
     )
+    if updated:
+        await invalidate_user(updated["id"])
     
     await db.verification_tokens.delete_one({"token": data.token})
     
@@ -301,7 +663,7 @@ async def verify_email(data: VerifyEmail):
 @api_router.post("/auth/login", response_model=TokenResponse)
 async def login(credentials: UserLogin):
     user = await db.users.find_one({"email": credentials.email}, {"_id": 0})
-    if not user or not verify_password(credentials.password, user["passwordHash"]):
+    if not user or not await verify_password(credentials.password, user["passwordHash"]):
         raise HTTPException(status_code=401, detail="Invalid credentials")
     
     if not user.get("verified", False):
@@ -313,6 +675,7 @@ async def login(credentials: UserLogin):
         {"id": user["id"]},
         {"$set": {"lastActiveAt": datetime.now(timezone.utc).isoformat()}}
     )
+    await invalidate_user(user["id"])
     
     return {
         "token": token,
@@ -334,7 +697,8 @@ async def reset_password(data: ResetPassword, background_tasks: BackgroundTasks)
     await db.reset_tokens.insert_one({
         "token": reset_token,
         "email": data.email,
-        "createdAt": datetime.now(timezone.utc).isoformat()
+        "createdAt": datetime.now(timezone.utc).isoformat(),
+        "expiresAt": datetime.now(timezone.utc) + RESET_TOKEN_TTL
     })
     
     background_tasks.add_task(
@@ -352,10 +716,13 @@ async def update_password(data: UpdatePassword):
     if not token_doc:
         raise HTTPException(status_code=400, detail="Invalid or expired token")
     
-    await db.users.update_one(
+    updated = await db.users.find_one_and_update(
         {"email": token_doc["email"]},
-        {"$set": {"passwordHash": hash_password(data.newPassword)}}
+        {"$set": {"passwordHash": await hash_password(data.newPassword)}},
+        projection={"_id": 0, "id": 1}
     )
+    if updated:
+        await invalidate_user(updated["id"])
     
     await db.reset_tokens.delete_one({"token": data.token})
     
@@ -364,7 +731,7 @@ async def update_password(data: UpdatePassword):
 @api_router.post("/auth/admin-login", response_model=Dict[str, str])
 async def admin_login(credentials: AdminLogin, background_tasks: BackgroundTasks):
     user = await db.users.find_one({"email": credentials.email}, {"_id": 0})
-    if not user or not verify_password(credentials.password, user["passwordHash"]):
+    if not user or not await verify_password(credentials.password, user["passwordHash"]):
         raise HTTPException(status_code=401, detail="Invalid credentials")
     
     if user.get("role") != "admin":
@@ -374,7 +741,8 @@ async def admin_login(credentials: AdminLogin, background_tasks: BackgroundTasks
     await db.twofa_codes.insert_one({
         "code": code,
         "email": credentials.email,
-        "createdAt": datetime.now(timezone.utc).isoformat()
+        "createdAt": datetime.now(timezone.utc).isoformat(),
+        "expiresAt": datetime.now(timezone.utc) + TWOFA_CODE_TTL
     })
     
     background_tasks.add_task(
@@ -415,128 +783,213 @@ async def verify_2fa(data: Verify2FA):
 # ===================
 
 @api_router.get("/tests", response_model=List[Dict[str, Any]])
-async def get_tests(examType: Optional[str] = None, type: Optional[str] = None):
-    query = {}
-    if examType:
-        query["examType"] = examType
-    if type:
-        query["type"] = type
-    
-    tests = await db.tests.find(query, {"_id": 0, "questions": 0}).to_list(1000)
-    return tests
+async def get_tests(
+    request: Request,
+    examType: Optional[str] = None,
+    type: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    after: Optional[str] = None,
+    fields: Optional[str] = None,
+    count: bool = False
+):
+    key = (examType, type, limit, after, fields, count)
+    cached = catalog_cache.get(key)
+    if cached is None:
+        query = {}
+        if examType:
+            query["examType"] = examType
+        if type:
+            query["type"] = type
+        
+        page = await paginate(
+            read_db.tests, query,
+            limit=limit, after=after, fields=parse_fields(fields, hidden=("questions",)),
+            exclude=("questions",), with_total=count
+        )
+        cached = CachedBody.of(page.items, page.headers)
+        catalog_cache.set(key, cached)
+    return cached_response(request, cached)
+
+@api_router.get("/tests/search", response_model=Dict[str, Any])
+async def search_tests(
+    request: Request,
+    q: Optional[str] = None,
+    examType: Optional[str] = None,
+    subject: Optional[str] = None,
+    type: Optional[str] = None,
+    minPrice: Optional[float] = None,
+    maxPrice: Optional[float] = None,
+    page: int = Query(1, ge=1),
+    limit: int = Query(SEARCH_PAGE_SIZE, ge=1, le=MAX_SEARCH_PAGE_SIZE)
+):
+    key = ("search", q, examType, subject, type, minPrice, maxPrice, page, limit)
+    cached = catalog_cache.get(key)
+    if cached is None:
+        match = text_match(q, examType=examType, subject=subject, type=type, price=price_range(minPrice, maxPrice))
+        result = await faceted_search(
+            read_db.tests, match, facets=("subject", "examType"), page=page, limit=limit, exclude=("questions",)
+        )
+        cached = CachedBody.of(result)
+        catalog_cache.set(key, cached)
+    return cached_response(request, cached)
 
 @api_router.get("/tests/{test_id}", response_model=Dict[str, Any])
-async def get_test(test_id: str, user: dict = Depends(get_current_user)):
-    test = await db.tests.find_one({"id": test_id}, {"_id": 0})
-    if not test:
+async def get_test(test_id: str, request: Request, user: dict = Depends(get_current_user)):
+    compiled = await compiled_tests.get(test_id)
+    if not compiled:
         raise HTTPException(status_code=404, detail="Test not found")
     
+    # The body depends on who is asking, so shared caches must not keep it
     if test_id not in user.get("purchasedTests", []):
-        test_copy = test.copy()
-        test_copy["questions"] = []
-        test_copy["locked"] = True
-        return test_copy
-    
-    questions = await db.questions.find(
-        {"id": {"$in": test["questions"]}},
-        {"_id": 0, "correctAnswer": 0, "explanation": 0}
-    ).to_list(1000)
-    
-    test["questions"] = questions
-    test["locked"] = False
-    return test
+        return cached_response(request, compiled.locked_body, cache_control="private, no-cache")
+    return cached_response(request, compiled.student_body, cache_control="private, no-cache")
 
 @api_router.post("/tests/start/{test_id}", response_model=Dict[str, Any])
 async def start_test(test_id: str, user: dict = Depends(get_current_user)):
-    test = await db.tests.find_one({"id": test_id}, {"_id": 0})
-    if not test:
+    compiled = await compiled_tests.get(test_id)
+    if not compiled:
         raise HTTPException(status_code=404, detail="Test not found")
     
     if test_id not in user.get("purchasedTests", []):
         raise HTTPException(status_code=403, detail="Test not purchased")
     
-    return {"message": "Test started", "testId": test_id, "duration": test["duration"]}
-
-@api_router.post("/tests/submit/{test_id}", response_model=Dict[str, Any])
-async def submit_test(test_id: str, submission: SubmitTest, user: dict = Depends(get_current_user)):
-    test = await db.tests.find_one({"id": test_id}, {"_id": 0})
-    if not test:
-        raise HTTPException(status_code=404, detail="Test not found")
-    
-    questions = await db.questions.find(
-        {"id": {"$in": test["questions"]}},
+    now = datetime.now(timezone.utc)
+    session = await db.exam_sessions.find_one(
+        {"userId": user["id"], "testId": test_id, "status": "active", "deadline": {"$gt": now.isoformat()}},
         {"_id": 0}
-    ).to_list(1000)
+    )
+    resumed = session is not None
+    if resumed:
+        if await autosave_buffer.flush_session(session["id"]):
+            session = await db.exam_sessions.find_one({"id": session["id"]}, {"_id": 0})
+    else:
+        new_session = ExamSession(
+            userId=user["id"],
+            testId=test_id,
+            deadline=(now + timedelta(minutes=compiled.test["duration"])).isoformat()
+        )
+        session = new_session.model_dump()
+        await db.exam_sessions.insert_one(new_session.model_dump())
     
-    question_map = {q["id"]: q for q in questions}
+    return {
+        "message": "Test resumed" if resumed else "Test started",
+        "testId": test_id,
+        "duration": compiled.test["duration"],
+        "sessionId": session["id"],
+        "startedAt": session["startedAt"],
+        "deadline": session["deadline"],
+        "answers": session["answers"],
+        "questionTime": session["questionTime"]
+    }
+
+@api_router.post("/tests/sessions/{session_id}/autosave", response_model=Dict[str, Any])
+async def autosave_answers(session_id: str, data: AutosaveAnswers, user: dict = Depends(get_current_user)):
+    session = await get_exam_session(session_id, user)
+    if session["status"] != "active":
+        raise HTTPException(status_code=409, detail="Test already submitted")
     
-    score = 0
-    correct = 0
-    total = len(questions)
+    if datetime.now(timezone.utc) > datetime.fromisoformat(session["deadline"]) + EXAM_DEADLINE_GRACE:
+        raise HTTPException(status_code=409, detail="Test time is over")
     
-    for ans in submission.answers:
-        q = question_map.get(ans.qId)
-        if not q:
-            continue
-        
-        if q["questionType"] == "MSQ":
-            if set(ans.chosen) == set(q["correctAnswer"]):
-                score += q["marks"]
-                correct += 1
-        else:
-            if ans.chosen == q["correctAnswer"]:
-                score += q["marks"]
-                correct += 1
-            elif ans.chosen is not None:
-                score -= q["negativeMarks"]
-    
-    accuracy = correct / total if total > 0 else 0
-    
-    all_attempts = await db.attempts.find({"testId": test_id}, {"_id": 0, "score": 1}).to_list(10000)
-    scores = [a["score"] for a in all_attempts]
-    scores.append(score)
-    scores.sort()
-    percentile = (scores.index(score) / len(scores)) * 100 if scores else 0
+    compiled = await compiled_tests.get(session["testId"])
+    if not compiled:
+        raise HTTPException(status_code=404, detail="Test not found")
     
-    attempt = Attempt(
-        userId=user["id"],
-        testId=test_id,
-        answers=[ans.model_dump() for ans in submission.answers],
-        score=score,
-        accuracy=accuracy,
-        timeData={"totalTime": submission.timeSpent},
-        percentile=percentile
+    # Question ids become field paths in the session document
+    if any(ans.qId not in compiled.question_map for ans in data.answers):
+        raise HTTPException(status_code=400, detail="Unknown question in answers")
+    
+    if not await autosave_buffer.save(session_id, [ans.model_dump() for ans in data.answers]):
+        # Submitted through another process since it was cached here
+        session_cache.invalidate(session_id)
+        raise HTTPException(status_code=409, detail="Test already submitted")
+    return {"saved": len(data.answers)}
+
+@api_router.post("/tests/sessions/{session_id}/submit", response_model=Dict[str, Any])
+async def submit_session(session_id: str, response: Response, user: dict = Depends(get_current_user)):
+    session = await get_exam_session(session_id, user)
+    compiled = await compiled_tests.get(session["testId"])
+    if not compiled:
+        raise HTTPException(status_code=404, detail="Test not found")
+    
+    # Buffered autosaves only exist in this process; with several processes
+    # they are written through (see AutosaveBuffer)
+    await autosave_buffer.flush_session(session_id)
+    now = datetime.now(timezone.utc)
+    stored = await db.exam_sessions.find_one_and_update(
+        {"id": session_id, "status": "active"},
+        {"$set": {"status": "submitted", "submittedAt": now.isoformat()}},
+        projection={"_id": 0}
     )
+    await invalidate_session(session_id)
+    if not stored:
+        raise HTTPException(status_code=409, detail="Test already submitted")
     
-    await db.attempts.insert_one(attempt.model_dump())
+    # Time is capped at the deadline however late the submit arrives
+    elapsed = min(now, datetime.fromisoformat(stored["deadline"])) - datetime.fromisoformat(stored["startedAt"])
+    answers = [{"qId": q_id, "chosen": chosen} for q_id, chosen in stored.get("answers", {}).items()]
+    try:
+        result = await submit_attempt(
+            compiled,
+            user["id"],
+            answers,
+            {"totalTime": int(elapsed.total_seconds()), "perQuestion": stored.get("questionTime", {})},
+            response
+        )
+    except Exception:
+        # Nothing was graded; reopen the session so the submit can be retried
+        await db.exam_sessions.update_one(
+            {"id": session_id, "status": "submitted", "attemptId": None},
+            {"$set": {"status": "active"}, "$unset": {"submittedAt": ""}}
+        )
+        await invalidate_session(session_id)
+        raise
     
-    return {
-        "score": score,
-        "percentile": round(percentile, 2),
-        "accuracy": round(accuracy, 2),
-        "aiAvailable": True,
-        "attemptId": attempt.id
-    }
+    await db.exam_sessions.update_one({"id": session_id}, {"$set": {"attemptId": result["attemptId"]}})
+    return result
+
+@api_router.post("/tests/submit/{test_id}", response_model=Dict[str, Any])
+async def submit_test(test_id: str, submission: SubmitTest, response: Response, user: dict = Depends(get_current_user)):
+    compiled = await compiled_tests.get(test_id)
+    if not compiled:
+        raise HTTPException(status_code=404, detail="Test not found")
+    
+    return await submit_attempt(
+        compiled,
+        user["id"],
+        [ans.model_dump() for ans in submission.answers],
+        {"totalTime": submission.timeSpent},
+        response
+    )
 
 @api_router.get("/tests/results/{attempt_id}", response_model=Dict[str, Any])
-async def get_result(attempt_id: str, user: dict = Depends(get_current_user)):
-    attempt = await db.attempts.find_one({"id": attempt_id}, {"_id": 0})
+async def get_result(attempt_id: str, response: Response, user: dict = Depends(get_current_user)):
+    attempt = await read_db.attempts.find_one({"id": attempt_id}, {"_id": 0})
+    if not attempt and read_db.read_preference != db.read_preference:
+        # Just submitted; the secondary may not have it yet
+        attempt = await db.attempts.find_one({"id": attempt_id}, {"_id": 0})
     if not attempt:
-        raise HTTPException(status_code=404, detail="Attempt not found")
+        queued = await db.submission_queue.find_one(
+            {"attemptId": attempt_id},
+            {"_id": 0, "userId": 1, "status": 1}
+        )
+        if not queued or queued["userId"] != user["id"]:
+            raise HTTPException(status_code=404, detail="Attempt not found")
+        response.status_code = 202
+        return {"id": attempt_id, "status": queued["status"]}
     
     if attempt["userId"] != user["id"]:
         raise HTTPException(status_code=403, detail="Access denied")
     
-    test = await db.tests.find_one({"id": attempt["testId"]}, {"_id": 0})
-    questions = await db.questions.find(
-        {"id": {"$in": test["questions"]}},
-        {"_id": 0}
-    ).to_list(1000)
+    compiled = await compiled_tests.get(attempt["testId"])
+    if not compiled:
+        raise HTTPException(status_code=404, detail="Test not found")
     
+    await attempt_store.expand([attempt], compiled.layout)
     return {
         **attempt,
-        "test": test,
-        "questions": questions
+        "test": compiled.test,
+        "questions": list(compiled.questions)
     }
 
 # ===================
@@ -546,28 +999,16 @@ async def get_result(attempt_id: str, user: dict = Depends(get_current_user)):
 @api_router.post("/purchases/initiate", response_model=Dict[str, Any])
 async def initiate_purchase(data: InitiatePurchase, user: dict = Depends(get_current_user)):
     price = 0
-    test_ids = []
     
     if data.testId:
-        test = await db.tests.find_one({"id": data.testId}, {"_id": 0})
-        if not test:
+        compiled = await compiled_tests.get(data.testId)
+        if not compiled:
             raise HTTPException(status_code=404, detail="Test not found")
-        price = test.get("price", 30.0)
-        test_ids = [data.testId]
+        price = compiled.test.get("price", 30.0)
     elif data.bundle:
         price = 100.0 if data.bundle == 5 else data.bundle * 30.0
     
-    discount = 0
-    if data.coupon:
-        coupon = await db.coupons.find_one({"code": data.coupon}, {"_id": 0})
-        if coupon and coupon["usedCount"] < coupon["maxUses"]:
-            expiry = datetime.fromisoformat(coupon["expiry"])
-            if expiry > datetime.now(timezone.utc):
-                if coupon["discountType"] == "percent":
-                    discount = price * (coupon["value"] / 100)
-                else:
-                    discount = coupon["value"]
-    
+    discount = coupon_discount(await get_coupon(data.coupon), price) if data.coupon else 0
     final_amount = max(0, price - discount)
     payment_token = str(uuid.uuid4())
     
@@ -579,12 +1020,20 @@ async def initiate_purchase(data: InitiatePurchase, user: dict = Depends(get_cur
         status="pending"
     )
     
-    await db.payments.insert_one(payment.model_dump())
-    await db.payment_tokens.insert_one({
-        "token": payment_token,
-        "paymentId": payment.id,
-        "createdAt": datetime.now(timezone.utc).isoformat()
-    })
+    # The token carries what confirm needs, so confirming never re-reads the payment
+    await asyncio.gather(
+        db.payments.insert_one(payment.model_dump()),
+        db.payment_tokens.insert_one({
+            "token": payment_token,
+            "paymentId": payment.id,
+            "userId": user["id"],
+            "testId": payment.testId,
+            "amount": payment.amount,
+            "couponApplied": payment.couponApplied,
+            "createdAt": datetime.now(timezone.utc).isoformat(),
+            "expiresAt": datetime.now(timezone.utc) + PAYMENT_TOKEN_TTL
+        })
+    )
     
     return {
         "price": price,
@@ -595,42 +1044,70 @@ async def initiate_purchase(data: InitiatePurchase, user: dict = Depends(get_cur
 
 @api_router.post("/purchases/confirm", response_model=Dict[str, str])
 async def confirm_purchase(data: ConfirmPayment, user: dict = Depends(get_current_user)):
-    token_doc = await db.payment_tokens.find_one({"token": data.paymentToken})
-    if not token_doc:
-        raise HTTPException(status_code=400, detail="Invalid payment token")
-    
-    payment = await db.payments.find_one({"id": token_doc["paymentId"]}, {"_id": 0})
+    # Deleting the token claims it, so a replayed confirm cannot apply twice
+    payment = await db.payment_tokens.find_one_and_delete({"token": data.paymentToken}, {"_id": 0})
     if not payment:
-        raise HTTPException(status_code=404, detail="Payment not found")
-    
-    await db.payments.update_one(
-        {"id": payment["id"]},
-        {"$set": {"status": "success", "updatedAt": datetime.now(timezone.utc).isoformat()}}
-    )
+        raise HTTPException(status_code=400, detail="Invalid payment token")
     
+    if "amount" not in payment:
+        # Tokens issued before the token carried the payment details
+        payment = await db.payments.find_one({"id": payment["paymentId"]}, {"_id": 0})
+        if not payment:
+            raise HTTPException(status_code=404, detail="Payment not found")
+        payment["paymentId"] = payment["id"]
+    
+    now = datetime.now(timezone.utc).isoformat()
+    code = payment.get("couponApplied")
+    if code:
+        # Reserve one use only while usedCount < maxUses; concurrent
+        # redemptions past the limit match nothing and are turned away
+        coupon = await db.coupons.find_one_and_update(
+            {"code": code, "$expr": {"$lt": ["$usedCount", "$maxUses"]}},
+            {"$inc": {"usedCount": 1}},
+            projection={"_id": 0}
+        )
+        if not coupon:
+            await invalidate_coupons(code)
+            await db.payments.update_one(
+                {"id": payment["paymentId"]},
+                {"$set": {"status": "failed", "updatedAt": now}}
+            )
+            raise HTTPException(status_code=409, detail="Coupon usage limit reached")
+        # find_one_and_update returned the document from before the $inc
+        coupon["usedCount"] += 1
+        coupon_cache.set(code, coupon)
+    
+    writes = [
+        db.payments.update_one(
+            {"id": payment["paymentId"]},
+            {"$set": {"status": "success", "updatedAt": now}}
+        ),
+        record_purchase(db, payment["amount"])
+    ]
     if payment.get("testId"):
-        await db.users.update_one(
+        writes.append(db.users.update_one(
             {"id": user["id"]},
             {"$addToSet": {"purchasedTests": payment["testId"]}}
-        )
-    
-    if payment.get("couponApplied"):
-        await db.coupons.update_one(
-            {"code": payment["couponApplied"]},
-            {"$inc": {"usedCount": 1}}
-        )
-    
-    await db.payment_tokens.delete_one({"token": data.paymentToken})
+        ))
+    await asyncio.gather(*writes)
+    if payment.get("testId"):
+        await invalidate_user(user["id"])
     
     return {"message": "Purchase confirmed successfully"}
 
 @api_router.get("/purchases/history", response_model=List[Dict[str, Any]])
-async def get_purchase_history(user: dict = Depends(get_current_user)):
-    payments = await db.payments.find(
-        {"userId": user["id"], "status": "success"},
-        {"_id": 0}
-    ).to_list(1000)
-    return payments
+async def get_purchase_history(
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    after: Optional[str] = None,
+    fields: Optional[str] = None,
+    count: bool = False,
+    user: dict = Depends(get_current_user)
+):
+    page = await paginate(
+        db.payments, {"userId": user["id"], "status": "success"},
+        limit=limit, after=after, fields=parse_fields(fields), with_total=count
+    )
+    return page.to_response()
 
 # ===================
 # COUPON ROUTES
@@ -638,7 +1115,7 @@ async def get_purchase_history(user: dict = Depends(get_current_user)):
 
 @api_router.post("/coupons/validate", response_model=Dict[str, Any])
 async def validate_coupon(data: ValidateCoupon, user: dict = Depends(get_current_user)):
-    coupon = await db.coupons.find_one({"code": data.code}, {"_id": 0})
+    coupon = await get_coupon(data.code)
     if not coupon:
         raise HTTPException(status_code=404, detail="Coupon not found")
     
@@ -676,37 +1153,44 @@ async def ai_explain(data: AIExplain, user: dict = Depends(get_current_user)):
 
 @api_router.get("/analytics/user", response_model=Dict[str, Any])
 async def get_user_analytics(user: dict = Depends(get_current_user)):
-    attempts = await db.attempts.find({"userId": user["id"]}, {"_id": 0}).to_list(1000)
-    
-    if not attempts:
-        return {
-            "averageScore": 0,
-            "testsAttempted": 0,
-            "accuracyTrend": [],
-            "timeEfficiency": [],
-            "bestScore": 0
-        }
-    
-    scores = [a["score"] for a in attempts]
-    accuracies = [a["accuracy"] for a in attempts]
-    times = [a["timeData"].get("totalTime", 0) for a in attempts]
-    
-    return {
-        "averageScore": round(sum(scores) / len(scores), 2),
-        "testsAttempted": len(attempts),
-        "accuracyTrend": [round(a, 2) for a in accuracies],
-        "timeEfficiency": times,
-        "bestScore": max(scores)
-    }
+    return await load_user_summary(db, user["id"], read_db=read_db)
 
 # ===================
 # ADMIN ROUTES
 # ===================
 
 @api_router.get("/admin/tests", response_model=List[Dict[str, Any]])
-async def admin_get_tests(admin: dict = Depends(get_admin_user)):
-    tests = await db.tests.find({}, {"_id": 0}).to_list(1000)
-    return tests
+async def admin_get_tests(
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    after: Optional[str] = None,
+    fields: Optional[str] = None,
+    count: bool = False,
+    admin: dict = Depends(get_admin_user)
+):
+    # Question id arrays only when asked for via fields=questions
+    page = await paginate(
+        db.tests, {},
+        limit=limit, after=after, fields=parse_fields(fields),
+        exclude=("questions",), with_total=count
+    )
+    return page.to_response()
+
+@api_router.get("/admin/questions/search", response_model=Dict[str, Any])
+async def admin_search_questions(
+    q: Optional[str] = None,
+    testId: Optional[str] = None,
+    questionType: Optional[str] = None,
+    section: Optional[str] = None,
+    page: int = Query(1, ge=1),
+    limit: int = Query(SEARCH_PAGE_SIZE, ge=1, le=MAX_SEARCH_PAGE_SIZE),
+    admin: dict = Depends(get_admin_user)
+):
+    match = text_match(q, testId=testId, questionType=questionType, section=section)
+    result = await faceted_search(
+        db.questions, match, facets=("testId", "questionType", "section"), page=page, limit=limit,
+        newest="_id"  # questions carry no createdAt
+    )
+    return ORJSONResponse(result)
 
 @api_router.post("/admin/tests", response_model=Dict[str, str])
 async def admin_create_test(test_data: TestCreate, admin: dict = Depends(get_admin_user)):
@@ -720,9 +1204,8 @@ async def admin_create_test(test_data: TestCreate, admin: dict = Depends(get_adm
         examType=test_data.examType
     )
     
-    question_ids = []
-    for q_data in test_data.questions:
-        question = Question(
+    questions = [
+        Question(
             testId=test.id,
             text=q_data["text"],
             options=q_data["options"],
@@ -730,16 +1213,41 @@ async def admin_create_test(test_data: TestCreate, admin: dict = Depends(get_adm
             explanation=q_data.get("explanation", ""),
             questionType=q_data.get("questionType", "MCQ"),
             marks=q_data.get("marks", 1.0),
-            negativeMarks=q_data.get("negativeMarks", 0.33)
-        )
-        await db.questions.insert_one(question.model_dump())
-        question_ids.append(question.id)
-    
-    test.questions = question_ids
+            negativeMarks=q_data.get("negativeMarks", 0.33),
+            section=q_data.get("section")
+        ).model_dump()
+        for q_data in test_data.questions
+    ]
+    if questions:
+        await db.questions.insert_many(questions)
+    
+    test.questions = [q["id"] for q in questions]
     await db.tests.insert_one(test.model_dump())
+    await invalidate_tests(test.id)
     
     return {"message": "Test created successfully", "testId": test.id}
 
+@api_router.post("/admin/tests/import", response_model=Dict[str, Any])
+async def admin_import_tests(request: Request, format: Optional[str] = None, admin: dict = Depends(get_admin_user)):
+    # Streams an NDJSON or CSV question bank (one question per row) into new
+    # or existing tests; see imports.py for the row format
+    fmt = format or ("csv" if "csv" in request.headers.get("content-type", "") else "ndjson")
+    if fmt not in MEDIA_TYPES:
+        raise HTTPException(status_code=400, detail="format must be ndjson or csv")
+    
+    importer = TestImporter(
+        db,
+        new_test=lambda fields: Test(**fields).model_dump(),
+        new_question=lambda test_id, fields: Question(testId=test_id, **fields).model_dump()
+    )
+    rows = csv_rows(request.stream()) if fmt == "csv" else ndjson_rows(request.stream())
+    async for number, row in rows:
+        await importer.add(number, row)
+    report = await importer.finish()
+    
+    await invalidate_tests(*importer.touched)
+    return report
+
 @api_router.put("/admin/tests/{test_id}", response_model=Dict[str, str])
 async def admin_update_test(test_id: str, test_data: TestCreate, admin: dict = Depends(get_admin_user)):
     test = await db.tests.find_one({"id": test_id}, {"_id": 0})
@@ -759,6 +1267,7 @@ async def admin_update_test(test_id: str, test_data: TestCreate, admin: dict = D
             "updatedAt": datetime.now(timezone.utc).isoformat()
         }}
     )
+    await invalidate_tests(test_id)
     
     return {"message": "Test updated successfully"}
 
@@ -766,60 +1275,152 @@ async def admin_update_test(test_id: str, test_data: TestCreate, admin: dict = D
 async def admin_delete_test(test_id: str, admin: dict = Depends(get_admin_user)):
     await db.tests.delete_one({"id": test_id})
     await db.questions.delete_many({"testId": test_id})
+    await db.score_index.delete_one({"testId": test_id})
+    await invalidate_scores(test_id)
+    await invalidate_tests(test_id)
     return {"message": "Test deleted successfully"}
 
+async def run_rescore(compiled: CompiledTest, job_id: str):
+    await rescore_test(db, score_index, attempt_store, compiled, job_id)
+    # Other processes reload the rebuilt distribution
+    await cache_events.publish("scores", compiled.id)
+
+@api_router.post("/admin/tests/{test_id}/rescore", response_model=Dict[str, str])
+async def admin_rescore_test(test_id: str, admin: dict = Depends(get_admin_user)):
+    # Pick up answer-key fixes made since the test was compiled
+    await invalidate_tests(test_id)
+    compiled = await compiled_tests.get(test_id)
+    if not compiled:
+        raise HTTPException(status_code=404, detail="Test not found")
+    
+    job = Job(type="rescore", testId=test_id)
+    await db.jobs.insert_one(job.model_dump())
+    
+    task = asyncio.create_task(run_rescore(compiled, job.id))
+    background_jobs.add(task)
+    task.add_done_callback(background_jobs.discard)
+    
+    return {"message": "Rescore started", "jobId": job.id}
+
+@api_router.get("/admin/jobs/{job_id}", response_model=Dict[str, Any])
+async def admin_get_job(job_id: str, admin: dict = Depends(get_admin_user)):
+    job = await db.jobs.find_one({"id": job_id}, {"_id": 0})
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
 @api_router.get("/admin/coupons", response_model=List[Dict[str, Any]])
-async def admin_get_coupons(admin: dict = Depends(get_admin_user)):
-    coupons = await db.coupons.find({}, {"_id": 0}).to_list(1000)
-    return coupons
+async def admin_get_coupons(
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    after: Optional[str] = None,
+    fields: Optional[str] = None,
+    count: bool = False,
+    admin: dict = Depends(get_admin_user)
+):
+    page = await paginate(
+        db.coupons, {},
+        limit=limit, after=after, fields=parse_fields(fields), with_total=count
+    )
+    return page.to_response()
 
 @api_router.post("/admin/coupons", response_model=Dict[str, str])
 async def admin_create_coupon(coupon_data: CouponCreate, admin: dict = Depends(get_admin_user)):
     coupon = Coupon(**coupon_data.model_dump())
     await db.coupons.insert_one(coupon.model_dump())
+    await invalidate_coupons(coupon.code)
     return {"message": "Coupon created successfully", "couponId": coupon.id}
 
 @api_router.put("/admin/coupons/{coupon_id}", response_model=Dict[str, str])
 async def admin_update_coupon(coupon_id: str, coupon_data: CouponCreate, admin: dict = Depends(get_admin_user)):
-    await db.coupons.update_one(
+    previous = await db.coupons.find_one_and_update(
         {"id": coupon_id},
         {"$set": {
             **coupon_data.model_dump(),
             "updatedAt": datetime.now(timezone.utc).isoformat()
-        }}
+        }},
+        projection={"_id": 0, "code": 1}
     )
+    await invalidate_coupons(coupon_data.code, *([previous["code"]] if previous else []))
     return {"message": "Coupon updated successfully"}
 
 @api_router.delete("/admin/coupons/{coupon_id}", response_model=Dict[str, str])
 async def admin_delete_coupon(coupon_id: str, admin: dict = Depends(get_admin_user)):
-    await db.coupons.delete_one({"id": coupon_id})
+    deleted = await db.coupons.find_one_and_delete({"id": coupon_id}, {"_id": 0, "code": 1})
+    if deleted:
+        await invalidate_coupons(deleted["code"])
     return {"message": "Coupon deleted successfully"}
 
 @api_router.get("/admin/analytics", response_model=Dict[str, Any])
-async def admin_get_analytics(admin: dict = Depends(get_admin_user)):
-    users = await db.users.find({}, {"_id": 0}).to_list(10000)
-    payments = await db.payments.find({"status": "success"}, {"_id": 0}).to_list(10000)
-    attempts = await db.attempts.find({}, {"_id": 0}).to_list(10000)
-    tests = await db.tests.find({}, {"_id": 0}).to_list(1000)
-    
-    revenue = sum(p["amount"] for p in payments)
-    
-    test_attempts = {}
-    for att in attempts:
-        test_id = att["testId"]
-        test_attempts[test_id] = test_attempts.get(test_id, 0) + 1
-    
-    top_tests = sorted(test_attempts.items(), key=lambda x: x[1], reverse=True)[:5]
-    
+async def admin_get_analytics(refresh: bool = False, admin: dict = Depends(get_admin_user)):
+    return await load_dashboard(db, refresh=refresh, read_db=read_db)
+
+@api_router.get("/admin/export/attempts")
+async def admin_export_attempts(
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    testId: Optional[str] = None,
+    userId: Optional[str] = None,
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    includeAnswers: bool = False,
+    admin: dict = Depends(get_admin_user)
+):
+    query = export_query(test_id=testId, user_id=userId, start=start, end=end)
+    extra = ["answers"] if includeAnswers else []
+    return StreamingResponse(
+        stream_export(
+            db.attempts, query, ATTEMPT_COLUMNS, format, extra_fields=extra,
+            expand=attempt_store.expand if includeAnswers else None
+        ),
+        media_type=MEDIA_TYPES[format],
+        headers={"Content-Disposition": f"attachment; filename=attempts.{format}"}
+    )
+
+@api_router.get("/admin/export/payments")
+async def admin_export_payments(
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    testId: Optional[str] = None,
+    userId: Optional[str] = None,
+    status: Optional[str] = None,
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    admin: dict = Depends(get_admin_user)
+):
+    query = export_query(test_id=testId, user_id=userId, start=start, end=end, status=status)
+    return StreamingResponse(
+        stream_export(db.payments, query, PAYMENT_COLUMNS, format),
+        media_type=MEDIA_TYPES[format],
+        headers={"Content-Disposition": f"attachment; filename=payments.{format}"}
+    )
+
+@api_router.get("/admin/cache-stats", response_model=Dict[str, Any])
+async def admin_get_cache_stats(admin: dict = Depends(get_admin_user)):
     return {
-        "activeUsers": len([u for u in users if u.get("role") == "student"]),
-        "totalRevenue": revenue,
-        "totalPurchases": len(payments),
-        "totalAttempts": len(attempts),
-        "topTests": top_tests,
-        "totalTests": len(tests)
+        "users": user_cache.stats(),
+        "coupons": coupon_cache.stats(),
+        "compiledTests": compiled_tests.cache.stats(),
+        "examSessions": session_cache.stats(),
+        "autosave": autosave_buffer.stats(),
+        "submissionQueue": {**submission_queue.stats(), **await submission_queue.depth()},
+        "passwordPool": {"workers": PASSWORD_WORKERS, "queueLimit": PASSWORD_QUEUE_LIMIT, **password_jobs},
+        "queryAudit": query_auditor.stats(),
+        "retention": retention_sweeper.stats(),
+        "cacheEvents": cache_events.stats()
     }
 
+@api_router.get("/admin/maintenance/runs", response_model=List[Dict[str, Any]])
+async def admin_get_maintenance_runs(
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    admin: dict = Depends(get_admin_user)
+):
+    return await db.maintenance_runs.find({}, {"_id": 0}).sort("startedAt", -1).limit(limit).to_list(limit)
+
+@api_router.post("/admin/maintenance/retention", response_model=Dict[str, str])
+async def admin_run_retention(admin: dict = Depends(get_admin_user)):
+    if not RETENTION_SWEEP_ENABLED:
+        raise HTTPException(status_code=409, detail="Retention sweep is disabled")
+    retention_sweeper.trigger()
+    return {"message": "Retention sweep started"}
+
 @api_router.get("/admin/settings", response_model=AdminSettings)
 async def admin_get_settings(admin: dict = Depends(get_admin_user)):
     settings = await db.settings.find_one({"id": "settings"}, {"_id": 0})
@@ -839,6 +1440,10 @@ async def admin_update_settings(settings_data: AdminSettings, admin: dict = Depe
     )
     return {"message": "Settings updated successfully"}
 
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    return PlainTextResponse(metrics.REGISTRY.render(), media_type=metrics.CONTENT_TYPE)
+
 # Include the router
 app.include_router(api_router)
 
@@ -848,8 +1453,35 @@ app.add_middleware(
     allow_origins=os.environ.get('CORS_ORIGINS', '*').split(','),
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "X-Total-Count"],
 )
 
+app.add_middleware(QueryAuditMiddleware, auditor=query_auditor)
+
+# Outermost, so timings include CORS handling and every response is counted
+app.add_middleware(metrics.MetricsMiddleware)
+
+@app.on_event("startup")
+async def ensure_db_indexes():
+    await ensure_indexes(db)
+
+@app.on_event("startup")
+async def start_background_workers():
+    autosave_buffer.start()
+    if SUBMISSION_QUEUE_ENABLED:
+        submission_queue.start()
+    if RETENTION_SWEEP_ENABLED:
+        retention_sweeper.start()
+    if CACHE_EVENTS_ENABLED:
+        cache_events.start()
+        score_index.start_refresh(SCORE_INDEX_REFRESH)
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    await submission_queue.stop()
+    await retention_sweeper.stop()
+    await cache_events.stop()
+    await score_index.stop()
+    await autosave_buffer.stop()
     client.close()
+    password_executor.shutdown(wait=False)
@@ -0,0 +1,134 @@
+import asyncio
+import logging
+from datetime import datetime, timezone, timedelta
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+MAX_TRIES = 3
+
+
+class SubmissionQueue:
+    # Durable submission queue in the `submission_queue` collection, drained
+    # by `concurrency` asyncio workers. Each worker claims the oldest pending
+    # job with find_one_and_update, so several processes can share a queue.
+    # Jobs stuck in "processing" longer than `claim_timeout` (a worker died
+    # mid-job) are put back to pending.
+
+    def __init__(self, db, handler: Callable[[Dict[str, Any]], Awaitable[Any]],
+                 concurrency: int = 4, poll_interval: float = 0.5, claim_timeout: float = 60.0):
+        self.db = db
+        self.handler = handler
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self.claim_timeout = claim_timeout
+        self.enqueued = 0
+        self.processed = 0
+        self.failed = 0
+        self._wakeup = asyncio.Event()
+        self._tasks: List[asyncio.Task] = []
+
+    async def enqueue(self, job: Dict[str, Any]):
+        await self.db.submission_queue.insert_one({
+            **job,
+            "status": "pending",
+            "tries": 0,
+            "createdAt": datetime.now(timezone.utc).isoformat()
+        })
+        self.enqueued += 1
+        self._wakeup.set()
+
+    async def _claim(self) -> Optional[Dict[str, Any]]:
+        job = await self.db.submission_queue.find_one_and_update(
+            {"status": "pending"},
+            {"$set": {"status": "processing", "claimedAt": datetime.now(timezone.utc).isoformat()},
+             "$inc": {"tries": 1}},
+            sort=[("createdAt", 1)],
+            projection={"_id": 0}
+        )
+        if job:
+            job["tries"] += 1
+        return job
+
+    async def _process(self, job: Dict[str, Any]):
+        try:
+            await self.handler(job)
+        except Exception as e:
+            logger.exception(f"Submission {job['id']} failed (try {job['tries']})")
+            status = "failed" if job["tries"] >= MAX_TRIES else "pending"
+            await self.db.submission_queue.update_one(
+                {"id": job["id"]},
+                {"$set": {"status": status, "error": str(e)}}
+            )
+            if status == "failed":
+                self.failed += 1
+            return
+
+        await self.db.submission_queue.update_one(
+            {"id": job["id"]},
+            {"$set": {"status": "done", "finishedAt": datetime.now(timezone.utc).isoformat()},
+             "$unset": {"answers": ""}}
+        )
+        self.processed += 1
+
+    async def _worker(self):
+        while True:
+            self._wakeup.clear()
+            try:
+                job = await self._claim()
+            except Exception:
+                logger.exception("Could not claim submission")
+                job = None
+
+            if job is None:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            await self._process(job)
+
+    async def _reclaimer(self):
+        while True:
+            await asyncio.sleep(self.claim_timeout)
+            cutoff = (datetime.now(timezone.utc) - timedelta(seconds=self.claim_timeout)).isoformat()
+            try:
+                result = await self.db.submission_queue.update_many(
+                    {"status": "processing", "claimedAt": {"$lt": cutoff}},
+                    {"$set": {"status": "pending"}}
+                )
+                if result.modified_count:
+                    logger.warning(f"Requeued {result.modified_count} stalled submissions")
+                    self._wakeup.set()
+            except Exception:
+                logger.exception("Could not requeue stalled submissions")
+
+    def start(self):
+        if not self._tasks:
+            self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.concurrency)]
+            self._tasks.append(asyncio.create_task(self._reclaimer()))
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def depth(self) -> Dict[str, int]:
+        counts = {"pending": 0, "processing": 0, "failed": 0}
+        async for group in self.db.submission_queue.aggregate([
+            {"$match": {"status": {"$in": list(counts)}}},
+            {"$group": {"_id": "$status", "count": {"$sum": 1}}}
+        ]):
+            counts[group["_id"]] = group["count"]
+        return counts
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "workers": self.concurrency,
+            "running": bool(self._tasks),
+            "enqueued": self.enqueued,
+            "processed": self.processed,
+            "failed": self.failed
+        }
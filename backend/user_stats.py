@@ -0,0 +1,151 @@
+import asyncio
+import os
+from pathlib import Path
+from typing import Any, Dict
+
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient
+
+# Running per-user aggregates kept in users.stats. A user whose stats have
+# no "attempts" key is rebuilt from the attempts collection on next use, so
+# the summary heals itself after a backfill is skipped or scores change.
+TREND_WINDOW = 50
+
+
+def empty_summary() -> Dict[str, Any]:
+    return {
+        "averageScore": 0,
+        "testsAttempted": 0,
+        "accuracyTrend": [],
+        "timeEfficiency": [],
+        "bestScore": 0
+    }
+
+
+def summarize(stats: Dict[str, Any]) -> Dict[str, Any]:
+    attempts = stats.get("attempts", 0)
+    if not attempts:
+        return empty_summary()
+    return {
+        "averageScore": round(stats["scoreSum"] / attempts, 2),
+        "testsAttempted": attempts,
+        "accuracyTrend": stats.get("accuracyTrend", []),
+        "timeEfficiency": stats.get("timeTrend", []),
+        "bestScore": stats.get("bestScore", 0)
+    }
+
+
+async def rebuild_user_stats(db, user_id: str) -> Dict[str, Any]:
+    stats = {
+        "attempts": 0,
+        "scoreSum": 0.0,
+        "accuracySum": 0.0,
+        "timeSum": 0,
+        "accuracyTrend": [],
+        "timeTrend": []
+    }
+
+    async for group in db.attempts.aggregate([
+        {"$match": {"userId": user_id}},
+        {"$group": {
+            "_id": None,
+            "attempts": {"$sum": 1},
+            "scoreSum": {"$sum": "$score"},
+            "accuracySum": {"$sum": "$accuracy"},
+            "timeSum": {"$sum": "$timeData.totalTime"},
+            "bestScore": {"$max": "$score"}
+        }}
+    ]):
+        group.pop("_id")
+        stats.update(group)
+
+    if stats["attempts"]:
+        recent = await db.attempts.find(
+            {"userId": user_id},
+            {"_id": 0, "accuracy": 1, "timeData.totalTime": 1}
+        ).sort("createdAt", -1).limit(TREND_WINDOW).to_list(TREND_WINDOW)
+        recent.reverse()
+        stats["accuracyTrend"] = [round(a["accuracy"], 2) for a in recent]
+        stats["timeTrend"] = [a.get("timeData", {}).get("totalTime", 0) for a in recent]
+    else:
+        # No bestScore until the first attempt sets it through $max; a
+        # placeholder 0 would outrank an all-negative history
+        stats.pop("bestScore", None)
+
+    await db.users.update_one({"id": user_id}, {"$set": {"stats": stats}})
+    return stats
+
+
+async def record_attempt_stats(db, user_id: str, score: float, accuracy: float, time_spent: int):
+    result = await db.users.update_one(
+        {"id": user_id, "stats.attempts": {"$exists": True}},
+        {
+            "$inc": {
+                "stats.attempts": 1,
+                "stats.scoreSum": score,
+                "stats.accuracySum": accuracy,
+                "stats.timeSum": time_spent
+            },
+            "$max": {"stats.bestScore": score},
+            "$push": {
+                "stats.accuracyTrend": {"$each": [round(accuracy, 2)], "$slice": -TREND_WINDOW},
+                "stats.timeTrend": {"$each": [time_spent], "$slice": -TREND_WINDOW}
+            }
+        }
+    )
+    if result.matched_count == 0:
+        # First attempt since stats were introduced or reset; the new attempt
+        # is already stored, so a rebuild includes it
+        await rebuild_user_stats(db, user_id)
+
+
+async def load_user_summary(db, user_id: str, read_db=None) -> Dict[str, Any]:
+    # A rebuild goes to the primary so stale attempts are never written back
+    user = await (read_db if read_db is not None else db).users.find_one({"id": user_id}, {"_id": 0, "stats": 1})
+    stats = (user or {}).get("stats") or {}
+    if "attempts" not in stats:
+        stats = await rebuild_user_stats(db, user_id)
+    return summarize(stats)
+
+
+async def invalidate_user_stats(db, user_ids):
+    await db.users.update_many({"id": {"$in": list(user_ids)}}, {"$unset": {"stats.attempts": ""}})
+
+
+async def backfill_all(db, concurrency: int = 16) -> int:
+    semaphore = asyncio.Semaphore(concurrency)
+    done = 0
+
+    async def rebuild(user_id: str):
+        nonlocal done
+        async with semaphore:
+            await rebuild_user_stats(db, user_id)
+            done += 1
+            if done % 1000 == 0:
+                print(f"  {done} users backfilled")
+
+    pending = set()
+    async for user in db.users.find({}, {"_id": 0, "id": 1}):
+        pending.add(asyncio.create_task(rebuild(user["id"])))
+        if len(pending) >= concurrency * 4:
+            finished, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in finished:
+                task.result()
+    for task in pending:
+        await task
+    return done
+
+
+async def main():
+    load_dotenv(Path(__file__).parent / '.env')
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+    db = client[os.environ['DB_NAME']]
+
+    count = await backfill_all(db)
+    print(f"✓ Stats backfilled for {count} users")
+
+    client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
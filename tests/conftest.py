@@ -0,0 +1,64 @@
+import os
+import sys
+import uuid
+from pathlib import Path
+
+import pytest
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+# Route tests run the API against a scratch database on this server, or
+# against mongomock-motor when none is reachable; the other tests need no
+# database
+TEST_MONGO_URL = os.environ.get("TEST_MONGO_URL", "mongodb://localhost:27017")
+
+
+def _mongo_available() -> bool:
+    from pymongo import MongoClient
+    from pymongo.errors import PyMongoError
+
+    client = MongoClient(TEST_MONGO_URL, serverSelectionTimeoutMS=500)
+    try:
+        client.admin.command("ping")
+        return True
+    except PyMongoError:
+        return False
+    finally:
+        client.close()
+
+
+@pytest.fixture(scope="session")
+def server():
+    from pymongo import MongoClient
+
+    real_mongo = _mongo_available()
+    if not real_mongo:
+        # The server imports AsyncIOMotorClient when it is first imported
+        import motor.motor_asyncio
+        from tests.mock_mongo import MockMotorClient
+        motor.motor_asyncio.AsyncIOMotorClient = MockMotorClient
+
+    db_name = f"mockme_test_{uuid.uuid4().hex[:8]}"
+    os.environ.update(
+        MONGO_URL=TEST_MONGO_URL,
+        DB_NAME=db_name,
+        BCRYPT_ROUNDS="4",
+        RETENTION_SWEEP="false",
+        SUBMISSION_QUEUE="false"
+    )
+    import server as server_module
+    yield server_module
+    if not real_mongo:
+        return
+    client = MongoClient(TEST_MONGO_URL)
+    client.drop_database(db_name)
+    client.close()
+
+
+@pytest.fixture(scope="session")
+def client(server):
+    from fastapi.testclient import TestClient
+
+    with TestClient(server.app) as test_client:
+        yield test_client
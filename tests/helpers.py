@@ -0,0 +1,13 @@
+import asyncio
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+async def collect(rows):
+    return [row async for row in rows]
+
+
+def insert(client, server, collection, *docs):
+    client.portal.call(server.db[collection].insert_many, [dict(d) for d in docs])
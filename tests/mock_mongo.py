@@ -0,0 +1,90 @@
+import itertools
+import threading
+import time
+from types import SimpleNamespace
+
+from mongomock.collection import Collection
+from mongomock_motor import AsyncMongoMockClient
+from pymongo import monitoring
+
+# mongomock fires no command events, so each collection call is reported to
+# the client's command listeners as the one command a real server would get.
+# That keeps query budgets and request metrics meaningful without a mongod.
+COMMANDS = {
+    "find": "find",
+    "find_one": "find",
+    "aggregate": "aggregate",
+    "count_documents": "aggregate",
+    "estimated_document_count": "count",
+    "distinct": "distinct",
+    "insert_one": "insert",
+    "insert_many": "insert",
+    "update_one": "update",
+    "update_many": "update",
+    "replace_one": "update",
+    "bulk_write": "update",
+    "delete_one": "delete",
+    "delete_many": "delete",
+    "find_one_and_update": "findAndModify",
+    "find_one_and_replace": "findAndModify",
+    "find_one_and_delete": "findAndModify",
+}
+
+_listeners = []
+_request_ids = itertools.count(1)
+# mongomock implements some methods with others (find_one with find); only
+# the outermost call is a command
+_local = threading.local()
+
+
+def _command(name: str, collection: str, spec) -> dict:
+    if name == "aggregate":
+        return {name: collection, "pipeline": spec or []}
+    if name in ("update", "delete"):
+        return {name: collection, name + "s": [{"q": spec or {}}]}
+    if name in ("findAndModify", "count"):
+        return {name: collection, "query": spec or {}}
+    return {name: collection, "filter": spec or {}}
+
+
+def _reporting(method, name: str):
+    def wrapper(self, *args, **kwargs):
+        if getattr(_local, "busy", False) or not _listeners:
+            return method(self, *args, **kwargs)
+        spec = args[0] if args and isinstance(args[0], (dict, list)) else kwargs.get("filter")
+        request_id = next(_request_ids)
+        started = SimpleNamespace(command_name=name, command=_command(name, self.name, spec),
+                                  request_id=request_id, database_name=self.database.name)
+        for listener in _listeners:
+            listener.started(started)
+        _local.busy = True
+        began = time.perf_counter()
+        try:
+            result = method(self, *args, **kwargs)
+        except Exception:
+            event = SimpleNamespace(command_name=name, request_id=request_id,
+                                    duration_micros=int((time.perf_counter() - began) * 1e6))
+            for listener in _listeners:
+                listener.failed(event)
+            raise
+        finally:
+            _local.busy = False
+        event = SimpleNamespace(command_name=name, request_id=request_id,
+                                duration_micros=int((time.perf_counter() - began) * 1e6))
+        for listener in _listeners:
+            listener.succeeded(event)
+        return result
+
+    return wrapper
+
+
+for _method, _name in COMMANDS.items():
+    setattr(Collection, _method, _reporting(getattr(Collection, _method), _name))
+
+
+class MockMotorClient(AsyncMongoMockClient):
+    # Drop-in for AsyncIOMotorClient that honours event_listeners=[...]
+
+    def __init__(self, *args, event_listeners=(), **kwargs):
+        _listeners[:] = [l for l in event_listeners if isinstance(l, monitoring.CommandListener)]
+        super().__init__(*args, **kwargs)
@@ -0,0 +1,49 @@
+import uuid
+
+import pytest
+
+import seed_data
+from tests.helpers import insert
+
+
+@pytest.fixture(scope="module")
+def purchase(client, server):
+    test = seed_data.make_test(f"Coupon mock {uuid.uuid4().hex[:6]}", "CS", "GATE", 180, {}, price=40.0)
+    student = seed_data.make_user("Coupon Student", f"{uuid.uuid4().hex[:8]}@test.mockme.com", "")
+    insert(client, server, "tests", test)
+    insert(client, server, "users", student)
+    return {
+        "test": test,
+        "headers": {"Authorization": f"Bearer {server.create_token({'user_id': student['id']})}"}
+    }
+
+
+def test_coupon_reservation(client, server, purchase):
+    code = f"ONCE{uuid.uuid4().hex[:6].upper()}"
+    insert(client, server, "coupons", seed_data.make_coupon(code, "percent", 50, "2099-01-01T00:00:00+00:00", 1))
+    headers = purchase["headers"]
+
+    validated = client.post("/api/coupons/validate", json={"code": code}, headers=headers)
+    assert validated.status_code == 200
+    assert validated.json()["usedCount"] == 0
+
+    body = {"testId": purchase["test"]["id"], "coupon": code}
+    first = client.post("/api/purchases/initiate", json=body, headers=headers).json()
+    second = client.post("/api/purchases/initiate", json=body, headers=headers).json()
+    assert first["discountApplied"] == second["discountApplied"] == 20.0
+
+    # Only one of the two payments may redeem the last use
+    assert client.post("/api/purchases/confirm", json={"paymentToken": first["paymentToken"]}, headers=headers).status_code == 200
+    assert client.post("/api/purchases/confirm", json={"paymentToken": second["paymentToken"]}, headers=headers).status_code == 409
+    coupon = client.portal.call(server.db.coupons.find_one, {"code": code})
+    assert coupon["usedCount"] == 1
+
+    exhausted = client.post("/api/coupons/validate", json={"code": code}, headers=headers)
+    assert exhausted.status_code == 400
+
+
+def test_unknown_coupons_are_not_cached(client, server, purchase):
+    size = server.coupon_cache.stats()["size"]
+    response = client.post("/api/coupons/validate", json={"code": f"NOPE{uuid.uuid4().hex[:6]}"}, headers=purchase["headers"])
+    assert response.status_code == 404
+    assert server.coupon_cache.stats()["size"] == size
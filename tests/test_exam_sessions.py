@@ -0,0 +1,142 @@
+import asyncio
+import uuid
+from types import SimpleNamespace
+
+import pytest
+
+import seed_data
+from exam_sessions import AutosaveBuffer
+from tests.helpers import insert, run
+
+
+class SlowSessions:
+    # Stands in for db.exam_sessions: each write takes `delay` seconds and
+    # the first `failures` writes raise
+    def __init__(self, delay: float = 0.05, failures: int = 0):
+        self.delay = delay
+        self.failures = failures
+        self.log = []
+        self.writes = []
+
+    async def bulk_write(self, updates, ordered=True):
+        self.log.append("write-start")
+        await asyncio.sleep(self.delay)
+        if self.failures:
+            self.failures -= 1
+            self.log.append("write-failed")
+            raise RuntimeError("write failed")
+        self.writes.extend(u._doc for u in updates)
+        self.log.append("write-done")
+
+    async def update_one(self, query, update):
+        self.writes.append(update)
+        return SimpleNamespace(matched_count=0 if query["id"] == "submitted" else 1)
+
+
+def buffer(sessions, **kwargs) -> AutosaveBuffer:
+    return AutosaveBuffer(SimpleNamespace(exam_sessions=sessions), **kwargs)
+
+
+def test_patches_are_coalesced():
+    async def scenario():
+        sessions = SlowSessions(delay=0)
+        autosave = buffer(sessions)
+        autosave.add("s", [{"qId": "q1", "chosen": 0, "timeSpent": 5}])
+        autosave.add("s", [{"qId": "q1", "chosen": 2, "timeSpent": 3}, {"qId": "q2", "chosen": 1}])
+        autosave.add("s", [])
+        await autosave.flush()
+        return sessions.writes
+
+    assert run(scenario()) == [{
+        "$set": {"answers.q1": 2, "answers.q2": 1},
+        "$inc": {"questionTime.q1": 8}
+    }]
+
+
+def test_flush_session_waits_for_a_background_flush():
+    async def scenario():
+        sessions = SlowSessions()
+        autosave = buffer(sessions)
+        autosave.add("s", [{"qId": "q1", "chosen": 1}])
+        background = asyncio.create_task(autosave.flush())
+        await asyncio.sleep(0.01)
+        wrote = await autosave.flush_session("s")
+        sessions.log.append("flush_session returned")
+        await background
+        return wrote, sessions.log
+
+    wrote, log = run(scenario())
+    assert wrote
+    assert log == ["write-start", "write-done", "flush_session returned"]
+
+
+def test_flush_session_rewrites_patches_of_a_failed_flush():
+    async def scenario():
+        sessions = SlowSessions(failures=1)
+        autosave = buffer(sessions)
+        autosave.add("s", [{"qId": "q1", "chosen": 1}])
+        background = asyncio.create_task(autosave.flush())
+        await asyncio.sleep(0.01)
+        assert await autosave.flush_session("s")
+        await asyncio.gather(background, return_exceptions=True)
+        return sessions, autosave
+
+    sessions, autosave = run(scenario())
+    assert sessions.log == ["write-start", "write-failed", "write-start", "write-done"]
+    assert sessions.writes == [{"$set": {"answers.q1": 1}}]
+    assert autosave.stats()["pendingSessions"] == 0
+
+
+def test_flush_session_without_patches():
+    assert run(buffer(SlowSessions()).flush_session("s")) is False
+
+
+def test_write_through():
+    async def scenario():
+        sessions = SlowSessions()
+        autosave = buffer(sessions, write_through=True)
+        saved = await autosave.save("s", [{"qId": "q1", "chosen": 0, "timeSpent": 4}])
+        rejected = await autosave.save("submitted", [{"qId": "q1", "chosen": 0}])
+        return saved, rejected, sessions.writes, autosave.stats()
+
+    saved, rejected, writes, stats = run(scenario())
+    assert saved and not rejected
+    assert writes[0] == {"$set": {"answers.q1": 0}, "$inc": {"questionTime.q1": 4}}
+    assert stats["pendingSessions"] == 0
+
+
+def test_save_buffers_by_default():
+    sessions = SlowSessions()
+    autosave = buffer(sessions)
+    assert run(autosave.save("s", [{"qId": "q1", "chosen": 0}]))
+    assert sessions.writes == [] and autosave.stats()["pendingSessions"] == 1
+
+
+def test_failed_submit_reopens_the_session(client, server, monkeypatch):
+    test = seed_data.make_test(f"Session mock {uuid.uuid4().hex[:6]}", "CS", "GATE", 60, {})
+    question = seed_data.make_question(test["id"], "Question", ["a", "b"], 1)
+    test["questions"] = [question["id"]]
+    student = seed_data.make_user("Session Student", f"{uuid.uuid4().hex[:8]}@test.mockme.com", "",
+                                  purchased_tests=[test["id"]])
+    insert(client, server, "tests", test)
+    insert(client, server, "questions", question)
+    insert(client, server, "users", student)
+    headers = {"Authorization": f"Bearer {server.create_token({'user_id': student['id']})}"}
+
+    session_id = client.post(f"/api/tests/start/{test['id']}", headers=headers).json()["sessionId"]
+    autosave = {"answers": [{"qId": question["id"], "chosen": 1}]}
+    assert client.post(f"/api/tests/sessions/{session_id}/autosave", json=autosave, headers=headers).status_code == 200
+
+    async def fail(*args, **kwargs):
+        raise RuntimeError("scoring failed")
+
+    with monkeypatch.context() as patch:
+        patch.setattr(server, "submit_attempt", fail)
+        with pytest.raises(RuntimeError):
+            client.post(f"/api/tests/sessions/{session_id}/submit", headers=headers)
+    session = client.portal.call(server.db.exam_sessions.find_one, {"id": session_id})
+    assert session["status"] == "active" and "submittedAt" not in session
+
+    retried = client.post(f"/api/tests/sessions/{session_id}/submit", headers=headers)
+    assert retried.status_code == 200
+    assert retried.json()["score"] == 1
@@ -0,0 +1,76 @@
+import pytest
+
+from imports import csv_rows, ndjson_rows, parse_question, parse_test
+from tests.helpers import collect, run
+
+
+async def stream(*chunks: bytes):
+    for chunk in chunks:
+        yield chunk
+
+
+def test_text_fields_are_never_decoded():
+    fields = parse_question({
+        "text": "[GATE 2019] Find x",
+        "explanation": "{not json}",
+        "options": "a|b",
+        "correctAnswer": "1",
+    })
+    assert fields["text"] == "[GATE 2019] Find x"
+    assert fields["explanation"] == "{not json}"
+    assert parse_question({"text": "[1,2]", "options": "a|b", "correctAnswer": "0"})["text"] == "[1,2]"
+
+
+def test_structured_fields_accept_json_or_pipes():
+    assert parse_question({"text": "q", "options": '["a", "b|c"]', "correctAnswer": "1"})["options"] == ["a", "b|c"]
+    msq = parse_question({"text": "q", "options": "a|b|c", "correctAnswer": "[0, 2]", "questionType": "MSQ"})
+    assert msq["correctAnswer"] == [0, 2]
+    assert parse_question({"text": "q", "options": "a|b|c", "correctAnswer": "0|2", "questionType": "MSQ"})["correctAnswer"] == [0, 2]
+    assert parse_test({"title": "[Mock] 1", "rules": '{"calculator": true}'}) == {
+        "title": "[Mock] 1", "rules": {"calculator": True}
+    }
+
+
+def test_ndjson_values_are_taken_as_given():
+    fields = parse_question({"text": "q", "options": ["a", "b"], "correctAnswer": 1, "marks": 2})
+    assert fields == {"text": "q", "options": ["a", "b"], "correctAnswer": 1, "marks": 2, "questionType": "MCQ"}
+
+
+@pytest.mark.parametrize("row, message", [
+    ({"options": "a|b", "correctAnswer": "0"}, "text is required"),
+    ({"text": "q", "options": "[a, b", "correctAnswer": "0"}, "options is not valid JSON"),
+    ({"text": "q", "options": "a", "correctAnswer": "0"}, "at least two"),
+    ({"text": "q", "options": "a|b", "correctAnswer": "2"}, "out of range"),
+    ({"text": "q", "options": "a|b", "correctAnswer": "x"}, "option index"),
+    ({"text": "q", "options": "a|b", "correctAnswer": "0", "questionType": "TF"}, "MCQ or MSQ"),
+])
+def test_invalid_rows(row, message):
+    with pytest.raises(ValueError, match=message):
+        parse_question(row)
+
+
+def test_new_test_needs_a_title():
+    with pytest.raises(ValueError, match="title"):
+        parse_test({"subject": "CS"})
+
+
+def test_csv_rows():
+    data = (
+        b'title,text,options,correctAnswer\r\n'
+        b'T1,"What is, 2+2?",3|4,1\r\n'
+        b',,,\r\n'
+        b'T1,"multi\nline",a|b,0\n'
+        b'T1,"unterminated,a|b,0\n'
+    )
+    rows = run(collect(csv_rows(stream(data[:20], data[20:]))))
+    assert rows[0] == (1, {"title": "T1", "text": "What is, 2+2?", "options": "3|4", "correctAnswer": "1"})
+    assert rows[1] == (3, {"title": "T1", "text": "multi\nline", "options": "a|b", "correctAnswer": "0"})
+    assert rows[2][0] == 4 and isinstance(rows[2][1], ValueError)
+
+
+def test_ndjson_rows():
+    rows = run(collect(ndjson_rows(stream(b'{"text": "a"}\n\n[1]\n{bad\n', b'{"text": "b"}'))))
+    assert [number for number, _ in rows] == [1, 3, 4, 5]
+    assert rows[0][1] == {"text": "a"}
+    assert isinstance(rows[1][1], ValueError) and isinstance(rows[2][1], ValueError)
+    assert rows[3][1] == {"text": "b"}
@@ -0,0 +1,73 @@
+import uuid
+
+import pytest
+
+import seed_data
+from query_audit import query_budget
+from tests.helpers import insert
+
+QUESTIONS = 40
+
+
+@pytest.fixture(scope="module")
+def catalog(client, server):
+    test = seed_data.make_test(f"Budget mock {uuid.uuid4().hex[:6]}", "CS", "GATE", 180, {}, price=40.0)
+    questions = [
+        seed_data.make_question(test["id"], f"Question {i}", ["a", "b", "c", "d"], i % 4, section=f"S{i % 2}")
+        for i in range(QUESTIONS)
+    ]
+    test["questions"] = [q["id"] for q in questions]
+    student = seed_data.make_user("Budget Student", f"{uuid.uuid4().hex[:8]}@test.mockme.com", "", purchased_tests=[test["id"]])
+    insert(client, server, "tests", test)
+    insert(client, server, "questions", *questions)
+    insert(client, server, "users", student)
+    return {
+        "test": test,
+        "questions": questions,
+        "headers": {"Authorization": f"Bearer {server.create_token({'user_id': student['id']})}"}
+    }
+
+
+def submission(catalog):
+    return {
+        "answers": [{"qId": q["id"], "chosen": i % 3} for i, q in enumerate(catalog["questions"])],
+        "timeSpent": 600
+    }
+
+
+def test_catalog_budget(client, server, catalog):
+    server.catalog_cache.clear()
+    with query_budget(max_commands=1):
+        assert client.get("/api/tests?limit=10").status_code == 200
+    with query_budget(max_commands=0):
+        assert client.get("/api/tests?limit=10").status_code == 200
+
+
+def test_get_test_budget(client, server, catalog):
+    server.compiled_tests.clear()
+    server.user_cache.clear()
+    url = f"/api/tests/{catalog['test']['id']}"
+    # User, test and its questions in one query each, however many questions
+    with query_budget(max_commands=3, max_repeats=1):
+        response = client.get(url, headers=catalog["headers"])
+    assert response.status_code == 200
+    assert len(response.json()["questions"]) == QUESTIONS
+    assert "correctAnswer" not in response.json()["questions"][0]
+    with query_budget(max_commands=0):
+        assert client.get(url, headers=catalog["headers"]).status_code == 200
+
+
+def test_submit_budget(client, server, catalog):
+    url = f"/api/tests/submit/{catalog['test']['id']}"
+    # The first submit loads the test, the score distribution and the
+    # user's stats
+    assert client.post(url, json=submission(catalog), headers=catalog["headers"]).status_code == 200
+    # Then: score index, attempt details, attempt, rollups, user stats
+    with query_budget(max_commands=5, max_repeats=1):
+        response = client.post(url, json=submission(catalog), headers=catalog["headers"])
+    assert response.status_code == 200
+    result = response.json()
+    assert result["percentile"] == 0
+    expected = sum(1 if i % 4 == i % 3 else -0.33 for i in range(QUESTIONS))
+    assert result["score"] == pytest.approx(expected)
+
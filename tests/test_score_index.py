@@ -0,0 +1,64 @@
+import random
+
+import numpy as np
+import pytest
+
+from score_index import ScoreDistribution, score_bounds
+from scoring import ScoringKey
+
+
+def test_percentile_matches_brute_force():
+    rng = random.Random(3)
+    dist = ScoreDistribution(-20, 65)
+    scores = [round(rng.uniform(-20, 65), 2) for _ in range(2000)]
+    for score in scores:
+        dist.add(score)
+    assert dist.total == len(scores)
+    for score in rng.sample(scores, 200) + [-20, 0, 64.99, 65]:
+        below = sum(1 for s in scores if s < score - 1e-9)
+        assert dist.count_below(score) == below
+        assert dist.percentile(score) == pytest.approx(below / len(scores) * 100)
+
+
+def test_ties_are_not_counted_below():
+    dist = ScoreDistribution(0, 10)
+    for score in (5, 5, 5, 7):
+        dist.add(score)
+    assert dist.percentile(5) == 0
+    assert dist.percentile(7) == 75
+    assert dist.percentile(10) == 100
+
+
+def test_scores_outside_the_bounds_land_in_the_edge_buckets():
+    dist = ScoreDistribution(0, 10)
+    assert dist.add(-3) == 0
+    assert dist.add(12) == dist.size - 1
+    assert dist.count_below(11) == 1
+
+
+def test_empty_distribution():
+    assert ScoreDistribution(0, 10).percentile(5) == 0
+
+
+def test_add_bucket_counts():
+    dist = ScoreDistribution(0, 1)
+    dist.add_bucket(dist.bucket(0.5), 4)
+    dist.add(0.25)
+    assert dist.total == 5
+    assert dist.count_below(0.75) == 5
+    assert dist.count_below(0.5) == 1
+
+
+def test_score_bounds_cover_every_possible_score():
+    # Questions stored without marks/negativeMarks use the scoring defaults
+    questions = [
+        {"id": "q1", "correctAnswer": 0},
+        {"id": "q2", "correctAnswer": 1, "marks": 2, "negativeMarks": 0.5},
+        {"id": "q3", "correctAnswer": [0, 1], "questionType": "MSQ", "negativeMarks": 1},
+    ]
+    lower, upper = score_bounds(questions)
+    key = ScoringKey.from_questions(questions)
+    all_wrong = key.score(np.array([[0b10, 0b1, 0b1]])).scores[0]
+    all_right = key.score(key.correct).scores[0]
+    assert lower == pytest.approx(all_wrong)
+    assert upper == pytest.approx(all_right)
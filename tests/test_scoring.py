@@ -0,0 +1,118 @@
+import numpy as np
+import pytest
+
+from scoring import INVALID, ScoringKey, mask_to_chosen, option_mask
+
+
+@pytest.mark.parametrize("chosen, multiple, mask", [
+    (None, False, 0),
+    (0, False, 0b1),
+    (2, False, 0b100),
+    (2.0, False, 0b100),
+    ([0, 2], True, 0b101),
+    ([], True, 0),
+    ([0, 2], False, INVALID),   # a list for an MCQ
+    (-1, False, INVALID),
+    (62, False, INVALID),       # past MAX_OPTIONS
+    (True, False, INVALID),
+    ("1", False, INVALID),
+    ([0, "x"], True, INVALID),
+])
+def test_option_mask(chosen, multiple, mask):
+    assert option_mask(chosen, multiple=multiple) == mask
+
+
+@pytest.mark.parametrize("chosen, multiple", [(3, False), ([0, 2, 5], True), (None, False)])
+def test_mask_round_trip(chosen, multiple):
+    assert mask_to_chosen(option_mask(chosen, multiple=multiple), multiple=multiple) == chosen
+
+
+def test_mask_to_chosen_invalid():
+    assert mask_to_chosen(INVALID) is None
+    assert mask_to_chosen(INVALID | 0b1, multiple=True) is None
+
+
+def question(qid, answer, marks=None, negative=None, section=None):
+    q = {"id": qid, "correctAnswer": answer, "questionType": "MSQ" if isinstance(answer, list) else "MCQ"}
+    if marks is not None:
+        q["marks"] = marks
+    if negative is not None:
+        q["negativeMarks"] = negative
+    if section:
+        q["section"] = section
+    return q
+
+
+@pytest.fixture
+def key():
+    return ScoringKey.from_questions([
+        question("q1", 1, marks=2, negative=0.5, section="A"),
+        question("q2", [0, 2], marks=3, negative=1, section="A"),
+        question("q3", 0, section="B"),  # default marks 1.0 / 0.33
+    ])
+
+
+def test_score_marking(key):
+    summary = key.score(key.encode([("q1", 1), ("q2", [0, 2]), ("q3", 1)])).summary()
+    assert summary["score"] == pytest.approx(2 + 3 - 0.33)
+    assert summary["correct"] == 2
+    assert summary["accuracy"] == pytest.approx(2 / 3)
+    assert summary["sections"] == {
+        "A": {"score": 5.0, "correct": 2, "total": 2},
+        "B": {"score": -0.33, "correct": 0, "total": 1},
+    }
+
+
+def test_msq_is_all_or_nothing_without_penalty(key):
+    summary = key.score(key.encode([("q2", [0])])).summary()
+    assert summary["score"] == 0
+    assert summary["correct"] == 0
+
+
+def test_invalid_answer_is_penalised_on_mcq(key):
+    masks = key.encode([("q1", [1])])
+    assert masks[0] == INVALID
+    assert key.score(masks).summary()["score"] == pytest.approx(-0.5)
+
+
+def test_unanswered_scores_zero(key):
+    summary = key.score(key.encode([])).summary()
+    assert summary["score"] == 0
+    assert summary["accuracy"] == 0
+
+
+@pytest.mark.parametrize("answer", [None, []])
+def test_blank_key_credits_nobody(answer):
+    key = ScoringKey.from_questions([question("q1", answer)])
+    assert key.correct[0] == 0
+    assert key.score(key.encode([])).summary()["correct"] == 0
+    assert key.score(key.encode([("q1", 0)])).summary()["correct"] == 0
+
+
+def test_malformed_key_credits_nobody():
+    key = ScoringKey.from_questions([question("q1", "b", negative=0.5)])
+    assert key.correct[0] == INVALID
+    summary = key.score(key.encode([("q1", "b")])).summary()
+    assert summary["correct"] == 0
+    assert summary["score"] == pytest.approx(-0.5)
+
+def test_encode_ignores_unknown_questions_and_keeps_last_answer(key):
+    masks = key.encode([("q1", 0), ("nope", 1), ("q1", 1)])
+    assert masks.tolist() == [0b10, 0, 0]
+    assert key.decode(masks) == [{"qId": "q1", "chosen": 1}]
+
+
+def test_batch_matches_single_rows(key):
+    rng = np.random.default_rng(7)
+    submissions = [
+        [("q1", int(rng.integers(-1, 4))), ("q2", [int(i) for i in rng.choice(4, rng.integers(0, 3), replace=False)]),
+         ("q3", None if rng.random() < 0.3 else int(rng.integers(0, 3)))]
+        for _ in range(50)
+    ]
+    result = key.score(key.encode_many(submissions))
+    for i, answers in enumerate(submissions):
+        assert result.summary(i) == key.score(key.encode(answers)).summary()
+
+
+def test_empty_batch(key):
+    assert len(key.score(key.encode_many([]))) == 0
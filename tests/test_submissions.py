@@ -0,0 +1,51 @@
+import uuid
+
+import pytest
+
+import seed_data
+from compiled_tests import compile_test
+
+
+@pytest.fixture
+def compiled():
+    test = seed_data.make_test(f"Queue mock {uuid.uuid4().hex[:6]}", "CS", "GATE", 60, {})
+    questions = [seed_data.make_question(test["id"], f"Question {i}", ["a", "b", "c", "d"], 0) for i in range(4)]
+    test["questions"] = [q["id"] for q in questions]
+    return compile_test(test, questions)
+
+
+def answers(compiled, right: int):
+    return [{"qId": q["id"], "chosen": 0 if i < right else 1} for i, q in enumerate(compiled.questions)]
+
+
+def total(client, server, compiled) -> int:
+    return client.portal.call(server.score_index.get, compiled.id, compiled.lower, compiled.upper).total
+
+
+def test_a_failed_save_is_not_counted(client, server, compiled, monkeypatch):
+    async def fail(*args, **kwargs):
+        raise RuntimeError("save failed")
+
+    monkeypatch.setattr(server.attempt_store, "save", fail)
+    with pytest.raises(RuntimeError):
+        client.portal.call(server.record_submission, compiled, "u1", answers(compiled, 2), {"totalTime": 60})
+    assert total(client, server, compiled) == 0
+
+
+def test_percentile_counts_the_new_attempt(client, server, compiled):
+    first = client.portal.call(server.record_submission, compiled, "u1", answers(compiled, 1), {"totalTime": 60})
+    second = client.portal.call(server.record_submission, compiled, "u2", answers(compiled, 3), {"totalTime": 60})
+    tie = client.portal.call(server.record_submission, compiled, "u3", answers(compiled, 3), {"totalTime": 60})
+    assert (first["percentile"], second["percentile"], tie["percentile"]) == (0, 50, pytest.approx(33.33))
+    assert total(client, server, compiled) == 3
+
+
+def test_a_retried_job_is_counted_once(client, server, compiled):
+    job = {
+        "id": str(uuid.uuid4()), "attemptId": str(uuid.uuid4()), "userId": "u1", "testId": compiled.id,
+        "answers": answers(compiled, 2), "timeData": {"totalTime": 60}
+    }
+    server.compiled_tests.cache.set(compiled.id, compiled)
+    client.portal.call(server.process_queued_submission, job)
+    client.portal.call(server.process_queued_submission, job)
+    assert total(client, server, compiled) == 1
@@ -0,0 +1,25 @@
+from mongomock_motor import AsyncMongoMockClient
+
+from tests.helpers import run
+from user_stats import load_user_summary, rebuild_user_stats, record_attempt_stats
+
+
+async def attempt(db, score: float):
+    await db.attempts.insert_one({"userId": "u", "score": score, "accuracy": 0.2, "timeData": {"totalTime": 60}})
+    await record_attempt_stats(db, "u", score, 0.2, 60)
+
+
+def test_best_of_negative_scores():
+    async def scenario():
+        db = AsyncMongoMockClient()["stats"]
+        await db.users.insert_one({"id": "u"})
+        empty = await load_user_summary(db, "u")
+        await attempt(db, -1.65)
+        await attempt(db, -3.0)
+        return empty, await load_user_summary(db, "u"), await rebuild_user_stats(db, "u")
+
+    empty, summary, rebuilt = run(scenario())
+    assert empty["testsAttempted"] == 0 and empty["bestScore"] == 0
+    assert summary["bestScore"] == -1.65
+    assert summary["averageScore"] == -2.33
+    assert rebuilt["bestScore"] == -1.65